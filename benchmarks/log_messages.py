@@ -0,0 +1,145 @@
+"""
+Micro-benchmark of the classification and logging of restic output lines.
+
+It generates a synthetic `restic backup --verbose` output, mostly "unchanged /path" lines,
+and measures the lines per second of:
+
+- the previous classifier, matching up to four uncompiled regular expressions per line,
+- `log_level`, the precompiled prefix dispatch,
+- `log_messages`, reading, classifying, logging and capturing the whole output.
+
+Usage:
+    python -m benchmarks.log_messages [--lines 2000000] [--log-level info]
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Callable, Sequence
+
+from runrestic.restic.tools import log_level, log_messages
+
+
+def synthetic_output(lines: int) -> list[bytes]:
+    """
+    Generate the lines of a verbose backup output.
+
+    Args:
+        lines (int): Number of lines.
+
+    Returns:
+        list[bytes]: The lines, including the line breaks.
+    """
+    output = []
+    for i in range(lines):
+        if i % 1000 == 999:
+            output.append(
+                b"error: open /data/dir%d/file%d: permission denied\n" % (i, i)
+            )
+        elif i % 500 == 499:
+            output.append(b"modified  /data/dir%d/file%d, saved in 0.012s\n" % (i, i))
+        else:
+            output.append(b"unchanged /data/dir%d/file%d\n" % (i // 100, i))
+    output += [
+        b"Files:        1000 new,  2000 changed, 1997000 unmodified\n",
+        b"Added to the repo: 1.234 GiB\n",
+        b"processed 2000000 files, 1.234 TiB in 1:02:03\n",
+    ]
+    return output
+
+
+def legacy_log_level(line: str) -> int:
+    """
+    The classification used before the precompiled classifier, for comparison.
+
+    Args:
+        line (str): The line of output.
+
+    Returns:
+        int: The logging level for the line.
+    """
+    if re.match(r"^critical|fatal", line, re.I):
+        return logging.CRITICAL
+    if re.match(r"^error", line, re.I):
+        return logging.ERROR
+    if re.match(r"^warning", line, re.I):
+        return logging.WARNING
+    if re.match(r"^unchanged\s+/", line, re.I):
+        return logging.DEBUG
+    return logging.INFO
+
+
+def bench_classifier(classify: Callable[[Any], int], lines: Sequence[Any]) -> float:
+    """
+    Measure the lines per second of a classifier.
+
+    Args:
+        classify (Callable[[Any], int]): The classifier.
+        lines (Sequence[Any]): The lines in the type expected by the classifier.
+
+    Returns:
+        float: Lines per second.
+    """
+    start = time.perf_counter()
+    for line in lines:
+        classify(line)
+    return len(lines) / (time.perf_counter() - start)
+
+
+def bench_log_messages(data: list[bytes]) -> float:
+    """
+    Measure the lines per second of `log_messages` reading the whole output from a stream.
+
+    Args:
+        data (list[bytes]): The lines of output.
+
+    Returns:
+        float: Lines per second.
+    """
+
+    async def read() -> str:
+        stream = asyncio.StreamReader(limit=1 << 24)
+        stream.feed_data(b"".join(data))
+        stream.feed_eof()
+        return await log_messages(stream, "restic")
+
+    start = time.perf_counter()
+    asyncio.run(read())
+    return len(data) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    """
+    Run the benchmarks and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--lines", type=int, default=2_000_000)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    log = logging.getLogger("runrestic")
+    log.setLevel(args.log_level.upper())
+    log.addHandler(logging.NullHandler())
+    log.propagate = False
+
+    data = synthetic_output(args.lines)
+    # the previous classifier worked on decoded lines, `log_level` on raw bytes
+    lines = [line.decode() for line in data]
+    raw = [line.rstrip(b"\n") for line in data]
+    # sanity check, both classifiers have to agree
+    assert all(
+        legacy_log_level(line) == log_level(line.encode()) for line in lines[:10_000]
+    )
+
+    legacy = bench_classifier(legacy_log_level, lines)
+    current = bench_classifier(log_level, raw)
+    print(f"{len(lines):,} lines, logging level {args.log_level}")
+    print(f"previous classifier:  {legacy:14,.0f} lines/s")
+    print(f"log_level:            {current:14,.0f} lines/s ({current / legacy:.1f}x)")
+    print(f"log_messages:         {bench_log_messages(data):14,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Micro-benchmark of the parsing of the restic outputs for the metrics.
+
+It generates synthetic outputs of `restic backup --verbose`, mostly "unchanged /path" lines
+followed by the summary, and of `restic prune` (before and since restic 0.12.0), with many
+progress lines, and measures the parses per second of:
+
+- the previous parsers, calling `re.findall` on the whole output for each field,
+- `parse_backup`, `parse_prune` and `parse_new_prune`, using the precompiled single-pass
+  `FieldParser`.
+
+Usage:
+    python -m benchmarks.output_parsing [--lines 2000000] [--repeat 5]
+"""
+
+import argparse
+import logging
+import re
+import time
+from typing import Any, Callable
+
+from runrestic.restic.output_parsing import (
+    BACKUP_FIELDS,
+    NEW_PRUNE_FIELDS,
+    PRUNE_FIELDS,
+    parse_backup,
+    parse_new_prune,
+    parse_prune,
+)
+from runrestic.runrestic.tools import FieldParser
+
+
+def backup_output(lines: int) -> str:
+    """
+    Generate the output of a verbose backup.
+
+    Args:
+        lines (int): Number of lines of the processed files.
+
+    Returns:
+        str: The output.
+    """
+    output = [f"unchanged /data/dir{i // 100}/file{i}" for i in range(lines)]
+    output += [
+        "",
+        "Files:        1000 new,  2000 changed, 1997000 unmodified",
+        "Dirs:          100 new,   200 changed,   19700 unmodified",
+        "Added to the repo: 1.234 GiB",
+        "",
+        f"processed {lines} files, 1.234 TiB in 1:02:03",
+        "snapshot 1e3c30a1 saved",
+    ]
+    return "\n".join(output)
+
+
+def prune_output(lines: int) -> str:
+    """
+    Generate the output of a prune before restic 0.12.0, with progress lines.
+
+    Args:
+        lines (int): Number of progress lines.
+
+    Returns:
+        str: The output.
+    """
+    output = [
+        f"[0:{i % 60:02}] {i * 100 / lines:.2f}%  {i} / {lines} packs"
+        for i in range(lines)
+    ]
+    output += [
+        "repository contains 11981 packs (345057 blobs) with 56.676 GiB",
+        "processed 345057 blobs: 0 duplicate blobs, 0B duplicate",
+        "found 2 of 345057 data blobs still in use, removing 345055 blobs",
+        "will remove 0 invalid files",
+        "will delete 11979 packs and rewrite 0 packs, this frees 56.664 GiB",
+        "remove 11 old index files",
+        "done",
+    ]
+    return "\n".join(output)
+
+
+def new_prune_output(lines: int) -> str:
+    """
+    Generate the output of a prune since restic 0.12.0, with progress lines.
+
+    Args:
+        lines (int): Number of progress lines.
+
+    Returns:
+        str: The output.
+    """
+    output = [
+        f"[0:{i % 60:02}] {i * 100 / lines:.2f}%  {i} / {lines} packs processed"
+        for i in range(lines)
+    ]
+    output += [
+        "to repack:             1 blobs / 1234 B",
+        "this removes:          2 blobs / 5678 B",
+        "to delete:            32 blobs / 158.830 KiB",
+        "total prune:          35 blobs / 158.830 KiB",
+        "remaining:         19154 blobs / 260.161 MiB",
+        "unused size after prune: 0 B (0.00% of remaining size)",
+        "done",
+    ]
+    return "\n".join(output)
+
+
+def legacy_parse(fields: FieldParser, output: str) -> dict[str, Any]:
+    """
+    The parsing used before the `FieldParser`, one `re.findall` over the whole output
+    per field, for comparison.
+
+    Args:
+        fields (FieldParser): The fields to parse.
+        output (str): The output.
+
+    Returns:
+        dict[str, Any]: The parsed value or the default value per field.
+    """
+    values = {}
+    for name, (regex, default) in fields.fields.items():
+        try:
+            values[name] = re.findall(regex, output)[0]
+        except IndexError:
+            values[name] = default
+    return values
+
+
+def bench(parse: Callable[[], Any], repeat: int) -> float:
+    """
+    Measure the parses per second.
+
+    Args:
+        parse (Callable[[], Any]): The parsing of one output.
+        repeat (int): Number of parses.
+
+    Returns:
+        float: Parses per second.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse()
+    return repeat / (time.perf_counter() - start)
+
+
+def main() -> None:
+    """
+    Run the benchmarks and print the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--lines", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger("runrestic").disabled = True
+
+    cases = [
+        ("backup", BACKUP_FIELDS, backup_output(args.lines), parse_backup),
+        ("prune", PRUNE_FIELDS, prune_output(args.lines // 100), parse_prune),
+        (
+            "new prune",
+            NEW_PRUNE_FIELDS,
+            new_prune_output(args.lines // 100),
+            parse_new_prune,
+        ),
+    ]
+    for name, fields, output, parse_output in cases:
+        # sanity check, both have to agree
+        assert legacy_parse(fields, output) == fields.parse(output)
+        process_infos = {"output": [(0, output)], "time": 0}
+        legacy = bench(lambda: legacy_parse(fields, output), args.repeat)
+        current = bench(lambda: parse_output(process_infos), args.repeat)
+        lines = output.count("\n") + 1
+        print(f"{name}: {lines:,} lines, {len(output) / 2**20:.1f} MiB")
+        print(f"  previous parser:  {legacy:10,.1f} parses/s")
+        print(
+            f"  FieldParser:      {current:10,.1f} parses/s ({current / legacy:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,15 @@
+import logging
+import os
+import time
 from typing import Any, Dict
 
 from . import prometheus
 
+logger = logging.getLogger(__name__)
+
+# Seconds between two writes of the progress metrics, see `ProgressWriter`
+PROGRESS_INTERVAL = 30
+
 
 def write_metrics(metrics: Dict[str, Any], config: Dict[str, Any]) -> None:
     configuration = config["metrics"]
@@ -10,3 +18,71 @@ def write_metrics(metrics: Dict[str, Any], config: Dict[str, Any]) -> None:
 
         with open(configuration["prometheus"]["path"], "w") as file:
             file.writelines("".join(lines))
+
+
+class ProgressWriter:
+    """
+    Export the progress of the running backups to a separate Prometheus textfile.
+
+    The file is refreshed at most every `progress_interval` seconds while status messages
+    arrive, and replaced atomically so that the collector never reads a partial file. A
+    repository is removed from the file as soon as its backup has finished.
+
+    Attributes:
+        path (str): The `progress_path` of the Prometheus metrics.
+        interval (float): Minimum number of seconds between two writes.
+        name (str): The configuration name for the metrics.
+        progress (dict[str, dict[str, Any]]): The last status message per repository.
+    """
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        """
+        Initialize the ProgressWriter without any running backups.
+
+        Args:
+            config (Dict[str, Any]): The configuration, using the `progress_path` and
+                `progress_interval` settings of `[metrics.prometheus]`.
+        """
+        prometheus_config = config["metrics"]["prometheus"]
+        self.path: str = prometheus_config["progress_path"]
+        self.interval: float = prometheus_config.get(
+            "progress_interval", PROGRESS_INTERVAL
+        )
+        self.name: str = config["name"]
+        self.progress: Dict[str, Dict[str, Any]] = {}
+        self._last_write = 0.0
+
+    def update(self, repo: str, status: Dict[str, Any]) -> None:
+        """
+        Record a status message of a backup and write the file if the interval has passed.
+
+        Args:
+            repo (str): The repository, with the password redacted.
+            status (Dict[str, Any]): The status message of `restic backup --json`.
+        """
+        self.progress[repo] = status | {"last_update": time.time()}
+        if time.monotonic() - self._last_write >= self.interval:
+            self.write()
+
+    def finish(self, repo: str) -> None:
+        """
+        Remove a finished backup from the file.
+
+        Args:
+            repo (str): The repository, with the password redacted.
+        """
+        if self.progress.pop(repo, None) is not None:
+            self.write()
+
+    def write(self) -> None:
+        """
+        Replace the file with the progress of the running backups.
+        """
+        self._last_write = time.monotonic()
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w") as file:
+                file.write(prometheus.progress_metrics(self.progress, self.name))
+            os.replace(temp_path, self.path)
+        except OSError as err:
+            logger.warning("Unable to write the progress to %s: %s", self.path, err)
@@ -9,6 +9,8 @@ forget, prune, check, and stats operations.
 
 from typing import Any, Iterator
 
+from runrestic.restic.results import CommandResult, NewPruneResult
+
 # Prometheus metric templates for general metrics
 _restic_help_general = """
 # HELP restic_last_run Epoch timestamp of the last run
@@ -17,13 +19,60 @@ _restic_help_general = """
 # TYPE restic_total_duration_seconds gauge
 # HELP restic_total_errors Total amount of errors within the last run
 # TYPE restic_total_errors gauge
+# HELP restic_total_timeouts Total amount of command tries killed because of a timeout within the last run
+# TYPE restic_total_timeouts gauge
+# HELP restic_total_skipped Total amount of commands skipped because of a config-wide abort within the last run
+# TYPE restic_total_skipped gauge
 """
 _restic_general = """
 restic_last_run{{config="{name}"}} {last_run}
 restic_total_duration_seconds{{config="{name}"}} {total_duration_seconds}
 restic_total_errors{{config="{name}"}} {errors}
+restic_total_timeouts{{config="{name}"}} {timeouts}
+restic_total_skipped{{config="{name}"}} {skipped}
+"""
+_restic_help_error_categories = """
+# HELP restic_total_error_category Total amount of failed restic tries per error category within the last run
+# TYPE restic_total_error_category gauge
+"""
+_restic_error_category = """restic_total_error_category{{config="{name}",category="{category}"}} {count}
 """
 
+_restic_help_resources = """
+# HELP restic_process_cpu_user_seconds User CPU seconds of the restic command, summed over its tries
+# TYPE restic_process_cpu_user_seconds gauge
+# HELP restic_process_cpu_system_seconds System CPU seconds of the restic command, summed over its tries
+# TYPE restic_process_cpu_system_seconds gauge
+# HELP restic_process_max_rss_bytes Peak resident memory of the restic command
+# TYPE restic_process_max_rss_bytes gauge
+# HELP restic_process_read_bytes Bytes read from storage by the restic command
+# TYPE restic_process_read_bytes gauge
+# HELP restic_process_write_bytes Bytes written to storage by the restic command
+# TYPE restic_process_write_bytes gauge
+# HELP restic_process_voluntary_context_switches Voluntary context switches of the restic command
+# TYPE restic_process_voluntary_context_switches gauge
+# HELP restic_process_involuntary_context_switches Involuntary context switches of the restic command
+# TYPE restic_process_involuntary_context_switches gauge
+"""
+_restic_resources = """
+restic_process_cpu_user_seconds{{config="{name}",action="{action}",repository="{repository}"}} {cpu_user_seconds}
+restic_process_cpu_system_seconds{{config="{name}",action="{action}",repository="{repository}"}} {cpu_system_seconds}
+restic_process_max_rss_bytes{{config="{name}",action="{action}",repository="{repository}"}} {max_rss_bytes}
+restic_process_read_bytes{{config="{name}",action="{action}",repository="{repository}"}} {read_bytes}
+restic_process_write_bytes{{config="{name}",action="{action}",repository="{repository}"}} {write_bytes}
+restic_process_voluntary_context_switches{{config="{name}",action="{action}",repository="{repository}"}} {voluntary_context_switches}
+restic_process_involuntary_context_switches{{config="{name}",action="{action}",repository="{repository}"}} {involuntary_context_switches}
+"""
+RESOURCE_KEYS = (
+    "cpu_user_seconds",
+    "cpu_system_seconds",
+    "max_rss_bytes",
+    "read_bytes",
+    "write_bytes",
+    "voluntary_context_switches",
+    "involuntary_context_switches",
+)
+
 # Additional Prometheus metric templates for specific operations
 _restic_help_pre_hooks = """
 # HELP restic_pre_hooks_duration_seconds Pre hooks duration in seconds
@@ -74,19 +123,78 @@ _restic_help_backup = """
 # TYPE restic_backup_rc gauge
 """
 _restic_backup = """
-restic_backup_files_new{{config="{name}",repository="{repository}"}} {files[new]}
-restic_backup_files_changed{{config="{name}",repository="{repository}"}} {files[changed]}
-restic_backup_files_unmodified{{config="{name}",repository="{repository}"}} {files[unmodified]}
-restic_backup_dirs_new{{config="{name}",repository="{repository}"}} {dirs[new]}
-restic_backup_dirs_changed{{config="{name}",repository="{repository}"}} {dirs[changed]}
-restic_backup_dirs_unmodified{{config="{name}",repository="{repository}"}} {dirs[unmodified]}
-restic_backup_processed_files{{config="{name}",repository="{repository}"}} {processed[files]}
-restic_backup_processed_size_bytes{{config="{name}",repository="{repository}"}} {processed[size_bytes]}
-restic_backup_processed_duration_seconds{{config="{name}",repository="{repository}"}} {processed[duration_seconds]}
-restic_backup_added_to_repo{{config="{name}",repository="{repository}"}} {added_to_repo}
-restic_backup_duration_seconds{{config="{name}",repository="{repository}"}} {duration_seconds}
-restic_backup_rc{{config="{name}",repository="{repository}"}} {rc}
+restic_backup_files_new{{config="{name}",repository="{repository}"}} {r.files.new}
+restic_backup_files_changed{{config="{name}",repository="{repository}"}} {r.files.changed}
+restic_backup_files_unmodified{{config="{name}",repository="{repository}"}} {r.files.unmodified}
+restic_backup_dirs_new{{config="{name}",repository="{repository}"}} {r.dirs.new}
+restic_backup_dirs_changed{{config="{name}",repository="{repository}"}} {r.dirs.changed}
+restic_backup_dirs_unmodified{{config="{name}",repository="{repository}"}} {r.dirs.unmodified}
+restic_backup_processed_files{{config="{name}",repository="{repository}"}} {r.processed.files}
+restic_backup_processed_size_bytes{{config="{name}",repository="{repository}"}} {r.processed.size_bytes}
+restic_backup_processed_duration_seconds{{config="{name}",repository="{repository}"}} {r.processed.duration_seconds}
+restic_backup_added_to_repo{{config="{name}",repository="{repository}"}} {r.added_to_repo}
+restic_backup_duration_seconds{{config="{name}",repository="{repository}"}} {r.duration_seconds}
+restic_backup_rc{{config="{name}",repository="{repository}"}} {r.rc}
+"""
+# the metrics only reported by `restic backup --json`, skipped if restic doesn't report them
+_restic_help_backup_json = {
+    "data_added_packed": """# HELP restic_backup_data_added_packed Bytes added to the repo after compression
+# TYPE restic_backup_data_added_packed gauge
+""",
+    "total_bytes_processed": """# HELP restic_backup_total_bytes_processed Bytes processed by the backup
+# TYPE restic_backup_total_bytes_processed gauge
+""",
+    "data_blobs": """# HELP restic_backup_data_blobs Number of data blobs added
+# TYPE restic_backup_data_blobs gauge
+""",
+    "tree_blobs": """# HELP restic_backup_tree_blobs Number of tree blobs added
+# TYPE restic_backup_tree_blobs gauge
+""",
+}
+_restic_backup_json = """restic_backup_{field}{{config="{name}",repository="{repository}"}} {value}
+"""
+
+_restic_help_backup_progress = """
+# HELP restic_backup_progress_percent_done Share of the running backup which is done, from 0 to 1
+# TYPE restic_backup_progress_percent_done gauge
+# HELP restic_backup_progress_bytes_done Bytes processed by the running backup
+# TYPE restic_backup_progress_bytes_done gauge
+# HELP restic_backup_progress_total_bytes Bytes to be processed by the running backup, as far as scanned
+# TYPE restic_backup_progress_total_bytes gauge
+# HELP restic_backup_progress_files_done Files processed by the running backup
+# TYPE restic_backup_progress_files_done gauge
+# HELP restic_backup_progress_total_files Files to be processed by the running backup, as far as scanned
+# TYPE restic_backup_progress_total_files gauge
+# HELP restic_backup_progress_errors Files which could not be read by the running backup
+# TYPE restic_backup_progress_errors gauge
+# HELP restic_backup_progress_seconds_elapsed Duration of the running backup in seconds
+# TYPE restic_backup_progress_seconds_elapsed gauge
+# HELP restic_backup_progress_seconds_remaining Estimated remaining duration of the running backup in seconds
+# TYPE restic_backup_progress_seconds_remaining gauge
+# HELP restic_backup_progress_last_update Epoch timestamp of the last progress report of the running backup
+# TYPE restic_backup_progress_last_update gauge
 """
+_restic_backup_progress = """
+restic_backup_progress_percent_done{{config="{name}",repository="{repository}"}} {percent_done}
+restic_backup_progress_bytes_done{{config="{name}",repository="{repository}"}} {bytes_done}
+restic_backup_progress_total_bytes{{config="{name}",repository="{repository}"}} {total_bytes}
+restic_backup_progress_files_done{{config="{name}",repository="{repository}"}} {files_done}
+restic_backup_progress_total_files{{config="{name}",repository="{repository}"}} {total_files}
+restic_backup_progress_errors{{config="{name}",repository="{repository}"}} {error_count}
+restic_backup_progress_seconds_elapsed{{config="{name}",repository="{repository}"}} {seconds_elapsed}
+restic_backup_progress_seconds_remaining{{config="{name}",repository="{repository}"}} {seconds_remaining}
+restic_backup_progress_last_update{{config="{name}",repository="{repository}"}} {last_update}
+"""
+PROGRESS_KEYS = (
+    "percent_done",
+    "bytes_done",
+    "total_bytes",
+    "files_done",
+    "total_files",
+    "error_count",
+    "seconds_elapsed",
+    "seconds_remaining",
+)
 
 _restic_help_forget = """
 # HELP restic_forget_removed_snapshots Number of forgotten snapshots
@@ -97,9 +205,9 @@ _restic_help_forget = """
 # TYPE restic_forget_rc gauge
 """
 _restic_forget = """
-restic_forget_removed_snapshots{{config="{name}",repository="{repository}"}} {removed_snapshots}
-restic_forget_duration_seconds{{config="{name}",repository="{repository}"}} {duration_seconds}
-restic_forget_rc{{config="{name}",repository="{repository}"}} {rc}
+restic_forget_removed_snapshots{{config="{name}",repository="{repository}"}} {r.removed_snapshots}
+restic_forget_duration_seconds{{config="{name}",repository="{repository}"}} {r.duration_seconds}
+restic_forget_rc{{config="{name}",repository="{repository}"}} {r.rc}
 """
 
 _restic_help_prune = """
@@ -133,35 +241,35 @@ _restic_help_prune = """
 # TYPE restic_prune_rc gauge
 """
 _restic_prune = """
-restic_prune_containing_packs_before{{config="{name}",repository="{repository}"}} {containing_packs_before}
-restic_prune_containing_blobs{{config="{name}",repository="{repository}"}} {containing_blobs}
-restic_prune_containing_size_bytes{{config="{name}",repository="{repository}"}} {containing_size_bytes}
-restic_prune_duplicate_blobs{{config="{name}",repository="{repository}"}} {duplicate_blobs}
-restic_prune_duplicate_size_bytes{{config="{name}",repository="{repository}"}} {duplicate_size_bytes}
-restic_prune_in_use_blobs{{config="{name}",repository="{repository}"}} {in_use_blobs}
-restic_prune_removed_blobs{{config="{name}",repository="{repository}"}} {removed_blobs}
-restic_prune_invalid_files{{config="{name}",repository="{repository}"}} {invalid_files}
-restic_prune_deleted_packs{{config="{name}",repository="{repository}"}} {deleted_packs}
-restic_prune_rewritten_packs{{config="{name}",repository="{repository}"}} {rewritten_packs}
-restic_prune_size_freed_bytes{{config="{name}",repository="{repository}"}} {size_freed_bytes}
-restic_prune_removed_index_files{{config="{name}",repository="{repository}"}} {removed_index_files}
-restic_prune_duration_seconds{{config="{name}",repository="{repository}"}} {duration_seconds}
-restic_prune_rc{{config="{name}",repository="{repository}"}} {rc}
+restic_prune_containing_packs_before{{config="{name}",repository="{repository}"}} {r.containing_packs_before}
+restic_prune_containing_blobs{{config="{name}",repository="{repository}"}} {r.containing_blobs}
+restic_prune_containing_size_bytes{{config="{name}",repository="{repository}"}} {r.containing_size_bytes}
+restic_prune_duplicate_blobs{{config="{name}",repository="{repository}"}} {r.duplicate_blobs}
+restic_prune_duplicate_size_bytes{{config="{name}",repository="{repository}"}} {r.duplicate_size_bytes}
+restic_prune_in_use_blobs{{config="{name}",repository="{repository}"}} {r.in_use_blobs}
+restic_prune_removed_blobs{{config="{name}",repository="{repository}"}} {r.removed_blobs}
+restic_prune_invalid_files{{config="{name}",repository="{repository}"}} {r.invalid_files}
+restic_prune_deleted_packs{{config="{name}",repository="{repository}"}} {r.deleted_packs}
+restic_prune_rewritten_packs{{config="{name}",repository="{repository}"}} {r.rewritten_packs}
+restic_prune_size_freed_bytes{{config="{name}",repository="{repository}"}} {r.size_freed_bytes}
+restic_prune_removed_index_files{{config="{name}",repository="{repository}"}} {r.removed_index_files}
+restic_prune_duration_seconds{{config="{name}",repository="{repository}"}} {r.duration_seconds}
+restic_prune_rc{{config="{name}",repository="{repository}"}} {r.rc}
 """
 _restic_new_prune = """
-restic_prune_to_repack_blobs{{config="{name}",repository="{repository}"}} {to_repack_blobs}
-restic_prune_to_repack_bytes{{config="{name}",repository="{repository}"}} {to_repack_bytes}
-restic_prune_removed_blobs{{config="{name}",repository="{repository}"}} {removed_blobs}
-restic_prune_removed_bytes{{config="{name}",repository="{repository}"}} {removed_bytes}
-restic_prune_to_delete_blobs{{config="{name}",repository="{repository}"}} {to_delete_blobs}
-restic_prune_to_delete_bytes{{config="{name}",repository="{repository}"}} {to_delete_bytes}
-restic_prune_total_prune_blobs{{config="{name}",repository="{repository}"}} {total_prune_blobs}
-restic_prune_total_prune_bytes{{config="{name}",repository="{repository}"}} {total_prune_bytes}
-restic_prune_remaining_blobs{{config="{name}",repository="{repository}"}} {remaining_blobs}
-restic_prune_remaining_bytes{{config="{name}",repository="{repository}"}} {remaining_bytes}
-restic_prune_remaining_unused_size{{config="{name}",repository="{repository}"}} {remaining_unused_size}
-restic_prune_duration_seconds{{config="{name}",repository="{repository}"}} {duration_seconds}
-restic_prune_rc{{config="{name}",repository="{repository}"}} {rc}
+restic_prune_to_repack_blobs{{config="{name}",repository="{repository}"}} {r.to_repack_blobs}
+restic_prune_to_repack_bytes{{config="{name}",repository="{repository}"}} {r.to_repack_bytes}
+restic_prune_removed_blobs{{config="{name}",repository="{repository}"}} {r.removed_blobs}
+restic_prune_removed_bytes{{config="{name}",repository="{repository}"}} {r.removed_bytes}
+restic_prune_to_delete_blobs{{config="{name}",repository="{repository}"}} {r.to_delete_blobs}
+restic_prune_to_delete_bytes{{config="{name}",repository="{repository}"}} {r.to_delete_bytes}
+restic_prune_total_prune_blobs{{config="{name}",repository="{repository}"}} {r.total_prune_blobs}
+restic_prune_total_prune_bytes{{config="{name}",repository="{repository}"}} {r.total_prune_bytes}
+restic_prune_remaining_blobs{{config="{name}",repository="{repository}"}} {r.remaining_blobs}
+restic_prune_remaining_bytes{{config="{name}",repository="{repository}"}} {r.remaining_bytes}
+restic_prune_remaining_unused_size{{config="{name}",repository="{repository}"}} {r.remaining_unused_size}
+restic_prune_duration_seconds{{config="{name}",repository="{repository}"}} {r.duration_seconds}
+restic_prune_rc{{config="{name}",repository="{repository}"}} {r.rc}
 """
 
 _restic_help_check = """
@@ -181,13 +289,13 @@ _restic_help_check = """
 # TYPE restic_check_rc gauge
 """
 _restic_check = """
-restic_check_errors{{config="{name}",repository="{repository}"}} {errors}
-restic_check_errors_data{{config="{name}",repository="{repository}"}} {errors_data}
-restic_check_errors_snapshots{{config="{name}",repository="{repository}"}} {errors_snapshots}
-restic_check_read_data{{config="{name}",repository="{repository}"}} {read_data}
-restic_check_check_unused{{config="{name}",repository="{repository}"}} {check_unused}
-restic_check_duration_seconds{{config="{name}",repository="{repository}"}} {duration_seconds}
-restic_check_rc{{config="{name}",repository="{repository}"}} {rc}
+restic_check_errors{{config="{name}",repository="{repository}"}} {r.errors}
+restic_check_errors_data{{config="{name}",repository="{repository}"}} {r.errors_data}
+restic_check_errors_snapshots{{config="{name}",repository="{repository}"}} {r.errors_snapshots}
+restic_check_read_data{{config="{name}",repository="{repository}"}} {r.read_data}
+restic_check_check_unused{{config="{name}",repository="{repository}"}} {r.check_unused}
+restic_check_duration_seconds{{config="{name}",repository="{repository}"}} {r.duration_seconds}
+restic_check_rc{{config="{name}",repository="{repository}"}} {r.rc}
 """
 
 _restic_help_stats = """
@@ -201,10 +309,10 @@ _restic_help_stats = """
 # TYPE restic_stats_rc gauge
 """
 _restic_stats = """
-restic_stats_total_file_count{{config="{name}",repository="{repository}"}} {total_file_count}
-restic_stats_total_size_bytes{{config="{name}",repository="{repository}"}} {total_size_bytes}
-restic_stats_duration_seconds{{config="{name}",repository="{repository}"}} {duration_seconds}
-restic_stats_rc{{config="{name}",repository="{repository}"}} {rc}
+restic_stats_total_file_count{{config="{name}",repository="{repository}"}} {r.total_file_count}
+restic_stats_total_size_bytes{{config="{name}",repository="{repository}"}} {r.total_size_bytes}
+restic_stats_duration_seconds{{config="{name}",repository="{repository}"}} {r.duration_seconds}
+restic_stats_rc{{config="{name}",repository="{repository}"}} {r.rc}
 """
 
 
@@ -221,6 +329,12 @@ def generate_lines(metrics: dict[str, Any], name: str) -> Iterator[str]:
     """
     yield _restic_help_general
     yield _restic_general.format(name=name, **metrics)
+    if metrics.get("error_categories"):
+        yield _restic_help_error_categories
+        for category, count in metrics["error_categories"].items():
+            yield _restic_error_category.format(
+                name=name, category=category, count=count
+            )
 
     if metrics.get("backup"):
         yield backup_metrics(metrics["backup"], name)
@@ -232,6 +346,30 @@ def generate_lines(metrics: dict[str, Any], name: str) -> Iterator[str]:
         yield check_metrics(metrics["check"], name)
     if metrics.get("stats"):
         yield stats_metrics(metrics["stats"], name)
+    if resources := resource_metrics(metrics, name):
+        yield resources
+
+
+def resource_metrics(metrics: dict[str, Any], name: str) -> str:
+    """
+    Generate Prometheus metrics for the resource usage of the Restic commands.
+
+    Args:
+        metrics (dict[str, Any]): A dictionary containing parsed Restic metrics.
+        name (str): The configuration name for the metrics.
+
+    Returns:
+        str: Prometheus-formatted resource metrics, empty if no usage was recorded.
+    """
+    retval = ""
+    for action in ("backup", "forget", "prune", "check", "stats"):
+        for repo, mtrx in metrics.get(action, {}).items():
+            if isinstance(mtrx, CommandResult) and mtrx.resources:
+                usage = dict.fromkeys(RESOURCE_KEYS, 0) | mtrx.resources
+                retval += _restic_resources.format(
+                    name=name, action=action, repository=repo, **usage
+                )
+    return _restic_help_resources + retval if retval else ""
 
 
 def backup_metrics(metrics: dict[str, Any], name: str) -> str:
@@ -246,6 +384,7 @@ def backup_metrics(metrics: dict[str, Any], name: str) -> str:
         str: Prometheus-formatted backup metrics.
     """
     pre_hooks = post_hooks = False
+    json_fields: set[str] = set()
     retval = ""
     for repo, mtrx in metrics.items():
         if repo == "_restic_pre_hooks":
@@ -254,13 +393,26 @@ def backup_metrics(metrics: dict[str, Any], name: str) -> str:
         elif repo == "_restic_post_hooks":
             post_hooks = True
             retval += _restic_post_hooks.format(name=name, **mtrx)
+        elif mtrx.rc != 0:
+            retval += (
+                f'restic_backup_rc{{config="{name}",repository="{repo}"}} {mtrx.rc}\n'
+            )
         else:
-            if mtrx["rc"] != 0:
-                retval += f'restic_backup_rc{{config="{name}",repository="{repo}"}} {mtrx["rc"]}\n'
-            else:
-                retval += _restic_backup.format(name=name, repository=repo, **mtrx)
+            retval += _restic_backup.format(name=name, repository=repo, r=mtrx)
+            for field in _restic_help_backup_json:
+                if (value := getattr(mtrx, field)) is not None:
+                    json_fields.add(field)
+                    retval += _restic_backup_json.format(
+                        field=field, name=name, repository=repo, value=value
+                    )
 
     help_text = _restic_help_backup
+    if json_fields:
+        help_text += "\n" + "".join(
+            text
+            for field, text in _restic_help_backup_json.items()
+            if field in json_fields
+        )
     if pre_hooks:
         help_text += _restic_help_pre_hooks
     if post_hooks:
@@ -268,6 +420,29 @@ def backup_metrics(metrics: dict[str, Any], name: str) -> str:
     return help_text + retval
 
 
+def progress_metrics(progress: dict[str, Any], name: str) -> str:
+    """
+    Generate Prometheus metrics for the progress of the running Restic backups.
+
+    Args:
+        progress (dict[str, Any]): The last status message of `restic backup --json` per
+            repository, with the `last_update` timestamp.
+        name (str): The configuration name for the metrics.
+
+    Returns:
+        str: Prometheus-formatted progress metrics, empty if no backup is running.
+    """
+    retval = ""
+    for repo, status in progress.items():
+        values = dict.fromkeys(PROGRESS_KEYS, 0) | {
+            key: status[key] for key in PROGRESS_KEYS if key in status
+        }
+        retval += _restic_backup_progress.format(
+            name=name, repository=repo, last_update=status["last_update"], **values
+        )
+    return _restic_help_backup_progress + retval if retval else ""
+
+
 def forget_metrics(metrics: dict[str, Any], name: str) -> str:
     """
     Generate Prometheus metrics for Restic forget operations.
@@ -281,10 +456,12 @@ def forget_metrics(metrics: dict[str, Any], name: str) -> str:
     """
     retval = _restic_help_forget
     for repo, mtrx in metrics.items():
-        if mtrx["rc"] != 0:
-            retval += f'restic_forget_rc{{config="{name}",repository="{repo}"}} {mtrx["rc"]}\n'
+        if mtrx.rc != 0:
+            retval += (
+                f'restic_forget_rc{{config="{name}",repository="{repo}"}} {mtrx.rc}\n'
+            )
         else:
-            retval += _restic_forget.format(name=name, repository=repo, **mtrx)
+            retval += _restic_forget.format(name=name, repository=repo, r=mtrx)
     return retval
 
 
@@ -301,15 +478,14 @@ def prune_metrics(metrics: dict[str, Any], name: str) -> str:
     """
     retval = _restic_help_prune
     for repo, mtrx in metrics.items():
-        if mtrx["rc"] != 0:
+        if mtrx.rc != 0:
             retval += (
-                f'restic_prune_rc{{config="{name}",repository="{repo}"}} {mtrx["rc"]}\n'
+                f'restic_prune_rc{{config="{name}",repository="{repo}"}} {mtrx.rc}\n'
             )
+        elif isinstance(mtrx, NewPruneResult):
+            retval += _restic_new_prune.format(name=name, repository=repo, r=mtrx)
         else:
-            try:
-                retval += _restic_prune.format(name=name, repository=repo, **mtrx)
-            except KeyError:
-                retval += _restic_new_prune.format(name=name, repository=repo, **mtrx)
+            retval += _restic_prune.format(name=name, repository=repo, r=mtrx)
     return retval
 
 
@@ -326,12 +502,12 @@ def check_metrics(metrics: dict[str, Any], name: str) -> str:
     """
     retval = _restic_help_check
     for repo, mtrx in metrics.items():
-        if mtrx["rc"] != 0:
+        if mtrx.rc != 0:
             retval += (
-                f'restic_check_rc{{config="{name}",repository="{repo}"}} {mtrx["rc"]}\n'
+                f'restic_check_rc{{config="{name}",repository="{repo}"}} {mtrx.rc}\n'
             )
         else:
-            retval += _restic_check.format(name=name, repository=repo, **mtrx)
+            retval += _restic_check.format(name=name, repository=repo, r=mtrx)
     return retval
 
 
@@ -348,10 +524,10 @@ def stats_metrics(metrics: dict[str, Any], name: str) -> str:
     """
     retval = _restic_help_stats
     for repo, mtrx in metrics.items():
-        if mtrx["rc"] != 0:
+        if mtrx.rc != 0:
             retval += (
-                f'restic_stats_rc{{config="{name}",repository="{repo}"}} {mtrx["rc"]}\n'
+                f'restic_stats_rc{{config="{name}",repository="{repo}"}} {mtrx.rc}\n'
             )
         else:
-            retval += _restic_stats.format(name=name, repository=repo, **mtrx)
+            retval += _restic_stats.format(name=name, repository=repo, r=mtrx)
     return retval
@@ -0,0 +1,309 @@
+"""
+This module provides the `SnapshotCatalog`, a local SQLite copy of the snapshot list of a
+repository, which can be queried by host, path, tag and time without accessing the repository.
+
+The catalog of a repository is stored in `$XDG_CACHE_HOME/runrestic/catalog/`, named after the
+`repository_digest`. It is refreshed from `restic snapshots --json` by the runner, and only
+written if snapshots have been added or removed since the last refresh.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+from datetime import datetime
+from typing import Any
+
+from runrestic.runrestic.tools import cache_directory, repository_digest
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION = 1
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id TEXT PRIMARY KEY,
+    time REAL NOT NULL,
+    hostname TEXT,
+    username TEXT,
+    parent TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS paths (
+    snapshot_id TEXT NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    snapshot_id TEXT NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_time ON snapshots (time);
+CREATE INDEX IF NOT EXISTS snapshots_hostname_time ON snapshots (hostname, time);
+CREATE INDEX IF NOT EXISTS paths_path ON paths (path, snapshot_id);
+CREATE INDEX IF NOT EXISTS paths_snapshot_id ON paths (snapshot_id);
+CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag, snapshot_id);
+CREATE INDEX IF NOT EXISTS tags_snapshot_id ON tags (snapshot_id);
+"""
+# restic reports nanoseconds, which `datetime.fromisoformat` doesn't parse
+RE_SNAPSHOT_TIME = re.compile(r"(.*T\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)?$")
+
+
+def parse_snapshot_datetime(time_str: str) -> datetime:
+    """
+    Parse the time of a restic snapshot, keeping the time zone in which it was recorded.
+
+    Args:
+        time_str (str): The time in RFC 3339 format with up to nanoseconds.
+
+    Returns:
+        datetime: The time with its UTC offset, truncated to microseconds.
+
+    Raises:
+        ValueError: If the time is not in RFC 3339 format.
+
+    Examples:
+        >>> time = parse_snapshot_datetime("2024-01-02T03:04:05.123456789+01:00")
+        >>> time.hour, time.microsecond, time.utcoffset()
+        (3, 123456, datetime.timedelta(seconds=3600))
+    """
+    match = RE_SNAPSHOT_TIME.match(time_str)
+    if not match:
+        raise ValueError(f"Invalid snapshot time: {time_str}")
+    seconds, fraction, offset = match.groups()
+    fraction = (fraction or "")[:6].ljust(6, "0")
+    offset = "+00:00" if offset in (None, "Z") else offset
+    return datetime.fromisoformat(f"{seconds}.{fraction}{offset}")
+
+
+def parse_snapshot_time(time_str: str) -> float:
+    """
+    Parse the time of a restic snapshot.
+
+    Args:
+        time_str (str): The time in RFC 3339 format with up to nanoseconds.
+
+    Returns:
+        float: The time as epoch timestamp.
+
+    Raises:
+        ValueError: If the time is not in RFC 3339 format.
+
+    Examples:
+        >>> parse_snapshot_time("2024-01-02T03:04:05.123456789+01:00")
+        1704161045.123456
+        >>> parse_snapshot_time("2024-01-02T02:04:05Z")
+        1704161045.0
+    """
+    return parse_snapshot_datetime(time_str).timestamp()
+
+
+class SnapshotCatalog:
+    """
+    The local catalog of the snapshots of one repository.
+
+    Attributes:
+        path (str): The SQLite database of the catalog.
+        connection (sqlite3.Connection): The connection to the database.
+    """
+
+    def __init__(self, repo: str) -> None:
+        """
+        Open the catalog of a repository, creating it if it doesn't exist yet.
+
+        Args:
+            repo (str): The repository.
+        """
+        self.path = self.catalog_path(repo)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        if version != CATALOG_VERSION:
+            # an outdated catalog is only a cache, so it is rebuilt from scratch
+            self.connection.executescript(
+                "DROP TABLE IF EXISTS tags; DROP TABLE IF EXISTS paths;"
+                " DROP TABLE IF EXISTS snapshots;"
+            )
+            self.connection.executescript(CATALOG_SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+
+    @staticmethod
+    def catalog_path(repo: str) -> str:
+        """
+        Get the path of the catalog of a repository.
+
+        Args:
+            repo (str): The repository.
+
+        Returns:
+            str: The path of the SQLite database, which may not exist yet.
+        """
+        return os.path.join(
+            cache_directory(), "catalog", f"{repository_digest(repo)}.sqlite"
+        )
+
+    def __enter__(self) -> "SnapshotCatalog":
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the connection to the database.
+        """
+        self.connection.close()
+
+    def snapshot_ids(self) -> set[str]:
+        """
+        Get the IDs of all snapshots in the catalog.
+
+        Returns:
+            set[str]: The snapshot IDs.
+        """
+        return {row[0] for row in self.connection.execute("SELECT id FROM snapshots")}
+
+    def update(self, snapshots: list[dict[str, Any]]) -> bool:
+        """
+        Synchronize the catalog with the snapshot list of the repository, only adding the
+        new and removing the forgotten snapshots.
+
+        Args:
+            snapshots (list[dict[str, Any]]): All snapshots, as listed by
+                `restic snapshots --json`.
+
+        Returns:
+            bool: True if the catalog has changed.
+        """
+        current = {snapshot["id"]: snapshot for snapshot in snapshots}
+        cataloged = self.snapshot_ids()
+        removed = cataloged - current.keys()
+        added = [current[snapshot_id] for snapshot_id in current.keys() - cataloged]
+        if not removed and not added:
+            return False
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM snapshots WHERE id = ?", [(id_,) for id_ in removed]
+            )
+            self.connection.executemany(
+                "INSERT INTO snapshots (id, time, hostname, username, parent, data)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        snapshot["id"],
+                        parse_snapshot_time(snapshot["time"]),
+                        snapshot.get("hostname"),
+                        snapshot.get("username"),
+                        snapshot.get("parent"),
+                        json.dumps(snapshot),
+                    )
+                    for snapshot in added
+                ],
+            )
+            self.connection.executemany(
+                "INSERT INTO paths (snapshot_id, path) VALUES (?, ?)",
+                [
+                    (snapshot["id"], path)
+                    for snapshot in added
+                    for path in snapshot.get("paths") or []
+                ],
+            )
+            self.connection.executemany(
+                "INSERT INTO tags (snapshot_id, tag) VALUES (?, ?)",
+                [
+                    (snapshot["id"], tag)
+                    for snapshot in added
+                    for tag in snapshot.get("tags") or []
+                ],
+            )
+        logger.debug(
+            "Snapshot catalog %s: %d added, %d removed",
+            self.path,
+            len(added),
+            len(removed),
+        )
+        return True
+
+    def snapshots(
+        self,
+        hostname: str | None = None,
+        path: str | None = None,
+        tag: str | None = None,
+        since: float | None = None,
+        until: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Query the snapshots, oldest first.
+
+        Args:
+            hostname (str | None): Only the snapshots of this host.
+            path (str | None): Only the snapshots containing this path.
+            tag (str | None): Only the snapshots with this tag.
+            since (float | None): Only the snapshots taken at or after this epoch timestamp.
+            until (float | None): Only the snapshots taken before this epoch timestamp.
+
+        Returns:
+            list[dict[str, Any]]: The snapshots, as listed by `restic snapshots --json`.
+        """
+        where, parameters = self._filter(hostname, path, tag, since, until)
+        rows = self.connection.execute(
+            f"SELECT data FROM snapshots{where} ORDER BY time", parameters
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def latest(
+        self,
+        hostname: str | None = None,
+        path: str | None = None,
+        tag: str | None = None,
+    ) -> dict[str, Any] | None:
+        """
+        Get the latest snapshot, e.g. for freshness checks or as parent of a backup.
+
+        Args:
+            hostname (str | None): Only the snapshots of this host.
+            path (str | None): Only the snapshots containing this path.
+            tag (str | None): Only the snapshots with this tag.
+
+        Returns:
+            dict[str, Any] | None: The latest snapshot, None if there is none.
+        """
+        where, parameters = self._filter(hostname, path, tag, None, None)
+        row = self.connection.execute(
+            f"SELECT data FROM snapshots{where} ORDER BY time DESC LIMIT 1", parameters
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _filter(
+        hostname: str | None,
+        path: str | None,
+        tag: str | None,
+        since: float | None,
+        until: float | None,
+    ) -> tuple[str, list[Any]]:
+        """
+        Build the WHERE clause of a query, see `snapshots`.
+
+        Returns:
+            tuple[str, list[Any]]: The clause, empty without conditions, and its parameters.
+        """
+        conditions = []
+        parameters: list[Any] = []
+        if hostname is not None:
+            conditions.append("hostname = ?")
+            parameters.append(hostname)
+        if path is not None:
+            conditions.append("id IN (SELECT snapshot_id FROM paths WHERE path = ?)")
+            parameters.append(path)
+        if tag is not None:
+            conditions.append("id IN (SELECT snapshot_id FROM tags WHERE tag = ?)")
+            parameters.append(tag)
+        if since is not None:
+            conditions.append("time >= ?")
+            parameters.append(since)
+        if until is not None:
+            conditions.append("time < ?")
+            parameters.append(until)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, parameters
@@ -0,0 +1,358 @@
+"""
+This module simulates `restic forget` on a snapshot list, e.g. on the local `SnapshotCatalog`,
+to preview which snapshots a `[prune]` policy would remove without accessing the repository.
+
+The snapshots are grouped like `--group-by` and the policy is applied per group like
+restic's `ApplyPolicy`: newest first, every snapshot starting a new hour, day, week, month or
+year is kept while the counter of that `keep-*` option has some left, and the snapshots with
+a `keep-tag` or within a `keep-within*` duration of the latest snapshot of the group are kept
+as well. The time buckets use the time zone in which each snapshot has been recorded.
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from runrestic.restic.catalog import parse_snapshot_datetime
+
+DEFAULT_GROUP_BY = "host,paths"
+GROUP_BY_FIELDS = ("host", "paths", "tags")
+RE_DURATION = re.compile(r"(\d+)([ymdh])")
+# host, sorted paths and sorted tags of a group, None if not grouped by paths or tags
+GroupKey = tuple[str, tuple[str, ...] | None, tuple[str, ...] | None]
+
+
+def _hour(time: datetime, _nr: int) -> int:
+    return time.year * 1000000 + time.month * 10000 + time.day * 100 + time.hour
+
+
+def _day(time: datetime, _nr: int) -> int:
+    return time.year * 10000 + time.month * 100 + time.day
+
+
+def _week(time: datetime, _nr: int) -> int:
+    year, week, _ = time.isocalendar()
+    return year * 100 + week
+
+
+def _month(time: datetime, _nr: int) -> int:
+    return time.year * 100 + time.month
+
+
+def _year(time: datetime, _nr: int) -> int:
+    return time.year
+
+
+# the keep-* options counting snapshots: the bucket of the nr-th newest snapshot, a snapshot
+# starting a new bucket is kept, and the reason reported by restic
+BUCKETS: dict[str, tuple[Callable[[datetime, int], int], str]] = {
+    "keep-last": (lambda _time, nr: nr, "last snapshot"),
+    "keep-hourly": (_hour, "hourly snapshot"),
+    "keep-daily": (_day, "daily snapshot"),
+    "keep-weekly": (_week, "weekly snapshot"),
+    "keep-monthly": (_month, "monthly snapshot"),
+    "keep-yearly": (_year, "yearly snapshot"),
+}
+WITHIN_BUCKETS = {
+    f"keep-within-{unit}": (BUCKETS[f"keep-{unit}"][0], f"{unit} within")
+    for unit in ("hourly", "daily", "weekly", "monthly", "yearly")
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Duration:
+    """
+    A duration of `--keep-within`, in calendar units like restic.
+    """
+
+    years: int = 0
+    months: int = 0
+    days: int = 0
+    hours: int = 0
+
+    def __str__(self) -> str:
+        parts = zip((self.years, self.months, self.days, self.hours), "ymdh")
+        return "".join(f"{value}{unit}" for value, unit in parts if value)
+
+    def before(self, time: datetime) -> datetime:
+        """
+        Subtract the duration from a time, normalizing overflowing days like Go's
+        `AddDate`, e.g. one month before March 31 is March 3 (or 2 in leap years).
+
+        Args:
+            time (datetime): The time.
+
+        Returns:
+            datetime: The time minus the duration.
+        """
+        year, month = divmod(
+            time.year * 12 + time.month - 1 - self.years * 12 - self.months, 12
+        )
+        first_of_month = time.replace(year=year, month=month + 1, day=1)
+        return first_of_month + timedelta(
+            days=time.day - 1 - self.days, hours=-self.hours
+        )
+
+
+def parse_duration(value: str) -> Duration:
+    """
+    Parse a duration of `--keep-within`.
+
+    Args:
+        value (str): The duration, numbers with the units y, m, d and h.
+
+    Returns:
+        Duration: The parsed duration.
+
+    Raises:
+        ValueError: If the duration is invalid.
+
+    Examples:
+        >>> parse_duration("1y6m")
+        Duration(years=1, months=6, days=0, hours=0)
+        >>> str(parse_duration("2d12h"))
+        '2d12h'
+    """
+    if not value or RE_DURATION.sub("", value):
+        raise ValueError(f"Invalid duration: {value}")
+    units = {unit: 0 for unit in "ymdh"}
+    for number, unit in RE_DURATION.findall(value):
+        units[unit] += int(number)
+    return Duration(units["y"], units["m"], units["d"], units["h"])
+
+
+@dataclass(frozen=True, slots=True)
+class ForgetPolicy:
+    """
+    The `keep-*` options of a `[prune]` configuration.
+
+    Attributes:
+        counts (dict[str, int]): The keep-last to keep-yearly counts, -1 for unlimited.
+        within (Duration | None): The duration of keep-within.
+        within_buckets (dict[str, Duration]): The durations of keep-within-hourly etc.
+        tags (list[list[str]]): The tag lists of keep-tag, a snapshot has to have all tags
+            of one list.
+    """
+
+    counts: dict[str, int] = field(default_factory=dict)
+    within: Duration | None = None
+    within_buckets: dict[str, Duration] = field(default_factory=dict)
+    tags: list[list[str]] = field(default_factory=list)
+
+    @classmethod
+    def from_config(cls, prune_config: dict[str, Any]) -> "ForgetPolicy":
+        """
+        Build the policy from the `[prune]` configuration.
+
+        Args:
+            prune_config (dict[str, Any]): The prune configuration, other keys than
+                `keep-*` are ignored.
+
+        Returns:
+            ForgetPolicy: The policy.
+
+        Raises:
+            ValueError: If a `keep-*` option is unknown or has an invalid value.
+        """
+        counts: dict[str, int] = {}
+        within: Duration | None = None
+        within_buckets: dict[str, Duration] = {}
+        tags: list[list[str]] = []
+        for key, value in prune_config.items():
+            if not key.startswith("keep-"):
+                continue
+            if key in BUCKETS:
+                counts[key] = int(value)
+            elif key == "keep-within":
+                within = parse_duration(str(value))
+            elif key in WITHIN_BUCKETS:
+                within_buckets[key] = parse_duration(str(value))
+            elif key == "keep-tag":
+                tag_lists = value if isinstance(value, list) else [value]
+                tags += [str(tag_list).split(",") for tag_list in tag_lists]
+            else:
+                raise ValueError(f"Unknown forget policy option: {key}")
+        return cls(counts, within, within_buckets, tags)
+
+    @property
+    def empty(self) -> bool:
+        """
+        Whether the policy keeps nothing, in which case restic doesn't remove anything.
+        """
+        return (
+            not any(self.counts.values())
+            and self.within is None
+            and not self.within_buckets
+            and not self.tags
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class ForgetGroup:
+    """
+    The outcome of the simulated `restic forget` for one group of snapshots.
+
+    Attributes:
+        host (str): The host of the group, empty if not grouped by host.
+        paths (list[str] | None): The sorted paths of the group, None if not grouped by paths.
+        tags (list[str] | None): The sorted tags of the group, None if not grouped by tags.
+        keep (list[dict[str, Any]]): The kept snapshots, newest first.
+        remove (list[dict[str, Any]]): The removed snapshots, newest first.
+        reasons (dict[str, list[str]]): The reasons to keep each kept snapshot, by ID.
+    """
+
+    host: str
+    paths: list[str] | None
+    tags: list[str] | None
+    keep: list[dict[str, Any]] = field(default_factory=list)
+    remove: list[dict[str, Any]] = field(default_factory=list)
+    reasons: dict[str, list[str]] = field(default_factory=dict)
+
+
+def parse_group_by(group_by: str) -> set[str]:
+    """
+    Parse the `--group-by` option.
+
+    Args:
+        group_by (str): Comma separated fields out of host, paths and tags, empty to apply
+            the policy to all snapshots at once.
+
+    Returns:
+        set[str]: The fields.
+
+    Raises:
+        ValueError: If a field is unknown.
+
+    Examples:
+        >>> sorted(parse_group_by("host,tag"))
+        ['host', 'tags']
+    """
+    fields = set()
+    for name in filter(None, (part.strip() for part in group_by.split(","))):
+        name = name if name.endswith("s") else f"{name}s"
+        if name == "hosts":
+            name = "host"
+        if name not in GROUP_BY_FIELDS:
+            raise ValueError(f"Invalid group-by field: {name}")
+        fields.add(name)
+    return fields
+
+
+def apply_policy(
+    snapshots: list[dict[str, Any]], policy: ForgetPolicy, keep_oldest: bool = True
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]], dict[str, list[str]]]:
+    """
+    Apply a forget policy to one group of snapshots, like restic's `ApplyPolicy`.
+
+    Args:
+        snapshots (list[dict[str, Any]]): The snapshots of the group, in any order.
+        policy (ForgetPolicy): The policy.
+        keep_oldest (bool): Whether the oldest snapshot is kept by every `keep-*` count
+            which isn't used up, like restic 0.17.0 and later.
+
+    Returns:
+        tuple[list[dict[str, Any]], list[dict[str, Any]], dict[str, list[str]]]: The kept
+            and the removed snapshots, newest first, and the reasons to keep each kept
+            snapshot by ID.
+    """
+    times = {
+        id(snapshot): parse_snapshot_datetime(snapshot["time"])
+        for snapshot in snapshots
+    }
+    ordered = sorted(snapshots, key=lambda snapshot: times[id(snapshot)], reverse=True)
+    if policy.empty:
+        return ordered, [], {}
+
+    counts = dict(policy.counts)
+    last_buckets: dict[str, int | None] = {
+        key: None for key in [*BUCKETS, *WITHIN_BUCKETS]
+    }
+    latest = times[id(ordered[0])]
+    keep: list[dict[str, Any]] = []
+    remove: list[dict[str, Any]] = []
+    reasons: dict[str, list[str]] = {}
+    for nr, snapshot in enumerate(ordered):
+        time = times[id(snapshot)]
+        oldest = keep_oldest and nr == len(ordered) - 1
+        snapshot_reasons = []
+        snapshot_tags = set(snapshot.get("tags") or [])
+        for tag_list in policy.tags:
+            if snapshot_tags.issuperset(tag_list):
+                snapshot_reasons.append(f"has tags [{' '.join(tag_list)}]")
+        if policy.within is not None and time > policy.within.before(latest):
+            snapshot_reasons.append(f"within {policy.within}")
+        for key, (bucket_of, reason) in BUCKETS.items():
+            if counts.get(key, 0) > 0 or counts.get(key) == -1:
+                bucket = bucket_of(time, nr)
+                if bucket != last_buckets[key] or oldest:
+                    if bucket == last_buckets[key]:
+                        reason = f"oldest {reason}"
+                    last_buckets[key] = bucket
+                    if counts[key] > 0:
+                        counts[key] -= 1
+                    snapshot_reasons.append(reason)
+        for key, duration in policy.within_buckets.items():
+            if time > duration.before(latest):
+                bucket_of, reason = WITHIN_BUCKETS[key]
+                bucket = bucket_of(time, nr)
+                if bucket != last_buckets[key]:
+                    last_buckets[key] = bucket
+                    snapshot_reasons.append(f"{reason} {duration}")
+        if snapshot_reasons:
+            keep.append(snapshot)
+            reasons[snapshot["id"]] = snapshot_reasons
+        else:
+            remove.append(snapshot)
+    return keep, remove, reasons
+
+
+def simulate_forget(
+    snapshots: list[dict[str, Any]],
+    prune_config: dict[str, Any],
+    keep_oldest: bool = True,
+) -> list[ForgetGroup]:
+    """
+    Simulate `restic forget` with the policy of a `[prune]` configuration.
+
+    Args:
+        snapshots (list[dict[str, Any]]): All snapshots of the repository, as listed by
+            `restic snapshots --json`.
+        prune_config (dict[str, Any]): The prune configuration with the `keep-*` options
+            and the optional `group-by`.
+        keep_oldest (bool): Whether the oldest snapshot of a group is kept by every
+            `keep-*` count which isn't used up, see `apply_policy`.
+
+    Returns:
+        list[ForgetGroup]: The outcome per group, sorted by host, paths and tags.
+
+    Raises:
+        ValueError: If the configuration or the time of a snapshot is invalid.
+    """
+    policy = ForgetPolicy.from_config(prune_config)
+    fields = parse_group_by(prune_config.get("group-by", DEFAULT_GROUP_BY))
+    groups: dict[GroupKey, list[dict[str, Any]]] = {}
+    for snapshot in snapshots:
+        key = (
+            snapshot.get("hostname", "") if "host" in fields else "",
+            tuple(sorted(snapshot.get("paths") or [])) if "paths" in fields else None,
+            tuple(sorted(snapshot.get("tags") or [])) if "tags" in fields else None,
+        )
+        groups.setdefault(key, []).append(snapshot)
+
+    result = []
+    for (host, paths, tags), group in sorted(
+        groups.items(), key=lambda item: repr(item[0])
+    ):
+        keep, remove, reasons = apply_policy(group, policy, keep_oldest)
+        result.append(
+            ForgetGroup(
+                host,
+                None if paths is None else list(paths),
+                None if tags is None else list(tags),
+                keep,
+                remove,
+                reasons,
+            )
+        )
+    return result
@@ -2,21 +2,173 @@
 This module provides functions to parse the output of various Restic commands.
 
 Each function extracts relevant information from the command output and returns it
-in a structured format, such as dictionaries. These functions are used to process
-the output of commands like `backup`, `forget`, `prune`, and `stats`.
+as one of the typed results of `runrestic.restic.results`. These functions are used to
+process the output of commands like `backup`, `forget`, `prune`, and `stats`.
 """
 
 import json
 import logging
 import re
-from typing import Any
+from typing import Any, Callable
 
-from runrestic.runrestic.tools import parse_line, parse_size, parse_time
+from runrestic.restic.results import (
+    BackupResult,
+    CommandResult,
+    Counts,
+    ForgetResult,
+    NewPruneResult,
+    Processed,
+    PruneResult,
+    StatsResult,
+)
+from runrestic.runrestic.tools import FieldParser, parse_size, parse_time
 
 logger = logging.getLogger(__name__)
 
+# Raw lines needed by the parsers (and the abort reasons), which are retained by the bounded
+# output capture even if they are not part of the output tail anymore.
+RETAINED_LINES = re.compile(
+    rb"\s*(?:"
+    rb"critical|fatal|error|warning"  # errors and abort reasons
+    rb"|Files:|Dirs:|Added to the repo|processed [0-9]+ files"  # backup summary
+    rb"|keep [0-9]+ snapshots|remove [0-9]+ snapshots"  # forget
+    rb"|repository contains|found [0-9]+ of|will remove|will delete"  # prune < 0.12.0
+    rb"|remove [0-9]+ old index files|processed [0-9]+ blobs"
+    rb"|to repack:|this removes|to delete:|total prune:|remaining:|unused size after"
+    # JSON output, e.g. stats, except the messages consumed by `BackupJsonParser`
+    rb'|\{(?!"message_type":"(?:status|verbose_status|summary)")'
+    rb"|\[(?:\{|\])"  # JSON lists, e.g. snapshots
+    rb"|Pack ID does not match"  # check
+    rb")",
+    re.IGNORECASE,
+)
 
-def parse_backup(process_infos: dict[str, Any]) -> dict[str, Any]:
+# Categories of the errors of failed restic commands, checked in this order. Transient network
+# errors come first, as they often surface within a more general error, e.g.
+# "Fatal: unable to open config file: ... connection refused".
+ERROR_CATEGORIES = {
+    "network": re.compile(
+        r"connection refused|connection reset|connection timed out|no route to host"
+        r"|network is unreachable|i/o timeout|tls handshake timeout|no such host"
+        r"|temporary failure in name resolution|unable to start the sftp session"
+        r"|broken pipe|50[234] (?:bad gateway|service unavailable|gateway timeout)"
+        r"|slowdown|requesttimeout",
+        re.IGNORECASE,
+    ),
+    "lock": re.compile(
+        r"repository is already locked|unable to create lock", re.IGNORECASE
+    ),
+    "auth": re.compile(
+        r"wrong password|no key found|permission denied|access denied|forbidden"
+        r"|unauthorized|invalidaccesskeyid|signaturedoesnotmatch",
+        re.IGNORECASE,
+    ),
+    "corruption": re.compile(
+        r"pack id does not match|ciphertext verification failed|hash does not match"
+        r"|is damaged|repository contains errors|invalid data returned",
+        re.IGNORECASE,
+    ),
+    "config": re.compile(
+        r"unable to open config file|repository does not exist"
+        r"|is there a repository at the following location|invalid backend"
+        r"|please specify repository location|unknown (?:flag|command)",
+        re.IGNORECASE,
+    ),
+}
+
+# The fields of the outputs, each parsed in a single pass, see `FieldParser`
+BACKUP_FIELDS = FieldParser(
+    {
+        "files": (
+            r"Files:\s+([0-9]+) new,\s+([0-9]+) changed,\s+([0-9]+) unmodified",
+            ("0", "0", "0"),
+        ),
+        "dirs": (
+            r"Dirs:\s+([0-9]+) new,\s+([0-9]+) changed,\s+([0-9]+) unmodified",
+            ("0", "0", "0"),
+        ),
+        "added_to_the_repo": (r"Added to the repo\w*:\s+(-?[0-9.]+ [a-zA-Z]*B)", "0 B"),
+        "processed": (
+            r"processed ([0-9]+) files,\s+(-?[0-9.]+ [a-zA-Z]*B) in ([0-9]+:+[0-9]+)",
+            ("0", "0 B", "00:00"),
+        ),
+    },
+    start="Files:",  # the first line of the summary, after the files of `--verbose`
+)
+FORGET_FIELDS = FieldParser({"removed_snapshots": (r"remove ([0-9]+) snapshots", "0")})
+PRUNE_FIELDS = FieldParser(
+    {
+        "containing": (
+            r"repository contains ([0-9]+) packs \(([0-9]+) blobs\) with (-?[0-9.]+ ?[a-zA-Z]*B)",
+            ("0", "0", "0 B"),
+        ),
+        "duplicate": (
+            r"([0-9]+) duplicate blobs, (-?[0-9.]+ ?[a-zA-Z]*B) duplicate",
+            ("0", "0 B"),
+        ),
+        "in_use": (
+            r"found ([0-9]+) of ([0-9]+) data blobs still in use, removing ([0-9]+) blobs",
+            ("0", "0", "0"),
+        ),
+        "invalid_files": (r"will remove ([0-9]+) invalid files", "0"),
+        "deleted": (
+            r"will delete ([0-9]+) packs and rewrite ([0-9]+) packs, this frees (-?[0-9.]+ ?[a-zA-Z]*B)",
+            ("0", "0", "0 B"),
+        ),
+        "removed_index_files": (r"remove ([0-9]+) old index files", "0"),
+    },
+    start="repository contains",  # the first statistic, after the progress of the index
+)
+NEW_PRUNE_FIELDS = FieldParser(
+    {
+        "to_repack": (
+            r"to repack:[\s]+([0-9]+) blobs / (-?[0-9.]+ ?[a-zA-Z]*B)",
+            ("0", "0 B"),
+        ),
+        "removed": (
+            r"this removes[:]*[\s]+([0-9]+) blobs / (-?[0-9.]+ ?[a-zA-Z]*B)",
+            ("0", "0 B"),
+        ),
+        "to_delete": (
+            r"to delete:[\s]+([0-9]+) blobs / (-?[0-9.]+ ?[a-zA-Z]*B)",
+            ("0", "0 B"),
+        ),
+        "total_prune": (
+            r"total prune:[\s]+([0-9]+) blobs / (-?[0-9.]+ ?[a-zA-Z]*B)",
+            ("0", "0 B"),
+        ),
+        "remaining": (
+            r"remaining:[\s]+([0-9]+) blobs / (-?[0-9.]+ ?[a-zA-Z]*B)",
+            ("0", "0 B"),
+        ),
+        "remaining_unused_size": (
+            r"unused size after prune:[\s]+(-?[0-9.]+ ?[a-zA-Z]*B)",
+            "0 B",
+        ),
+    },
+    start="to repack:",  # the first line of the summary, after the progress
+)
+RE_STATS_JSON = re.compile(r"(\{.*\})")
+
+
+def classify_error(output: str) -> str | None:
+    """
+    Determine the category of the error in the output of a failed restic command.
+
+    Args:
+        output (str): The output of the command.
+
+    Returns:
+        str | None: The first matching category of `ERROR_CATEGORIES`, or None if the
+        error is unknown.
+    """
+    for category, pattern in ERROR_CATEGORIES.items():
+        if pattern.search(output):
+            return category
+    return None
+
+
+def parse_backup(process_infos: dict[str, Any]) -> BackupResult:
     """
     Parse the output of the Restic `backup` command.
 
@@ -25,56 +177,192 @@ def parse_backup(process_infos: dict[str, Any]) -> dict[str, Any]:
             including the command output and execution time.
 
     Returns:
-        dict[str, Any]: A dictionary with parsed backup statistics, such as file counts,
-        directory counts, processed size, and duration.
+        BackupResult: The parsed backup statistics, such as file counts, directory counts,
+        processed size, and duration.
     """
     return_code, output = process_infos["output"][-1]
     logger.debug("Parsing backup output: %s", output)
 
-    files_new, files_changed, files_unmodified = parse_line(
-        r"Files:\s+([0-9]+) new,\s+([0-9]+) changed,\s+([0-9]+) unmodified",
-        output,
-        ("0", "0", "0"),
-    )
-    dirs_new, dirs_changed, dirs_unmodified = parse_line(
-        r"Dirs:\s+([0-9]+) new,\s+([0-9]+) changed,\s+([0-9]+) unmodified",
-        output,
-        ("0", "0", "0"),
-    )
-    added_to_the_repo = parse_line(
-        r"Added to the repo\w*:\s+(-?[0-9.]+ [a-zA-Z]*B)",
-        output,
-        "0 B",
+    fields = BACKUP_FIELDS.parse(output)
+    processed_files, processed_size, processed_time = fields["processed"]
+
+    return BackupResult(
+        files=Counts(*map(int, fields["files"])),
+        dirs=Counts(*map(int, fields["dirs"])),
+        processed=Processed(
+            files=int(processed_files),
+            size_bytes=parse_size(processed_size),
+            duration_seconds=parse_time(processed_time),
+        ),
+        added_to_repo=parse_size(fields["added_to_the_repo"]),
+        duration_seconds=process_infos["time"],
+        rc=return_code,
+        resources=process_infos.get("resources") or None,
     )
-    processed_files, processed_size, processed_time = parse_line(
-        r"processed ([0-9]+) files,\s+(-?[0-9.]+ [a-zA-Z]*B) in ([0-9]+:+[0-9]+)",
-        output,
-        ("0", "0 B", "00:00"),
+
+
+class BackupJsonParser:
+    """
+    Incremental parser of the output of `restic backup --json`, fed line by line.
+
+    Each line is a JSON object with a `message_type`: "status" for the progress,
+    "verbose_status" for each file with `--verbose`, "error" for files which could not be
+    read, "summary" at the end and "exit_error" for fatal errors. Lines which are not JSON,
+    e.g. warnings printed by restic, are left to the default handling.
+
+    Attributes:
+        progress (bool): The progress was requested (`--show-progress`), so the status
+            messages are logged as INFO instead of DEBUG.
+        summary (dict[str, Any] | None): The summary message, once received.
+        errors (int): Number of error messages.
+        on_status (Callable[[dict[str, Any]], None] | None): Called with each decoded
+            status message, e.g. to export the progress while the backup is running.
+    """
+
+    # the fields of the messages are in a fixed order, so unchanged files are recognized
+    # without decoding the JSON
+    UNCHANGED_PREFIX = b'{"message_type":"verbose_status","action":"unchanged"'
+
+    def __init__(
+        self,
+        progress: bool = False,
+        on_status: Callable[[dict[str, Any]], None] | None = None,
+    ) -> None:
+        """
+        Initialize the BackupJsonParser without any messages yet.
+
+        Args:
+            progress (bool): Log the status messages as INFO instead of DEBUG.
+            on_status (Callable[[dict[str, Any]], None] | None): Called with each decoded
+                status message.
+        """
+        self.progress = progress
+        self.summary: dict[str, Any] | None = None
+        self.errors = 0
+        self.on_status = on_status
+
+    def feed(self, line: bytes) -> int | None:
+        """
+        Consume one line of output.
+
+        Args:
+            line (bytes): The raw line, without the line break.
+
+        Returns:
+            int | None: The logging level of the message, or None if the line is not a
+            JSON message of restic.
+        """
+        if not line.startswith(b"{"):
+            return None
+        if line.startswith(self.UNCHANGED_PREFIX):
+            return logging.DEBUG
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(message, dict):
+            return None
+        message_type = message.get("message_type")
+        if message_type == "status":
+            if self.on_status:
+                self.on_status(message)
+            return logging.INFO if self.progress else logging.DEBUG
+        if message_type == "verbose_status":
+            return logging.INFO
+        if message_type == "summary":
+            self.summary = message
+            return logging.INFO
+        if message_type == "error":
+            self.errors += 1
+            return logging.ERROR
+        if message_type == "exit_error":
+            return logging.CRITICAL
+        return None
+
+    @staticmethod
+    def describe(line: bytes) -> str:
+        """
+        Format a JSON message like the text output of restic, for the logs.
+
+        Args:
+            line (bytes): The raw line of a message accepted by `feed`.
+
+        Returns:
+            str: The readable message.
+        """
+        message = json.loads(line)
+        message_type = message["message_type"]
+        if message_type == "status":
+            return (
+                f"[{message.get('seconds_elapsed', 0)}s] "
+                f"{message.get('percent_done', 0):.2%} "
+                f"{message.get('files_done', 0)} / {message.get('total_files', 0)} files "
+                f"{message.get('bytes_done', 0)} / {message.get('total_bytes', 0)} bytes"
+            )
+        if message_type == "verbose_status":
+            return f"{message.get('action', '')} {message.get('item', '')}"
+        if message_type == "summary":
+            return (
+                f"Files: {message.get('files_new', 0)} new, "
+                f"{message.get('files_changed', 0)} changed, "
+                f"{message.get('files_unmodified', 0)} unmodified; "
+                f"Dirs: {message.get('dirs_new', 0)} new, "
+                f"{message.get('dirs_changed', 0)} changed, "
+                f"{message.get('dirs_unmodified', 0)} unmodified; "
+                f"Added to the repo: {message.get('data_added', 0)} B; "
+                f"snapshot {message.get('snapshot_id', '')} saved"
+            )
+        if message_type == "error":
+            error = message.get("error", {})
+            text = error.get("message", "") if isinstance(error, dict) else error
+            return f"error: {message.get('item', '')}: {text}"
+        return f"Fatal: {message.get('message', '')}"
+
+
+def parse_backup_json(process_infos: dict[str, Any]) -> BackupResult:
+    """
+    Convert the summary of `restic backup --json` into the result of `parse_backup`.
+
+    Args:
+        process_infos (dict[str, Any]): A dictionary containing process information,
+            including the `summary` message of `BackupJsonParser` and execution time.
+
+    Returns:
+        BackupResult: The backup statistics of `parse_backup`, plus the packed size of
+        the added data, the processed bytes and the numbers of data and tree blobs,
+        which are None if restic hasn't reported them.
+    """
+    return_code = process_infos["output"][-1][0]
+    summary = process_infos["summary"]
+    return BackupResult(
+        files=Counts(
+            summary.get("files_new", 0),
+            summary.get("files_changed", 0),
+            summary.get("files_unmodified", 0),
+        ),
+        dirs=Counts(
+            summary.get("dirs_new", 0),
+            summary.get("dirs_changed", 0),
+            summary.get("dirs_unmodified", 0),
+        ),
+        processed=Processed(
+            files=summary.get("total_files_processed", 0),
+            size_bytes=summary.get("total_bytes_processed", 0),
+            duration_seconds=summary.get("total_duration", 0),
+        ),
+        added_to_repo=summary.get("data_added", 0),
+        # absent if not reported by the restic version, e.g. before compression
+        data_added_packed=summary.get("data_added_packed"),
+        total_bytes_processed=summary.get("total_bytes_processed"),
+        data_blobs=summary.get("data_blobs"),
+        tree_blobs=summary.get("tree_blobs"),
+        duration_seconds=process_infos["time"],
+        rc=return_code,
+        resources=process_infos.get("resources") or None,
     )
 
-    return {
-        "files": {
-            "new": files_new,
-            "changed": files_changed,
-            "unmodified": files_unmodified,
-        },
-        "dirs": {
-            "new": dirs_new,
-            "changed": dirs_changed,
-            "unmodified": dirs_unmodified,
-        },
-        "processed": {
-            "files": processed_files,
-            "size_bytes": parse_size(processed_size),
-            "duration_seconds": parse_time(processed_time),
-        },
-        "added_to_repo": parse_size(added_to_the_repo),
-        "duration_seconds": process_infos["time"],
-        "rc": return_code,
-    }
-
-
-def parse_forget(process_infos: dict[str, Any]) -> dict[str, Any]:
+
+def parse_forget(process_infos: dict[str, Any]) -> ForgetResult:
     """
     Parse the output of the Restic `forget` command.
 
@@ -83,19 +371,19 @@ def parse_forget(process_infos: dict[str, Any]) -> dict[str, Any]:
             including the command output and execution time.
 
     Returns:
-        dict[str, Any]: A dictionary with parsed forget statistics, such as the number
-        of removed snapshots and duration.
+        ForgetResult: The parsed forget statistics, such as the number of removed
+        snapshots and duration.
     """
     return_code, output = process_infos["output"][-1]
-    re_removed_snapshots = parse_line(r"remove ([0-9]+) snapshots", output, "0")
-    return {
-        "removed_snapshots": re_removed_snapshots,
-        "duration_seconds": process_infos["time"],
-        "rc": return_code,
-    }
+    return ForgetResult(
+        removed_snapshots=int(FORGET_FIELDS.parse(output)["removed_snapshots"]),
+        duration_seconds=process_infos["time"],
+        rc=return_code,
+        resources=process_infos.get("resources") or None,
+    )
 
 
-def parse_prune(process_infos: dict[str, Any]) -> dict[str, Any]:
+def parse_prune(process_infos: dict[str, Any]) -> PruneResult:
     """
     Parse the output of the Restic `prune` command.
 
@@ -104,52 +392,36 @@ def parse_prune(process_infos: dict[str, Any]) -> dict[str, Any]:
             including the command output and execution time.
 
     Returns:
-        dict[str, Any]: A dictionary with parsed prune statistics, such as the number
-        of removed blobs, freed size, and duration.
+        PruneResult: The parsed prune statistics, such as the number of removed blobs,
+        freed size, and duration.
     """
     return_code, output = process_infos["output"][-1]
-    containing_packs, containing_blobs, containing_size = parse_line(
-        r"repository contains ([0-9]+) packs \(([0-9]+) blobs\) with (-?[0-9.]+ ?[a-zA-Z]*B)",
-        output,
-        ("0", "0", "0 B"),
-    )
-    duplicate_blobs, duplicate_size = parse_line(
-        r"([0-9]+) duplicate blobs, (-?[0-9.]+ ?[a-zA-Z]*B) duplicate",
-        output,
-        ("0", "0 B"),
-    )
-    in_use_blobs, _, removed_blobs = parse_line(
-        r"found ([0-9]+) of ([0-9]+) data blobs still in use, removing ([0-9]+) blobs",
-        output,
-        ("0", "0", "0"),
-    )
-    invalid_files = parse_line(r"will remove ([0-9]+) invalid files", output, ("0"))
-    deleted_packs, rewritten_packs, size_freed = parse_line(
-        r"will delete ([0-9]+) packs and rewrite ([0-9]+) packs, this frees (-?[0-9.]+ ?[a-zA-Z]*B)",
-        output,
-        ("0", "0", "0 B"),
+    fields = PRUNE_FIELDS.parse(output)
+    containing_packs, containing_blobs, containing_size = fields["containing"]
+    duplicate_blobs, duplicate_size = fields["duplicate"]
+    in_use_blobs, _, removed_blobs = fields["in_use"]
+    deleted_packs, rewritten_packs, size_freed = fields["deleted"]
+
+    return PruneResult(
+        containing_packs_before=int(containing_packs),
+        containing_blobs=int(containing_blobs),
+        containing_size_bytes=parse_size(containing_size),
+        duplicate_blobs=int(duplicate_blobs),
+        duplicate_size_bytes=parse_size(duplicate_size),
+        in_use_blobs=int(in_use_blobs),
+        removed_blobs=int(removed_blobs),
+        invalid_files=int(fields["invalid_files"]),
+        deleted_packs=int(deleted_packs),
+        rewritten_packs=int(rewritten_packs),
+        size_freed_bytes=parse_size(size_freed),
+        removed_index_files=int(fields["removed_index_files"]),
+        duration_seconds=process_infos["time"],
+        rc=return_code,
+        resources=process_infos.get("resources") or None,
     )
-    removed_index_files = parse_line(r"remove ([0-9]+) old index files", output, "0")
-
-    return {
-        "containing_packs_before": containing_packs,
-        "containing_blobs": containing_blobs,
-        "containing_size_bytes": parse_size(containing_size),
-        "duplicate_blobs": duplicate_blobs,
-        "duplicate_size_bytes": parse_size(duplicate_size),
-        "in_use_blobs": in_use_blobs,
-        "removed_blobs": removed_blobs,
-        "invalid_files": invalid_files,
-        "deleted_packs": deleted_packs,
-        "rewritten_packs": rewritten_packs,
-        "size_freed_bytes": parse_size(size_freed),
-        "removed_index_files": removed_index_files,
-        "duration_seconds": process_infos["time"],
-        "rc": return_code,
-    }
-
-
-def parse_new_prune(process_infos: dict[str, Any]) -> dict[str, Any]:
+
+
+def parse_new_prune(process_infos: dict[str, Any]) -> NewPruneResult:
     """
     Parse the output of the new Restic `prune` command.
 
@@ -158,84 +430,112 @@ def parse_new_prune(process_infos: dict[str, Any]) -> dict[str, Any]:
             including the command output and execution time.
 
     Returns:
-        dict[str, Any]: A dictionary with parsed prune statistics, such as the number
-        of blobs to repack, removed blobs, and remaining unused size.
+        NewPruneResult: The parsed prune statistics, such as the number of blobs to
+        repack, removed blobs, and remaining unused size.
     """
     return_code, output = process_infos["output"][-1]
 
-    to_repack_blobs, to_repack_bytes = parse_line(
-        r"to repack:[\s]+([0-9]+) blobs / (-?[0-9.]+ ?[a-zA-Z]*B)",
-        output,
-        ("0", "0 B"),
-    )
-    removed_blobs, removed_bytes = parse_line(
-        r"this removes[:]*[\s]+([0-9]+) blobs / (-?[0-9.]+ ?[a-zA-Z]*B)",
-        output,
-        ("0", "0 B"),
+    fields = NEW_PRUNE_FIELDS.parse(output)
+    to_repack_blobs, to_repack_bytes = fields["to_repack"]
+    removed_blobs, removed_bytes = fields["removed"]
+    to_delete_blobs, to_delete_bytes = fields["to_delete"]
+    total_prune_blobs, total_prune_bytes = fields["total_prune"]
+    remaining_blobs, remaining_bytes = fields["remaining"]
+    return NewPruneResult(
+        to_repack_blobs=int(to_repack_blobs),
+        to_repack_bytes=parse_size(to_repack_bytes),
+        removed_blobs=int(removed_blobs),
+        removed_bytes=parse_size(removed_bytes),
+        to_delete_blobs=int(to_delete_blobs),
+        to_delete_bytes=parse_size(to_delete_bytes),
+        total_prune_blobs=int(total_prune_blobs),
+        total_prune_bytes=parse_size(total_prune_bytes),
+        remaining_blobs=int(remaining_blobs),
+        remaining_bytes=parse_size(remaining_bytes),
+        remaining_unused_size=parse_size(fields["remaining_unused_size"]),
+        duration_seconds=process_infos["time"],
+        rc=return_code,
+        resources=process_infos.get("resources") or None,
     )
-    to_delete_blobs, to_delete_bytes = parse_line(
-        r"to delete:[\s]+([0-9]+) blobs / (-?[0-9.]+ ?[a-zA-Z]*B)",
-        output,
-        ("0", "0 B"),
-    )
-    total_prune_blobs, total_prune_bytes = parse_line(
-        r"total prune:[\s]+([0-9]+) blobs / (-?[0-9.]+ ?[a-zA-Z]*B)",
-        output,
-        ("0", "0 B"),
-    )
-    remaining_blobs, remaining_bytes = parse_line(
-        r"remaining:[\s]+([0-9]+) blobs / (-?[0-9.]+ ?[a-zA-Z]*B)",
-        output,
-        ("0", "0 B"),
-    )
-    remaining_unused_size = parse_line(
-        r"unused size after prune:[\s]+(-?[0-9.]+ ?[a-zA-Z]*B)",
-        output,
-        "0 B",
-    )
-    return {
-        "to_repack_blobs": to_repack_blobs,
-        "to_repack_bytes": parse_size(to_repack_bytes),
-        "removed_blobs": removed_blobs,
-        "removed_bytes": parse_size(removed_bytes),
-        "to_delete_blobs": to_delete_blobs,
-        "to_delete_bytes": parse_size(to_delete_bytes),
-        "total_prune_blobs": total_prune_blobs,
-        "total_prune_bytes": parse_size(total_prune_bytes),
-        "remaining_blobs": remaining_blobs,
-        "remaining_bytes": parse_size(remaining_bytes),
-        "remaining_unused_size": parse_size(remaining_unused_size),
-        "duration_seconds": process_infos["time"],
-        "rc": return_code,
-    }
-
-
-def parse_stats(process_infos: dict[str, Any]) -> dict[str, Any]:
+
+
+def parse_stats(process_infos: dict[str, Any], strict: bool = False) -> StatsResult:
     """
     Parse the output of the Restic `stats` command.
 
     Args:
         process_infos (dict[str, Any]): A dictionary containing process information,
             including the command output and execution time.
+        strict (bool): Raise an error instead of returning zeros if the totals are
+            missing, e.g. for results which are cached.
 
     Returns:
-        dict[str, Any]: A dictionary with parsed statistics, such as total file count
-        and total size in bytes.
+        StatsResult: The parsed statistics, such as total file count and total size in
+        bytes.
+
+    Raises:
+        ValueError: If `strict` and the output contains no totals.
     """
     return_code, output = process_infos["output"][-1]
+    matches = RE_STATS_JSON.findall(output)
+    if strict and not matches:
+        raise ValueError(f"No statistics in output: {output}")
     try:
-        stats_json = json.loads(re.findall(r"(\{.*\})", output, re.MULTILINE)[0])
-        return {
-            "total_file_count": stats_json["total_file_count"],
-            "total_size_bytes": stats_json["total_size"],
-            "duration_seconds": process_infos["time"],
-            "rc": return_code,
-        }
+        stats_json = json.loads(matches[0])
+        return StatsResult(
+            total_file_count=stats_json["total_file_count"],
+            total_size_bytes=stats_json["total_size"],
+            duration_seconds=process_infos["time"],
+            rc=return_code,
+            resources=process_infos.get("resources") or None,
+        )
     except KeyError as err:
+        if strict:
+            raise ValueError(f"Key {err} not found in output: {output}") from err
         logger.error("Key %s not found in output: %s", err, output)
-        return {
-            "total_file_count": 0,
-            "total_size_bytes": 0,
-            "duration_seconds": 0,
-            "rc": return_code,
-        }
+        return StatsResult(
+            total_file_count=0,
+            total_size_bytes=0,
+            duration_seconds=0,
+            rc=return_code,
+            resources=process_infos.get("resources") or None,
+        )
+
+
+def parse_snapshots(process_infos: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    Parse the output of `restic snapshots --json`.
+
+    Args:
+        process_infos (dict[str, Any]): A dictionary containing process information,
+            including the command output.
+
+    Returns:
+        list[dict[str, Any]]: The snapshots, with their IDs, times, hosts, paths and tags.
+
+    Raises:
+        ValueError: If the output does not contain the list of snapshots.
+    """
+    output = process_infos["output"][-1][1]
+    for line in output.splitlines():
+        if line.startswith("["):
+            snapshots: list[dict[str, Any]] = json.loads(line)
+            return snapshots
+    raise ValueError(f"No list of snapshots in output: {output}")
+
+
+def parse_failure(process_infos: dict[str, Any]) -> CommandResult:
+    """
+    Record the return code of a failed Restic command, whose output is not parsed.
+
+    Args:
+        process_infos (dict[str, Any]): A dictionary containing process information,
+            including the command output.
+
+    Returns:
+        CommandResult: The return code and the resource usage of the command.
+    """
+    return CommandResult(
+        rc=process_infos["output"][-1][0],
+        resources=process_infos.get("resources") or None,
+    )
@@ -0,0 +1,159 @@
+"""
+This module provides the typed results of the Restic commands.
+
+The parsers of `output_parsing` convert the output of a command once into one of these
+frozen records, with numeric fields, which are stored in the metrics of the `ResticRunner`
+and consumed directly by the Prometheus metrics and the JSON export.
+"""
+
+from dataclasses import asdict, dataclass, is_dataclass
+from typing import Any
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class CommandResult:
+    """
+    The result of a Restic command, on its own for a failed command.
+
+    Attributes:
+        rc (int): Return code of the command.
+        resources (dict[str, float] | None): Resource usage of the command, see
+            `ResourceSampler`, None if not recorded.
+    """
+
+    rc: int
+    resources: dict[str, float] | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class Counts:
+    """
+    Numbers of new, changed and unmodified files or directories of a backup.
+    """
+
+    new: int = 0
+    changed: int = 0
+    unmodified: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class Processed:
+    """
+    The files processed by a backup, as reported by restic.
+    """
+
+    files: int = 0
+    size_bytes: float = 0
+    duration_seconds: float = 0
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class BackupResult(CommandResult):
+    """
+    The result of `restic backup`. The packed size and the blobs are only reported by
+    `restic backup --json`.
+    """
+
+    files: Counts
+    dirs: Counts
+    processed: Processed
+    added_to_repo: float
+    duration_seconds: float
+    data_added_packed: int | None = None
+    total_bytes_processed: int | None = None
+    data_blobs: int | None = None
+    tree_blobs: int | None = None
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class ForgetResult(CommandResult):
+    """
+    The result of `restic forget`.
+    """
+
+    removed_snapshots: int
+    duration_seconds: float
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class PruneResult(CommandResult):
+    """
+    The result of `restic prune` before restic 0.12.0.
+    """
+
+    containing_packs_before: int
+    containing_blobs: int
+    containing_size_bytes: float
+    duplicate_blobs: int
+    duplicate_size_bytes: float
+    in_use_blobs: int
+    removed_blobs: int
+    invalid_files: int
+    deleted_packs: int
+    rewritten_packs: int
+    size_freed_bytes: float
+    removed_index_files: int
+    duration_seconds: float
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class NewPruneResult(CommandResult):
+    """
+    The result of `restic prune` since restic 0.12.0.
+    """
+
+    to_repack_blobs: int
+    to_repack_bytes: float
+    removed_blobs: int
+    removed_bytes: float
+    to_delete_blobs: int
+    to_delete_bytes: float
+    total_prune_blobs: int
+    total_prune_bytes: float
+    remaining_blobs: int
+    remaining_bytes: float
+    remaining_unused_size: float
+    duration_seconds: float
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class CheckResult(CommandResult):
+    """
+    The result of `restic check`, the errors and options are 0 or 1.
+    """
+
+    errors: int
+    errors_data: int
+    errors_snapshots: int
+    read_data: int
+    check_unused: int
+    duration_seconds: float
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class StatsResult(CommandResult):
+    """
+    The result of `restic stats` in restore size mode.
+    """
+
+    total_file_count: int
+    total_size_bytes: int
+    duration_seconds: float
+
+
+def json_default(obj: Any) -> Any:
+    """
+    Convert the results for `json.dumps`, as its `default`.
+
+    Args:
+        obj (Any): The object which `json.dumps` cannot serialize itself.
+
+    Returns:
+        Any: The fields of a result as a dictionary.
+
+    Raises:
+        TypeError: If the object is not a result.
+    """
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
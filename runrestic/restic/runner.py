@@ -4,26 +4,95 @@ various Restic commands such as backup, prune, check, stats, and more. It handle
 logging, metrics collection, and error handling for Restic operations.
 """
 
+import asyncio
 import json
 import logging
+import os
 import re
+import sqlite3
 import time
 from argparse import Namespace
 from datetime import datetime
+from functools import partial
 from typing import Any
 
-from runrestic.metrics import write_metrics
+from runrestic.metrics import ProgressWriter, write_metrics
+from runrestic.restic.catalog import SnapshotCatalog
+from runrestic.restic.forget_policy import simulate_forget
 from runrestic.restic.output_parsing import (
+    ERROR_CATEGORIES,
     parse_backup,
+    parse_backup_json,
+    parse_failure,
     parse_forget,
     parse_new_prune,
     parse_prune,
+    parse_snapshots,
     parse_stats,
 )
-from runrestic.restic.tools import MultiCommand, initialize_environment, redact_password
+from runrestic.restic.results import CheckResult, StatsResult, json_default
+from runrestic.restic.stats_cache import DEFAULT_STATS_MODE, StatsCache
+from runrestic.restic.tools import (
+    CommandExecutor,
+    ConfigAbort,
+    MultiCommand,
+    Slots,
+    add_usage,
+    effective_concurrency,
+    initialize_environment,
+    parallel_limit,
+    proc_log_threshold,
+    redact_password,
+)
+from runrestic.restic.version import restic_capabilities
 
 logger = logging.getLogger(__name__)
 
+DIRECT_ABORT_REASONS = [
+    "Fatal: unable to open config file",
+    "Fatal: wrong password",
+]
+# abort reasons which apply to all repositories of a configuration (same environment)
+CONFIG_ABORT_REASONS = ["Fatal: wrong password"]
+INIT_ABORT_REASONS = ["config file already exists"]
+# restic commands whose output is parsed for the results, so it must not be quieted
+PARSED_OUTPUT_STEPS = {"backup", "forget", "prune", "check"}
+# restic commands executed per repository for each action
+ACTION_STEPS = {
+    "init": ["init"],
+    "backup": ["backup"],
+    "prune": ["forget", "prune"],
+    "check": ["check"],
+    "stats": ["stats"],
+    "unlock": ["unlock"],
+    "forget-preview": ["forget-preview"],
+    # internal, inserted by `with_catalog_refresh`
+    "catalog": ["catalog"],
+}
+# actions which only read the local caches, so they don't replace the exported metrics
+LOCAL_ACTIONS = {"forget-preview"}
+# actions which add or remove snapshots, so that the snapshot catalog is outdated
+SNAPSHOT_ACTIONS = {"backup", "prune"}
+
+
+def with_catalog_refresh(actions: list[str]) -> list[str]:
+    """
+    Insert the refresh of the snapshot catalogs after the last action which adds or
+    removes snapshots, unless a later `stats` action refreshes them anyway.
+
+    Args:
+        actions (list[str]): The actions to execute, in order.
+
+    Returns:
+        list[str]: The actions, with the internal "catalog" action if needed.
+    """
+    changed = [
+        index for index, action in enumerate(actions) if action in SNAPSHOT_ACTIONS
+    ]
+    if not changed or "stats" in actions[changed[-1] :]:
+        return actions
+    return [*actions[: changed[-1] + 1], "catalog", *actions[changed[-1] + 1 :]]
+
 
 class ResticRunner:
     """
@@ -37,10 +106,19 @@ class ResticRunner:
         metrics (dict): dictionary to store metrics and errors for operations.
         log_metrics (bool): Flag to determine if metrics should be logged.
         pw_replacement (str): Replacement string for sensitive information in logs.
+        progress_writer (ProgressWriter | None): Exports the progress of the running backups,
+            if a `progress_path` is configured.
+        capabilities (ResticCapabilities): The features of the installed Restic version,
+            which select the flags and output parsers.
+        executor (CommandExecutor | None): Executor shared by all runners of the invocation.
     """
 
     def __init__(
-        self, config: dict[str, Any], args: Namespace, restic_args: list[str]
+        self,
+        config: dict[str, Any],
+        args: Namespace,
+        restic_args: list[str],
+        executor: CommandExecutor | None = None,
     ) -> None:
         """
         Initialize the ResticRunner with configuration, arguments, and Restic-specific arguments.
@@ -49,26 +127,43 @@ class ResticRunner:
             config (dict): Configuration dictionary for Restic operations.
             args (Namespace): Command-line arguments passed to the runner.
             restic_args (list): Additional arguments to pass to Restic commands.
+            executor (CommandExecutor | None): Executor shared by all runners of the invocation.
+                If None, each batch of commands uses a temporary one.
         """
         self.config = config
         self.args = args
         self.restic_args = restic_args
+        self.executor = executor
 
         self.repos: list[str] = self.config["repositories"]
 
-        self.metrics: dict[str, Any] = {"errors": 0}
+        self.metrics: dict[str, Any] = {
+            "errors": 0,
+            "timeouts": 0,
+            "skipped": 0,
+            "error_categories": dict.fromkeys(ERROR_CATEGORIES, 0),
+        }
         self.log_metrics: Any = config.get("metrics") and not args.dry_run
         self.pw_replacement: str = (
             config.get("metrics", {})
             .get("prometheus", {})
             .get("password_replacement", "")
         )
+        self.progress_writer = (
+            ProgressWriter(config)
+            if self.log_metrics
+            and "progress_path" in config["metrics"].get("prometheus", {})
+            else None
+        )
 
         initialize_environment(self.config["environment"])
+        # after the environment, which may change the PATH and the cache directory
+        self.capabilities = restic_capabilities()
 
     def run(self) -> int:  # noqa: C901
         """
-        Execute the specified Restic actions in sequence.
+        Execute the specified Restic actions in sequence, or pipelined per repository
+        if `[execution] pipeline` is set.
 
         Returns:
             int: The number of errors encountered during execution.
@@ -82,69 +177,321 @@ class ResticRunner:
             actions = ["backup", "prune", "check"]
 
         logger.info("Starting '%s': %s", self.config["name"], actions)
-        for action in actions:
-            if action == "init":
-                self.init()
-            elif action == "backup":
-                self.backup()
-            elif action == "prune":
-                self.forget()
-                self.prune()
-            elif action == "check":
-                self.check()
-            elif action == "stats":
-                self.stats()
-            elif action == "unlock":
-                self.unlock()
+        if self.config["execution"].get("pipeline"):
+            self.run_pipelined(with_catalog_refresh(actions))
+        else:
+            for action in with_catalog_refresh(actions):
+                if action == "init":
+                    self.init()
+                elif action == "backup":
+                    self.backup()
+                elif action == "prune":
+                    self.forget()
+                    self.prune()
+                elif action == "check":
+                    self.check()
+                elif action == "stats":
+                    self.stats()
+                elif action == "unlock":
+                    self.unlock()
+                elif action == "forget-preview":
+                    self.forget_preview()
+                elif action == "catalog":
+                    self.refresh_catalog()
 
         self.metrics["last_run"] = datetime.now().timestamp()
         self.metrics["total_duration_seconds"] = time.time() - start_time
+        if self.executor:
+            self.metrics["executor"] = self.executor.statistics.copy()
 
-        logger.debug(json.dumps(self.metrics, indent=2))
+        logger.debug(json.dumps(self.metrics, indent=2, default=json_default))
 
-        if self.log_metrics:
+        if self.log_metrics and not set(actions) <= LOCAL_ACTIONS:
             write_metrics(self.metrics, self.config)
 
         return self.metrics["errors"]  # type: ignore[no-any-return]
 
-    def init(self) -> None:
+    def run_pipelined(self, actions: list[str]) -> None:
         """
-        Initialize the Restic repository for each configured repository.
+        Execute the specified Restic actions as one chain per repository.
+
+        Each repository continues with its next action as soon as its previous one is done,
+        instead of waiting for all repositories to finish the action. The chains share the
+        `parallel_limit` of the configuration. The backup pre_hooks run before the first
+        backup and the post_hooks right after the last backup has finished. As in the
+        sequential mode, a config-wide abort skips the commands of the same step of all
+        chains which have not been started yet. A chain which fails does not cancel the
+        others, its error is raised once all chains have finished.
+
+        Args:
+            actions (list[str]): The actions to execute, in order.
+        """
+        steps = [step for action in actions for step in ACTION_STEPS.get(action, [])]
+        if self.executor is None:
+            with CommandExecutor() as executor:
+                executor.run(self._pipeline(steps, executor))
+        else:
+            self.executor.run(self._pipeline(steps, self.executor))
+
+    async def _pipeline(self, steps: list[str], executor: CommandExecutor) -> None:
+        """
+        Run the chains of restic commands for all repositories on the executor's event loop.
+
+        Args:
+            steps (list[str]): The restic commands to execute per repository, in order.
+            executor (CommandExecutor): The executor running the commands.
         """
+        handlers = {
+            "init": (self._init_command, self._init_result),
+            "backup": (self._backup_command, self._backup_result),
+            "forget": (self._forget_command, self._forget_result),
+            "prune": (self._prune_command, self._prune_result),
+            "check": (self._check_command, self._check_result),
+            "unlock": (self._unlock_command, self._unlock_result),
+        }
+        for step in steps:
+            if step not in ("init", "unlock", "catalog", *LOCAL_ACTIONS):
+                self.metrics[step] = {}
+        executor.statistics["batches"] += 1
+        limit = parallel_limit(self.config["execution"], len(self.repos))
         commands = [
-            ["restic", "-r", repo, "init", *self.restic_args] for repo in self.repos
+            (
+                handlers[step][0](repo)
+                if step in handlers
+                else self._snapshots_command(repo)
+            )
+            for repo in self.repos
+            for step in steps
+            if step not in LOCAL_ACTIONS
         ]
+        concurrency = effective_concurrency(commands, self.config["execution"], limit)
+        pending_backups = len(self.repos) * steps.count("backup")
+        if pending_backups and self.config["backup"].get("post_hooks"):
+            # the post_hooks run one after the other, next to the remaining chains
+            concurrency += 1
+        slots = Slots(limit, concurrency)
+        # one config-wide abort per step, like the batch of each action in sequence
+        config_aborts = [ConfigAbort(CONFIG_ABORT_REASONS) for _ in steps]
+
+        if pending_backups and (pre_hooks := self._hooks("pre_hooks")):
+            self._hooks_result("pre_hooks", await pre_hooks.run_async(executor))
 
-        direct_abort_reasons = ["config file already exists"]
+        async def walk(repo: str) -> None:
+            """
+            Execute all steps for one repository, one after the other.
+
+            Args:
+                repo (str): The repository.
+            """
+            nonlocal pending_backups
+            for step, config_abort in zip(steps, config_aborts):
+                if step == "stats":
+                    await self._stats_repo(repo, executor, slots, config_abort)
+                    continue
+                if step == "catalog":
+                    await self._catalog_repo(repo, executor, slots, config_abort)
+                    continue
+                if step == "forget-preview":
+                    await self._forget_preview_repo(repo)
+                    continue
+                build_command, handle_result = handlers[step]
+                process_infos = await executor.execute(
+                    build_command(repo),
+                    self.config["execution"],
+                    INIT_ABORT_REASONS if step == "init" else DIRECT_ABORT_REASONS,
+                    slots,
+                    config_abort,
+                    (
+                        partial(self._backup_progress, repo)
+                        if step == "backup" and self.progress_writer
+                        else None
+                    ),
+                )
+                handle_result(repo, process_infos)
+                if step == "backup":
+                    pending_backups -= 1
+                    if not pending_backups and (
+                        post_hooks := self._hooks("post_hooks")
+                    ):
+                        self._hooks_result(
+                            "post_hooks", await post_hooks.run_async(executor)
+                        )
+
+        results = await asyncio.gather(
+            *(walk(repo) for repo in self.repos), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    def init(self) -> None:
+        """
+        Initialize the Restic repository for each configured repository.
+        """
         cmd_runs = MultiCommand(
-            commands, self.config["execution"], direct_abort_reasons
+            [self._init_command(repo) for repo in self.repos],
+            self.config["execution"],
+            INIT_ABORT_REASONS,
+            executor=self.executor,
+            config_abort_reasons=CONFIG_ABORT_REASONS,
         ).run()
 
-        for process_infos in cmd_runs:
-            if process_infos["output"][-1][0] > 0:
-                logger.warning(process_infos["output"])
-            else:
-                logger.info(process_infos["output"])
+        for repo, process_infos in zip(self.repos, cmd_runs):
+            self._init_result(repo, process_infos)
+
+    def _init_command(self, repo: str) -> list[str]:
+        """
+        Build the `restic init` command for one repository.
+
+        Args:
+            repo (str): The repository.
+
+        Returns:
+            list[str]: The command.
+        """
+        return [
+            "restic",
+            "-r",
+            repo,
+            "init",
+            *self._verbosity_args("init"),
+            *self.restic_args,
+        ]
+
+    def _init_result(self, _repo: str, process_infos: dict[str, Any]) -> None:
+        """
+        Log the result of `restic init` for one repository.
+
+        Args:
+            _repo (str): The repository.
+            process_infos (dict[str, Any]): Status and output of the command execution.
+        """
+        self._count_incidents(process_infos)
+        if process_infos["output"][-1][0] > 0:
+            logger.warning(process_infos["output"])
+        else:
+            logger.info(process_infos["output"])
 
     def backup(self) -> None:
         """
         Perform a backup operation for each configured repository, including pre- and post-hooks.
         """
-        metrics = self.metrics["backup"] = {}
-        cfg = self.config["backup"]
+        self.metrics["backup"] = {}
+
+        # backup pre_hooks
+        self._run_hooks("pre_hooks")
+
+        # actual backup
+        cmd_runs = MultiCommand(
+            [self._backup_command(repo) for repo in self.repos],
+            self.config["execution"],
+            DIRECT_ABORT_REASONS,
+            executor=self.executor,
+            config_abort_reasons=CONFIG_ABORT_REASONS,
+            progress=(
+                (lambda index, status: self._backup_progress(self.repos[index], status))
+                if self.progress_writer
+                else None
+            ),
+        ).run()
+
+        for repo, process_infos in zip(self.repos, cmd_runs):
+            self._backup_result(repo, process_infos)
+
+        # backup post_hooks
+        self._run_hooks("post_hooks")
+
+    def _hooks(self, hooks: str) -> MultiCommand | None:
+        """
+        Prepare the execution of the backup pre_hooks or post_hooks, if configured.
 
+        Args:
+            hooks (str): Either "pre_hooks" or "post_hooks".
+
+        Returns:
+            MultiCommand | None: The hook commands, executed in sequence in a shell.
+        """
+        cfg = self.config["backup"]
+        if not cfg.get(hooks):
+            return None
         hooks_cfg = self.config["execution"].copy()
         hooks_cfg.update({"parallel": False, "shell": True})
+        return MultiCommand(cfg[hooks], config=hooks_cfg, executor=self.executor)
 
-        # backup pre_hooks
-        if cfg.get("pre_hooks"):
-            cmd_runs = MultiCommand(cfg["pre_hooks"], config=hooks_cfg).run()
-            metrics["_restic_pre_hooks"] = {
-                "duration_seconds": sum([v["time"] for v in cmd_runs]),
-                "rc": sum(x["output"][-1][0] for x in cmd_runs),
-            }
+    def _run_hooks(self, hooks: str) -> None:
+        """
+        Execute the backup pre_hooks or post_hooks, if configured, and record their metrics.
 
-        # actual backup
+        Args:
+            hooks (str): Either "pre_hooks" or "post_hooks".
+        """
+        if hook_commands := self._hooks(hooks):
+            self._hooks_result(hooks, hook_commands.run())
+
+    def _hooks_result(self, hooks: str, cmd_runs: list[dict[str, Any]]) -> None:
+        """
+        Record the duration and the summed return codes of the hooks in the backup metrics.
+
+        Args:
+            hooks (str): Either "pre_hooks" or "post_hooks".
+            cmd_runs (list[dict[str, Any]]): Status and output of the hook executions.
+        """
+        for process_infos in cmd_runs:
+            self._count_incidents(process_infos)
+        self.metrics["backup"][f"_restic_{hooks}"] = {
+            "duration_seconds": sum(v["time"] for v in cmd_runs),
+            "rc": sum(x["output"][-1][0] for x in cmd_runs),
+        }
+
+    def _verbosity_args(self, step: str) -> list[str]:
+        """
+        Build the restic verbosity arguments for the process log level, so that restic
+        doesn't produce output which would be discarded anyway.
+
+        - `--verbose` if the process log level is DEBUG (e.g. file names of the backup)
+        - `--quiet` if it is above WARNING, unless the output is parsed for the results
+
+        Args:
+            step (str): The restic command.
+
+        Returns:
+            list[str]: The arguments, empty if verbosity arguments are passed by the user.
+        """
+        verbosity = re.compile(r"^(?:--verbose|--quiet|-v|-q)")
+        if list(filter(verbosity.match, self.restic_args)):
+            return []
+        threshold = proc_log_threshold(self.config["execution"])
+        if threshold <= logging.DEBUG:
+            return ["--verbose"]
+        if threshold > logging.WARNING and step not in PARSED_OUTPUT_STEPS:
+            return ["--quiet"]
+        return []
+
+    def _count_incidents(self, process_infos: dict[str, Any]) -> None:
+        """
+        Add the tries killed by the watchdog, the categories of the failed tries and the
+        skipped commands to the metrics.
+
+        Args:
+            process_infos (dict[str, Any]): Status and output of the command execution.
+        """
+        self.metrics["timeouts"] += process_infos.get("timeouts", 0)
+        for category in process_infos.get("error_categories", []):
+            self.metrics["error_categories"][category] += 1
+        if process_infos.get("skipped"):
+            self.metrics["skipped"] += 1
+
+    def _backup_command(self, repo: str) -> list[str]:
+        """
+        Build the `restic backup` command for one repository.
+
+        Args:
+            repo (str): The repository.
+
+        Returns:
+            list[str]: The command.
+        """
+        cfg = self.config["backup"]
         extra_args: list[str] = []
         for files_from in cfg.get("files_from", []):
             extra_args += ["--files-from", files_from]
@@ -154,77 +501,146 @@ class ResticRunner:
             extra_args += ["--exclude-file", exclude_file]
         for exclude_if_present in cfg.get("exclude_if_present", []):
             extra_args += ["--exclude-if-present", exclude_if_present]
+        if self._skip_scan():
+            extra_args += ["--no-scan"]
 
-        commands = [
-            [
-                "restic",
-                "-r",
-                repo,
-                "backup",
-                *self.restic_args,
-                *extra_args,
-                *cfg.get("sources", []),
-            ]
-            for repo in self.repos
-        ]
-        direct_abort_reasons = [
-            "Fatal: unable to open config file",
-            "Fatal: wrong password",
+        return [
+            "restic",
+            "-r",
+            repo,
+            "backup",
+            *(["--json"] if self.capabilities.json_backup else []),
+            *self._verbosity_args("backup"),
+            *self.restic_args,
+            *extra_args,
+            *cfg.get("sources", []),
         ]
-        cmd_runs = MultiCommand(
-            commands, self.config["execution"], direct_abort_reasons
-        ).run()
 
-        for repo, process_infos in zip(self.repos, cmd_runs):
-            return_code = process_infos["output"][-1][0]
-            if return_code > 0:
-                logger.warning(process_infos)
-                metrics[redact_password(repo, self.pw_replacement)] = {
-                    "rc": return_code
-                }
-                self.metrics["errors"] += 1
-            else:
-                metrics[redact_password(repo, self.pw_replacement)] = parse_backup(
-                    process_infos
-                )
+    def _skip_scan(self) -> bool:
+        """
+        Check if `restic backup` can skip scanning the sources, which only serves to
+        estimate the progress, because no progress is shown or exported.
 
-        # backup post_hooks
-        if cfg.get("post_hooks"):
-            cmd_runs = MultiCommand(cfg["post_hooks"], config=hooks_cfg).run()
-            metrics["_restic_post_hooks"] = {
-                "duration_seconds": sum(v["time"] for v in cmd_runs),
-                "rc": sum(x["output"][-1][0] for x in cmd_runs),
-            }
+        Returns:
+            bool: True if `--no-scan` is supported and the progress is not used.
+        """
+        return (
+            self.capabilities.no_scan
+            and self.progress_writer is None
+            and "RESTIC_PROGRESS_FPS" not in os.environ
+            and "--no-scan" not in self.restic_args
+        )
+
+    def _backup_progress(self, repo: str, status: dict[str, Any]) -> None:
+        """
+        Pass a status message of `restic backup` to the `progress_writer`.
+
+        Args:
+            repo (str): The repository.
+            status (dict[str, Any]): The status message of `restic backup --json`.
+        """
+        if self.progress_writer:
+            self.progress_writer.update(
+                redact_password(repo, self.pw_replacement), status
+            )
+
+    def _backup_result(self, repo: str, process_infos: dict[str, Any]) -> None:
+        """
+        Record the metrics of `restic backup` for one repository.
+
+        Args:
+            repo (str): The repository.
+            process_infos (dict[str, Any]): Status and output of the command execution.
+        """
+        self._count_incidents(process_infos)
+        metrics = self.metrics["backup"]
+        return_code = process_infos["output"][-1][0]
+        if return_code > 0:
+            logger.warning(process_infos)
+            metrics[redact_password(repo, self.pw_replacement)] = parse_failure(
+                process_infos
+            )
+            self.metrics["errors"] += 1
+        else:
+            parse = parse_backup_json if process_infos.get("summary") else parse_backup
+            metrics[redact_password(repo, self.pw_replacement)] = parse(process_infos)
+        if self.progress_writer:
+            self.progress_writer.finish(redact_password(repo, self.pw_replacement))
 
     def unlock(self) -> None:
         """
         Unlock the Restic repository for each configured repository.
         """
-        direct_abort_reasons = [
-            "Fatal: unable to open config file",
-            "Fatal: wrong password",
-        ]
-        commands = [
-            ["restic", "-r", repo, "unlock", *self.restic_args] for repo in self.repos
-        ]
-
         cmd_runs = MultiCommand(
-            commands,
+            [self._unlock_command(repo) for repo in self.repos],
             config=self.config["execution"],
-            abort_reasons=direct_abort_reasons,
+            abort_reasons=DIRECT_ABORT_REASONS,
+            executor=self.executor,
+            config_abort_reasons=CONFIG_ABORT_REASONS,
         ).run()
-        for process_infos in cmd_runs:
-            if process_infos["output"][-1][0] > 0:
-                logger.warning(process_infos["output"])
-            else:
-                logger.info(process_infos["output"])
+        for repo, process_infos in zip(self.repos, cmd_runs):
+            self._unlock_result(repo, process_infos)
+
+    def _unlock_command(self, repo: str) -> list[str]:
+        """
+        Build the `restic unlock` command for one repository.
+
+        Args:
+            repo (str): The repository.
+
+        Returns:
+            list[str]: The command.
+        """
+        return [
+            "restic",
+            "-r",
+            repo,
+            "unlock",
+            *self._verbosity_args("unlock"),
+            *self.restic_args,
+        ]
+
+    def _unlock_result(self, _repo: str, process_infos: dict[str, Any]) -> None:
+        """
+        Log the result of `restic unlock` for one repository.
+
+        Args:
+            _repo (str): The repository.
+            process_infos (dict[str, Any]): Status and output of the command execution.
+        """
+        self._count_incidents(process_infos)
+        if process_infos["output"][-1][0] > 0:
+            logger.warning(process_infos["output"])
+        else:
+            logger.info(process_infos["output"])
 
     def forget(self) -> None:
         """
         Forget old snapshots in the Restic repository based on the pruning configuration.
         """
-        metrics = self.metrics["forget"] = {}
+        self.metrics["forget"] = {}
+
+        cmd_runs = MultiCommand(
+            [self._forget_command(repo) for repo in self.repos],
+            config=self.config["execution"],
+            abort_reasons=DIRECT_ABORT_REASONS,
+            executor=self.executor,
+            config_abort_reasons=CONFIG_ABORT_REASONS,
+        ).run()
+
+        for repo, process_infos in zip(self.repos, cmd_runs):
+            self._forget_result(repo, process_infos)
+
+    def _forget_command(self, repo: str) -> list[str]:
+        """
+        Build the `restic forget` command for one repository, using the prune policy.
 
+        Args:
+            repo (str): The repository.
+
+        Returns:
+            list[str]: The command.
+        """
         extra_args: list[str] = []
         if self.args.dry_run:
             extra_args += ["--dry-run"]
@@ -234,70 +650,144 @@ class ResticRunner:
             if key == "group-by":
                 extra_args += ["--group-by", value]
 
-        direct_abort_reasons = [
-            "Fatal: unable to open config file",
-            "Fatal: wrong password",
-        ]
-        commands = [
-            ["restic", "-r", repo, "forget", *self.restic_args, *extra_args]
-            for repo in self.repos
+        return [
+            "restic",
+            "-r",
+            repo,
+            "forget",
+            *self._verbosity_args("forget"),
+            *self.restic_args,
+            *extra_args,
         ]
-        cmd_runs = MultiCommand(
-            commands,
-            config=self.config["execution"],
-            abort_reasons=direct_abort_reasons,
-        ).run()
 
-        for repo, process_infos in zip(self.repos, cmd_runs):
-            return_code = process_infos["output"][-1][0]
-            if return_code > 0:
-                logger.warning(process_infos["output"])
-                metrics[redact_password(repo, self.pw_replacement)] = {
-                    "rc": return_code
-                }
-                self.metrics["errors"] += 1
-            else:
-                metrics[redact_password(repo, self.pw_replacement)] = parse_forget(
-                    process_infos
-                )
+    def _forget_result(self, repo: str, process_infos: dict[str, Any]) -> None:
+        """
+        Record the metrics of `restic forget` for one repository.
+
+        Args:
+            repo (str): The repository.
+            process_infos (dict[str, Any]): Status and output of the command execution.
+        """
+        self._count_incidents(process_infos)
+        metrics = self.metrics["forget"]
+        return_code = process_infos["output"][-1][0]
+        if return_code > 0:
+            logger.warning(process_infos["output"])
+            metrics[redact_password(repo, self.pw_replacement)] = parse_failure(
+                process_infos
+            )
+            self.metrics["errors"] += 1
+        else:
+            metrics[redact_password(repo, self.pw_replacement)] = parse_forget(
+                process_infos
+            )
+
+    def forget_preview(self) -> None:
+        """
+        Preview which snapshots `restic forget` would remove with the prune policy,
+        simulated on the local snapshot catalogs without accessing the repositories.
+        """
+        self.run_pipelined(["forget-preview"])
+
+    async def _forget_preview_repo(self, repo: str) -> None:
+        """
+        Log the snapshots which `restic forget` would keep and remove in one repository,
+        as of the last refresh of its catalog.
+
+        Args:
+            repo (str): The repository.
+        """
+        redacted_repo = redact_password(repo, self.pw_replacement)
+        if not os.path.exists(SnapshotCatalog.catalog_path(repo)):
+            logger.warning(
+                "No snapshot catalog of %s yet, run the backup or stats action first",
+                redacted_repo,
+            )
+            return
+        try:
+            snapshots = await asyncio.to_thread(self._catalog_snapshots, repo)
+            groups = simulate_forget(
+                snapshots,
+                self.config.get("prune", {}),
+                self.capabilities.forget_keeps_oldest,
+            )
+        except (sqlite3.Error, ValueError, KeyError) as err:
+            logger.error("Unable to preview forget for %s: %s", redacted_repo, err)
+            self.metrics["errors"] += 1
+            return
+
+        for group in groups:
+            scope = [f"host [{group.host}]"] if group.host else []
+            if group.paths is not None:
+                scope.append(f"paths [{' '.join(group.paths)}]")
+            if group.tags is not None:
+                scope.append(f"tags [{' '.join(group.tags)}]")
+            logger.info(
+                "%s: snapshots%s would keep %d and remove %d",
+                redacted_repo,
+                f" for ({', '.join(scope)})" if scope else "",
+                len(group.keep),
+                len(group.remove),
+            )
+            for snapshot in group.remove:
+                logger.info("  remove %s %s", snapshot["id"][:8], snapshot["time"])
 
     def prune(self) -> None:
         """
         Prune unused data from the Restic repository.
         """
-        metrics = self.metrics["prune"] = {}
+        self.metrics["prune"] = {}
 
-        direct_abort_reasons = [
-            "Fatal: unable to open config file",
-            "Fatal: wrong password",
-        ]
-        commands = [
-            ["restic", "-r", repo, "prune", *self.restic_args] for repo in self.repos
-        ]
         cmd_runs = MultiCommand(
-            commands,
+            [self._prune_command(repo) for repo in self.repos],
             config=self.config["execution"],
-            abort_reasons=direct_abort_reasons,
+            abort_reasons=DIRECT_ABORT_REASONS,
+            executor=self.executor,
+            config_abort_reasons=CONFIG_ABORT_REASONS,
         ).run()
 
         for repo, process_infos in zip(self.repos, cmd_runs):
-            return_code = process_infos["output"][-1][0]
-            if return_code > 0:
-                logger.warning(process_infos["output"])
-                metrics[redact_password(repo, self.pw_replacement)] = {
-                    "rc": return_code
-                }
-                self.metrics["errors"] += 1
-            else:
-                try:
-                    metrics[redact_password(repo, self.pw_replacement)] = (
-                        parse_new_prune(process_infos)
-                    )
-                except IndexError:
-                    # assume we're dealing with restic <0.12.0
-                    metrics[redact_password(repo, self.pw_replacement)] = parse_prune(
-                        process_infos
-                    )
+            self._prune_result(repo, process_infos)
+
+    def _prune_command(self, repo: str) -> list[str]:
+        """
+        Build the `restic prune` command for one repository.
+
+        Args:
+            repo (str): The repository.
+
+        Returns:
+            list[str]: The command.
+        """
+        return [
+            "restic",
+            "-r",
+            repo,
+            "prune",
+            *self._verbosity_args("prune"),
+            *self.restic_args,
+        ]
+
+    def _prune_result(self, repo: str, process_infos: dict[str, Any]) -> None:
+        """
+        Record the metrics of `restic prune` for one repository.
+
+        Args:
+            repo (str): The repository.
+            process_infos (dict[str, Any]): Status and output of the command execution.
+        """
+        self._count_incidents(process_infos)
+        metrics = self.metrics["prune"]
+        return_code = process_infos["output"][-1][0]
+        if return_code > 0:
+            logger.warning(process_infos["output"])
+            metrics[redact_password(repo, self.pw_replacement)] = parse_failure(
+                process_infos
+            )
+            self.metrics["errors"] += 1
+        else:
+            parse = parse_new_prune if self.capabilities.new_prune else parse_prune
+            metrics[redact_password(repo, self.pw_replacement)] = parse(process_infos)
 
     def check(self) -> None:
         """
@@ -305,6 +795,24 @@ class ResticRunner:
         """
         self.metrics["check"] = {}
 
+        cmd_runs = MultiCommand(
+            [self._check_command(repo) for repo in self.repos],
+            config=self.config["execution"],
+            abort_reasons=DIRECT_ABORT_REASONS,
+            executor=self.executor,
+            config_abort_reasons=CONFIG_ABORT_REASONS,
+        ).run()
+
+        for repo, process_infos in zip(self.repos, cmd_runs):
+            self._check_result(repo, process_infos)
+
+    def _check_args(self) -> list[str]:
+        """
+        Build the extra `restic check` arguments for the configured checks.
+
+        Returns:
+            list[str]: The extra arguments.
+        """
         extra_args: list[str] = []
         cfg = self.config.get("check")
         if cfg and "checks" in cfg:
@@ -313,75 +821,294 @@ class ResticRunner:
                 extra_args += ["--check-unused"]
             if "read-data" in checks:
                 extra_args += ["--read-data"]
+        return extra_args
 
-        direct_abort_reasons = [
-            "Fatal: unable to open config file",
-            "Fatal: wrong password",
-        ]
-        commands = [
-            ["restic", "-r", repo, "check", *self.restic_args, *extra_args]
-            for repo in self.repos
+    def _check_command(self, repo: str) -> list[str]:
+        """
+        Build the `restic check` command for one repository.
+
+        Args:
+            repo (str): The repository.
+
+        Returns:
+            list[str]: The command.
+        """
+        return [
+            "restic",
+            "-r",
+            repo,
+            "check",
+            *self._verbosity_args("check"),
+            *self.restic_args,
+            *self._check_args(),
         ]
-        cmd_runs = MultiCommand(
-            commands,
-            config=self.config["execution"],
-            abort_reasons=direct_abort_reasons,
-        ).run()
 
-        for repo, process_infos in zip(self.repos, cmd_runs):
-            metrics = {
-                "errors": 0,
-                "errors_data": 0,
-                "errors_snapshots": 0,
-                "read_data": 1 if "--read-data" in extra_args else 0,
-                "check_unused": 1 if "--check-unused" in extra_args else 0,
-            }
-            return_code, output = process_infos["output"][-1]
-            if return_code > 0:
-                logger.warning(process_infos["output"])
-                self.metrics["errors"] += 1
-            if "error: load <snapshot/" in output:
-                metrics["errors_snapshots"] = 1
-                metrics["errors"] = 1
-            if "Pack ID does not match," in output:
-                metrics["errors_data"] = 1
-                metrics["errors"] = 1
-            metrics["duration_seconds"] = process_infos["time"]
-            metrics["rc"] = return_code
-            self.metrics["check"][redact_password(repo, self.pw_replacement)] = metrics
+    def _check_result(self, repo: str, process_infos: dict[str, Any]) -> None:
+        """
+        Record the metrics of `restic check` for one repository.
+
+        Args:
+            repo (str): The repository.
+            process_infos (dict[str, Any]): Status and output of the command execution.
+        """
+        self._count_incidents(process_infos)
+        extra_args = self._check_args()
+        return_code, output = process_infos["output"][-1]
+        if return_code > 0:
+            logger.warning(process_infos["output"])
+            self.metrics["errors"] += 1
+        errors_snapshots = 1 if "error: load <snapshot/" in output else 0
+        errors_data = 1 if "Pack ID does not match," in output else 0
+        metrics = CheckResult(
+            errors=errors_snapshots | errors_data,
+            errors_data=errors_data,
+            errors_snapshots=errors_snapshots,
+            read_data=1 if "--read-data" in extra_args else 0,
+            check_unused=1 if "--check-unused" in extra_args else 0,
+            duration_seconds=process_infos["time"],
+            rc=return_code,
+            resources=process_infos.get("resources") or None,
+        )
+        self.metrics["check"][redact_password(repo, self.pw_replacement)] = metrics
 
     def stats(self) -> None:
         """
         Collect statistics for the Restic repository.
         """
-        metrics = self.metrics["stats"] = {}
+        self.run_pipelined(["stats"])
 
-        direct_abort_reasons = [
-            "Fatal: unable to open config file",
-            "Fatal: wrong password",
-        ]
+    def refresh_catalog(self) -> None:
+        """
+        Refresh the snapshot catalogs of all repositories after snapshots were added or
+        removed, see `with_catalog_refresh`.
+        """
+        self.run_pipelined(["catalog"])
+
+    async def _catalog_repo(
+        self,
+        repo: str,
+        executor: CommandExecutor,
+        slots: Slots,
+        config_abort: ConfigAbort,
+    ) -> None:
+        """
+        Refresh the snapshot catalog of one repository with `restic snapshots`. Failures
+        are only logged, the catalog is refreshed again by the next run.
+
+        Args:
+            repo (str): The repository.
+            executor (CommandExecutor): The executor running the commands.
+            slots (Slots): The concurrency slots of the commands.
+            config_abort (ConfigAbort): Skips the commands after a config-wide abort.
+        """
+        process_infos = await executor.execute(
+            self._snapshots_command(repo),
+            self.config["execution"],
+            DIRECT_ABORT_REASONS,
+            slots,
+            config_abort,
+        )
+        self._count_incidents(process_infos)
+        try:
+            if process_infos["output"][-1][0] != 0:
+                raise ValueError(process_infos["output"][-1][1].strip())
+            snapshots = parse_snapshots(process_infos)
+        except (ValueError, KeyError) as err:
+            logger.warning(
+                "Unable to refresh the snapshot catalog of %s: %s",
+                redact_password(repo, self.pw_replacement),
+                err,
+            )
+            return
+        await asyncio.to_thread(self._update_catalog, repo, snapshots)
+
+    async def _stats_repo(
+        self,
+        repo: str,
+        executor: CommandExecutor,
+        slots: Slots,
+        config_abort: ConfigAbort,
+    ) -> None:
+        """
+        Collect the statistics of one repository, running `restic stats` only for the
+        batches of snapshots which are not in its `StatsCache` yet.
+
+        Args:
+            repo (str): The repository.
+            executor (CommandExecutor): The executor running the commands.
+            slots (Slots): The concurrency slots of the commands.
+            config_abort (ConfigAbort): Skips the commands after a config-wide abort.
+        """
+        mode = self.config.get("stats", {}).get("mode", DEFAULT_STATS_MODE)
+        runs: list[dict[str, Any]] = []
+
+        async def execute(command: list[str]) -> bool:
+            """
+            Execute one command of the repository.
+
+            Args:
+                command (list[str]): The command.
+
+            Returns:
+                bool: True if the command succeeded.
+            """
+            process_infos = await executor.execute(
+                command,
+                self.config["execution"],
+                DIRECT_ABORT_REASONS,
+                slots,
+                config_abort,
+            )
+            self._count_incidents(process_infos)
+            runs.append(process_infos)
+            return process_infos["output"][-1][0] == 0  # type: ignore[no-any-return]
+
+        totals = None
+        if await execute(self._snapshots_command(repo)):
+            try:
+                snapshots = parse_snapshots(runs[-1])
+                snapshot_ids = [snapshot["id"] for snapshot in snapshots]
+            except (ValueError, KeyError) as err:
+                logger.warning("Counting all snapshots without the cache: %s", err)
+                if await execute(self._stats_command(repo, mode, [])):
+                    result = parse_stats(runs[-1])
+                    totals = (result.total_size_bytes, result.total_file_count)
+            else:
+                await asyncio.to_thread(self._update_catalog, repo, snapshots)
+                cache = StatsCache(repo, mode)
+                for ids in cache.missing(snapshot_ids):
+                    if not await execute(self._stats_command(repo, mode, ids)):
+                        break
+                    try:
+                        # only complete results are cached, they are never counted again
+                        cache.add(ids, parse_stats(runs[-1], strict=True))
+                    except ValueError as err:
+                        logger.warning("Unable to parse the statistics: %s", err)
+                        break
+                else:
+                    totals = cache.total(snapshot_ids)
+                cache.save()
+        self._stats_result(repo, runs, totals)
+
+    def catalog(self, repo: str) -> SnapshotCatalog:
+        """
+        Open the local snapshot catalog of a repository, as of its last refresh after a
+        backup, forget or stats, to query the snapshots without accessing the repository.
+
+        Args:
+            repo (str): The repository.
+
+        Returns:
+            SnapshotCatalog: The catalog, to be closed by the caller.
+        """
+        return SnapshotCatalog(repo)
+
+    def _catalog_snapshots(self, repo: str) -> list[dict[str, Any]]:
+        """
+        Read all snapshots of the catalog of a repository, called outside of the event
+        loop as sqlite blocks.
+
+        Args:
+            repo (str): The repository.
+
+        Returns:
+            list[dict[str, Any]]: The snapshots, see `SnapshotCatalog.snapshots`.
+        """
+        with self.catalog(repo) as catalog:
+            return catalog.snapshots()
+
+    def _update_catalog(self, repo: str, snapshots: list[dict[str, Any]]) -> None:
+        """
+        Synchronize the snapshot catalog of a repository, failures are only logged as
+        the catalog is a cache. Called outside of the event loop as sqlite blocks.
+
+        Args:
+            repo (str): The repository.
+            snapshots (list[dict[str, Any]]): All snapshots of the repository.
+        """
+        try:
+            with self.catalog(repo) as catalog:
+                catalog.update(snapshots)
+        except (sqlite3.Error, OSError, ValueError, KeyError) as err:
+            logger.warning(
+                "Unable to update the snapshot catalog of %s: %s",
+                redact_password(repo, self.pw_replacement),
+                err,
+            )
+
+    def _snapshots_command(self, repo: str) -> list[str]:
+        """
+        Build the `restic snapshots` command listing the snapshots of one repository.
+
+        Args:
+            repo (str): The repository.
+
+        Returns:
+            list[str]: The command.
+        """
+        return ["restic", "-r", repo, "snapshots", "--json", *self.restic_args]
+
+    def _stats_command(
+        self, repo: str, mode: str, snapshot_ids: list[str]
+    ) -> list[str]:
+        """
+        Build the `restic stats` command for some snapshots of one repository.
+
+        Args:
+            repo (str): The repository.
+            mode (str): The counting mode.
+            snapshot_ids (list[str]): The snapshots to count, all if empty.
+
+        Returns:
+            list[str]: The command.
+        """
         # quiet and verbose arguments are mutually exclusive
         verbose = re.compile(r"^--verbose")
         quiet = [] if list(filter(verbose.match, self.restic_args)) else ["-q"]
-        commands = [
-            ["restic", "-r", repo, "stats", "--json", *quiet, *self.restic_args]
-            for repo in self.repos
+        return [
+            "restic",
+            "-r",
+            repo,
+            "stats",
+            "--json",
+            "--mode",
+            mode,
+            *quiet,
+            *self.restic_args,
+            *snapshot_ids,
         ]
-        cmd_runs = MultiCommand(
-            commands,
-            config=self.config["execution"],
-            abort_reasons=direct_abort_reasons,
-        ).run()
 
-        for repo, process_infos in zip(self.repos, cmd_runs):
-            return_code = process_infos["output"][-1][0]
-            if return_code > 0:
-                logger.warning(process_infos["output"])
-                metrics[redact_password(repo, self.pw_replacement)] = {
-                    "rc": return_code
-                }
-                self.metrics["errors"] += 1
-            else:
-                metrics[redact_password(repo, self.pw_replacement)] = parse_stats(
-                    process_infos
-                )
+    def _stats_result(
+        self,
+        repo: str,
+        runs: list[dict[str, Any]],
+        totals: tuple[int, int] | None,
+    ) -> None:
+        """
+        Record the metrics of `restic stats` for one repository.
+
+        Args:
+            repo (str): The repository.
+            runs (list[dict[str, Any]]): Status and output of the executed commands.
+            totals (tuple[int, int] | None): The total size in bytes and file count of
+                all snapshots, None if a command failed.
+        """
+        metrics = self.metrics["stats"]
+        if totals is None:
+            logger.warning(runs[-1]["output"])
+            metrics[redact_password(repo, self.pw_replacement)] = parse_failure(
+                runs[-1]
+            )
+            self.metrics["errors"] += 1
+            return
+        resources: dict[str, float] = {}
+        for process_infos in runs:
+            add_usage(resources, process_infos.get("resources") or {})
+        total_size, total_file_count = totals
+        metrics[redact_password(repo, self.pw_replacement)] = StatsResult(
+            total_file_count=total_file_count,
+            total_size_bytes=total_size,
+            duration_seconds=sum(process_infos["time"] for process_infos in runs),
+            rc=0,
+            resources=resources or None,
+        )
@@ -2,7 +2,8 @@
 This module provides functionality to interact with Restic repositories via a shell.
 
 It allows users to select a repository from a list of available configurations and spawns
-a new shell with the appropriate environment variables set for Restic operations.
+a new shell with the appropriate environment variables set for Restic operations, including
+the path of the local snapshot catalog of the repository in `RUNRESTIC_CATALOG`.
 """
 
 import logging
@@ -11,6 +12,7 @@ import pty
 import sys
 from typing import Any
 
+from runrestic.restic.catalog import SnapshotCatalog
 from runrestic.restic.tools import initialize_environment
 
 logger = logging.getLogger(__name__)
@@ -58,6 +60,13 @@ def restic_shell(configs: list[dict[str, Any]]) -> None:
     print(f"Using: \033[1;92m{selected_config['name']}:{selected_repo}\033[0m")
     print("Spawning a new shell with the restic environment variables all set.")
     initialize_environment(env)
+    catalog_path = SnapshotCatalog.catalog_path(selected_repo)
+    if os.path.exists(catalog_path):
+        os.environ["RUNRESTIC_CATALOG"] = catalog_path
+        print(
+            "The snapshot catalog of the last stats run is in $RUNRESTIC_CATALOG, try"
+            " `sqlite3 $RUNRESTIC_CATALOG 'SELECT id, hostname FROM snapshots'`."
+        )
     print("\nTry `restic snapshots` for example.")
     pty.spawn(os.environ["SHELL"])
     print("You've exited your restic shell.")
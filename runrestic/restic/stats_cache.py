@@ -0,0 +1,152 @@
+"""
+This module provides the `StatsCache`, which keeps the results of `restic stats` per batch of
+snapshots, so that the stats action only walks the trees of snapshots which have not been
+counted yet.
+
+Snapshots are immutable, so their results never change. The cache of a repository is stored
+in `$XDG_CACHE_HOME/runrestic/stats/`, named after the `repository_digest`.
+"""
+
+import hashlib
+import os
+from typing import Any
+
+from runrestic.restic.results import StatsResult
+from runrestic.runrestic.tools import (
+    cache_directory,
+    load_cache,
+    repository_digest,
+    save_cache,
+)
+
+STATS_MODES = ("restore-size", "raw-data", "files-by-contents")
+DEFAULT_STATS_MODE = "restore-size"
+# modes whose result for several snapshots is the sum of the results per snapshot
+ADDITIVE_STATS_MODES = {"restore-size"}
+# snapshots counted by one `restic stats`, which loads the repository index once per run,
+# while forgetting one of them requires to count the others of its batch again
+STATS_BATCH_SIZE = 100
+
+
+class StatsCache:
+    """
+    The cached results of `restic stats` of one repository in one counting mode.
+
+    The restore size of several snapshots is the sum of their restore sizes, so it is
+    cached per batch of snapshots counted together, which stays valid as long as all
+    snapshots of the batch exist. The other modes count the data shared by several
+    snapshots only once, so their result for all snapshots is cached as one entry, which
+    is reused until a snapshot is added or removed.
+
+    Attributes:
+        path (str): The cache file.
+        mode (str): The counting mode of `restic stats`.
+        entries (dict[str, list[Any]]): The total size in bytes, the file count and the
+            sorted snapshot IDs per batch, keyed by a hash of the IDs.
+    """
+
+    def __init__(self, repo: str, mode: str) -> None:
+        """
+        Initialize the StatsCache with the entries stored by previous runs.
+
+        Args:
+            repo (str): The repository.
+            mode (str): The counting mode of `restic stats`.
+        """
+        self.path = os.path.join(
+            cache_directory(), "stats", f"{repository_digest(repo)}-{mode}.json"
+        )
+        self.mode = mode
+        self.entries: dict[str, list[Any]] = {
+            key: value
+            for key, value in load_cache(self.path).items()
+            if isinstance(value, list)
+            and len(value) == 3
+            and isinstance(value[2], list)
+        }
+
+    def _valid(self, snapshot_ids: list[str]) -> dict[str, list[Any]]:
+        """
+        Get the entries which apply to a set of snapshots.
+
+        Args:
+            snapshot_ids (list[str]): The IDs of all snapshots of the repository.
+
+        Returns:
+            dict[str, list[Any]]: The batches whose snapshots all exist, or for the
+                non-additive modes the entry of exactly these snapshots.
+        """
+        if self.mode not in ADDITIVE_STATS_MODES:
+            return {
+                key: entry
+                for key, entry in self.entries.items()
+                if entry[2] == sorted(snapshot_ids)
+            }
+        existing = set(snapshot_ids)
+        return {
+            key: entry
+            for key, entry in self.entries.items()
+            if existing.issuperset(entry[2])
+        }
+
+    def missing(self, snapshot_ids: list[str]) -> list[list[str]]:
+        """
+        Get the batches of snapshots which are not cached yet, including the remaining
+        snapshots of batches of which a snapshot has been forgotten.
+
+        Args:
+            snapshot_ids (list[str]): The IDs of all snapshots of the repository, in the
+                order of the snapshot list, so that a batch holds snapshots of similar age.
+
+        Returns:
+            list[list[str]]: The snapshot IDs to pass to each `restic stats`.
+        """
+        if not snapshot_ids:
+            return []
+        if self.mode not in ADDITIVE_STATS_MODES:
+            return [] if self._valid(snapshot_ids) else [sorted(snapshot_ids)]
+        cached = {
+            snapshot_id
+            for entry in self._valid(snapshot_ids).values()
+            for snapshot_id in entry[2]
+        }
+        ids = [snapshot_id for snapshot_id in snapshot_ids if snapshot_id not in cached]
+        return [
+            ids[start : start + STATS_BATCH_SIZE]
+            for start in range(0, len(ids), STATS_BATCH_SIZE)
+        ]
+
+    def add(self, snapshot_ids: list[str], result: StatsResult) -> None:
+        """
+        Cache the result of `restic stats`.
+
+        Args:
+            snapshot_ids (list[str]): A batch from `missing`.
+            result (StatsResult): The parsed result of a successful command.
+        """
+        ids = sorted(snapshot_ids)
+        key = hashlib.sha256("\n".join(ids).encode()).hexdigest()
+        self.entries[key] = [result.total_size_bytes, result.total_file_count, ids]
+
+    def total(self, snapshot_ids: list[str]) -> tuple[int, int]:
+        """
+        Aggregate the cached results of a set of snapshots and forget the other entries,
+        e.g. of the batches with a snapshot removed by `restic forget`.
+
+        Args:
+            snapshot_ids (list[str]): The IDs of all snapshots of the repository, which
+                must all be cached.
+
+        Returns:
+            tuple[int, int]: The total size in bytes and the total file count.
+        """
+        self.entries = self._valid(snapshot_ids)
+        total_size = sum(entry[0] for entry in self.entries.values())
+        total_file_count = sum(entry[1] for entry in self.entries.values())
+        return total_size, total_file_count
+
+    def save(self) -> None:
+        """
+        Store the entries for the next run.
+        """
+        save_cache(self.path, self.entries)
@@ -2,24 +2,405 @@
 This module provides utility functions and classes to support Restic operations.
 
 It includes:
+- `CommandExecutor`, the event loop and concurrency slots shared by all commands of a run.
 - `MultiCommand` for executing multiple commands in parallel or sequentially.
+- `ConfigAbort`, which skips the remaining commands of a batch after a config-wide abort.
+- `OutputCapture`, which retains a bounded part of the output of a command.
+- `ChildProcess`, a started command which is reaped together with its resource usage.
+- `Watchdog`, which kills commands exceeding their timeout or stalling without output.
+- `ResourceSampler`, which records the CPU, memory and IO usage of a command.
+- `TransientCgroup`, which limits the CPU, IO and memory of a command with cgroup v2.
 - Functions for logging process output, retrying commands, initializing environment variables,
   and redacting sensitive information from logs.
+
+The commands are executed by an asyncio event loop which spawns the processes directly and
+reads all of their outputs concurrently, so no additional Python worker processes are needed.
 """
 
+import asyncio
 import logging
 import os
 import re
+import resource
+import shlex
+import signal
+import subprocess
+import threading
 import time
-from concurrent.futures import Future
-from concurrent.futures.process import ProcessPoolExecutor
-from subprocess import PIPE, STDOUT, Popen
-from typing import IO, Any, Sequence
+from collections import Counter, deque
+from contextlib import (
+    AbstractAsyncContextManager,
+    AsyncExitStack,
+    asynccontextmanager,
+    nullcontext,
+    suppress,
+)
+from functools import partial
+from itertools import count
+from shutil import which
+from subprocess import PIPE, STDOUT
+from typing import Any, AsyncIterator, Callable, Coroutine, Sequence, TypeVar
+from urllib.parse import urlsplit
 
-from runrestic.runrestic.tools import parse_time
+from runrestic.restic.output_parsing import (
+    RETAINED_LINES,
+    BackupJsonParser,
+    classify_error,
+)
+from runrestic.runrestic.tools import RE_TIME, parse_time
 
 logger = logging.getLogger(__name__)
 
+# Maximum length of a single output line, e.g. the JSON output of `restic snapshots --json`
+STREAM_LIMIT = 1 << 24
+# Size of the chunks of raw process output read at once
+OUTPUT_CHUNK_SIZE = 1 << 16
+# Logging levels of the process output, in the order of the groups of LOG_LEVEL_PATTERN
+LOG_LEVEL_GROUPS = (
+    logging.INFO,
+    logging.CRITICAL,
+    logging.ERROR,
+    logging.WARNING,
+    logging.DEBUG,  # unchanged files in restic output
+)
+LOG_LEVEL_PATTERN = re.compile(
+    rb"(critical|fatal)|(error)|(warning)|(unchanged\s+/)", re.IGNORECASE
+)
+LOG_LEVEL_INITIALS = frozenset(b"cfewuCFEWU")
+
+# Default number of output lines retained per command, see `OutputCapture`
+OUTPUT_TAIL_LINES = 1000
+# Maximum number of earlier lines matching `RETAINED_LINES` which are retained per command
+OUTPUT_RETAINED_LINES = 1000
+# Memory assumed to be needed by one restic process when sizing `max_parallel = "auto"`
+AUTO_PARALLEL_MEMORY = 1 << 30
+
+ACTION_RESOURCE_CLASSES = {"backup": "io", "prune": "memory"}
+# Scheduling classes of `ionice`
+IONICE_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+# cgroup v2 interface files of the `[execution.resources]` settings
+CGROUP_SETTINGS = {
+    "cpu_weight": "cpu.weight",
+    "io_weight": "io.weight",
+    "memory_max": "memory.max",
+}
+CGROUP_IDS = count(1)
+
+# Return code of a command killed by the `Watchdog`, the same as used by coreutils `timeout`
+TIMEOUT_RETURNCODE = 124
+# Return code of a command which was not started because of a `ConfigAbort`
+SKIPPED_RETURNCODE = 125
+# Seconds to wait after SIGTERM before the process group of a command is killed with SIGKILL
+KILL_GRACE = 10
+
+# Status messages per second of `restic backup --json` if the progress is not configured,
+# restic would print 60 per second otherwise
+JSON_PROGRESS_FPS = "0.016666"
+# Status messages per second while the progress is exported, see `retry_process`
+LIVE_PROGRESS_FPS = "0.1"
+
+# Share of the available memory budgeted for the concurrent restic processes, see
+# `go_environment`
+GO_MEMORY_SHARE = 0.8
+
+# Seconds between the samples of the resource usage of a running command
+RESOURCE_SAMPLE_INTERVAL = 1.0
+# Resource usage of a command which is the maximum and not the sum of its tries
+RESOURCE_MAXIMA = {"max_rss_bytes"}
+# Fields of the files in /proc/<pid> with the resource usage, and the units of their values
+PROC_USAGE_FIELDS = {
+    "status": {
+        "VmHWM": ("max_rss_bytes", 1024),
+        "voluntary_ctxt_switches": ("voluntary_context_switches", 1),
+        "nonvoluntary_ctxt_switches": ("involuntary_context_switches", 1),
+    },
+    "io": {
+        "read_bytes": ("read_bytes", 1),
+        "write_bytes": ("write_bytes", 1),
+    },
+}
+
+# Default retry policy per error category, see `classify_error`: transient errors are
+# retried with the `retry_backoff`, permanent errors abort the command right away
+RETRY_POLICIES = {
+    "network": "retry",
+    "lock": "retry",
+    "auth": "abort",
+    "corruption": "abort",
+    "config": "abort",
+}
+
+# Process groups of the running commands, each command is started in its own session
+PROCESS_GROUPS: set[int] = set()
+
+T = TypeVar("T")
+
+
+class CommandExecutor:
+    """
+    A run-scoped execution engine shared by all `MultiCommand` batches of one invocation.
+
+    It owns a single asyncio event loop, created on first use and reused by every batch,
+    as well as the concurrency slots which have to be shared across batches. Use it as a
+    context manager so that the loop is shut down cleanly at the end of the run.
+
+    Attributes:
+        statistics (dict[str, int]): Counters of created event loops, batches, commands and
+            spawned processes, for debugging.
+        memory (int | None): The memory available when the run started, shared between the
+            concurrent restic processes by `go_environment`.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the CommandExecutor instance without starting the event loop yet.
+        """
+        self.statistics: dict[str, int] = {
+            "event_loops_created": 0,
+            "batches": 0,
+            "commands": 0,
+            "processes": 0,
+        }
+        self.memory: int | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._semaphores: dict[tuple[str, int], asyncio.Semaphore] = {}
+
+    def __enter__(self) -> "CommandExecutor":
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """
+        Run a coroutine to completion on the shared event loop.
+
+        Args:
+            coroutine (Coroutine[Any, Any, T]): The coroutine to run.
+
+        Returns:
+            T: The result of the coroutine.
+        """
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self.statistics["event_loops_created"] += 1
+            if self.memory is None:
+                # before any restic process of the run uses a part of it
+                self.memory = available_memory()
+        return self._loop.run_until_complete(coroutine)
+
+    def semaphore(self, key: str, limit: int) -> asyncio.Semaphore:
+        """
+        Get the concurrency slots for a key and limit, created on first use.
+
+        The slots are shared by all batches, e.g. of several configurations, which use the
+        same key with the same limit. A configuration with another limit for the same key
+        gets its own slots, so that its limit is not replaced by the first one.
+
+        Args:
+            key (str): Name of the slots, e.g. a repository backend.
+            limit (int): Number of slots.
+
+        Returns:
+            asyncio.Semaphore: The slots shared by all batches using the same key and limit.
+        """
+        if (key, limit) not in self._semaphores:
+            self._semaphores[key, limit] = asyncio.Semaphore(limit)
+        return self._semaphores[key, limit]
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        command: list[str] | str,
+        config: dict[str, Any],
+        slots: "Slots",
+        config_abort: "ConfigAbort | None" = None,
+    ) -> AsyncIterator[bool]:
+        """
+        Hold the slots for one try of a command, limited to `per_backend_limit` per backend
+        and to the `resource_slots` configured for its `resource_class`.
+
+        Args:
+            command (list[str] | str): Command to execute.
+            config (dict[str, Any]): Configuration dictionary for command execution.
+            slots (Slots): The slots limiting the overall number of processes.
+            config_abort (ConfigAbort | None): Config-wide abort state of the batch.
+
+        Yields:
+            bool: False if the command must not run anymore because another command of the
+            batch has triggered the config-wide abort in the meantime.
+        """
+        async with AsyncExitStack() as stack:
+            # Wait for the resource class and backend slots first, so that commands for a
+            # busy resource don't block the global slots which other commands could use.
+            resource = resource_class(command)
+            limit = config.get("resource_slots", {}).get(resource) if resource else None
+            if resource and limit:
+                await stack.enter_async_context(
+                    self.semaphore(f"class:{resource}", limit)
+                )
+            backend = command_backend(command)
+            limit = per_backend_limit(config, backend) if backend else None
+            if backend and limit:
+                await stack.enter_async_context(
+                    self.semaphore(f"backend:{backend}", limit)
+                )
+            await stack.enter_async_context(slots)
+            yield not (config_abort and config_abort.triggered)
+
+    async def execute(
+        self,
+        command: list[str] | str,
+        config: dict[str, Any],
+        abort_reasons: list[str] | None,
+        slots: "Slots",
+        config_abort: "ConfigAbort | None" = None,
+        progress: Callable[[dict[str, Any]], None] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Execute one command, each try once a `slot` is free.
+
+        The slots are released between the tries, so that a command waiting for its
+        `retry_backoff` doesn't keep other commands from running in the meantime.
+
+        Args:
+            command (list[str] | str): Command to execute.
+            config (dict[str, Any]): Configuration dictionary for command execution.
+            abort_reasons (list[str] | None): List of reasons to abort execution if found in the output.
+            slots (Slots): The slots limiting the overall number of processes.
+            config_abort (ConfigAbort | None): Config-wide abort state of the batch. The command
+                is skipped if another command of the batch has already triggered it.
+            progress (Callable[[dict[str, Any]], None] | None): Called with the progress of a
+                backup, see `retry_process`.
+
+        Returns:
+            dict[str, Any]: Status and output of the command execution, see `retry_process`.
+        """
+        self.statistics["commands"] += 1
+        process_infos = await retry_process(
+            command,
+            config,
+            abort_reasons,
+            slot=partial(self.slot, command, config, slots, config_abort),
+            concurrency=slots.concurrency,
+            memory=self.memory,
+            progress=progress,
+        )
+        if config_abort and not process_infos["output"]:
+            return config_abort.skipped(config)
+        self.statistics["processes"] += process_infos["current_try"]
+        if config_abort:
+            config_abort.check(process_infos)
+        return process_infos
+
+    def close(self) -> None:
+        """
+        Cancel remaining tasks and close the event loop. The processes of the cancelled
+        commands, e.g. after another command of the batch has raised an error, are
+        terminated with their process groups.
+        """
+        if self._loop is None:
+            return
+        try:
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(
+                asyncio.gather(*tasks, return_exceptions=True)
+            )
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.run_until_complete(self._loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            self._loop.close()
+            self._loop = None
+            self._semaphores.clear()
+        logger.debug("Executor statistics: %s", self.statistics)
+
+
+class Slots(asyncio.Semaphore):
+    """
+    The slots limiting the overall number of processes of a batch.
+
+    Attributes:
+        limit (int): Number of processes which may run at the same time.
+        concurrency (int): Number of processes which can actually run at the same time,
+            see `effective_concurrency`, which share the memory and CPUs.
+    """
+
+    def __init__(self, limit: int, concurrency: int | None = None) -> None:
+        """
+        Initialize the Slots instance with all slots free.
+
+        Args:
+            limit (int): Number of processes which may run at the same time.
+            concurrency (int | None): Number of processes which can actually run at the
+                same time, the limit if None.
+        """
+        super().__init__(limit)
+        self.limit = limit
+        self.concurrency = concurrency or limit
+
+
+class ConfigAbort:
+    """
+    The config-wide abort reasons of a batch of commands, e.g. "Fatal: wrong password".
+
+    All commands of a configuration share the same environment, so once one of them aborts
+    because of a config-wide reason, the commands which have not been started yet would fail
+    the same way and are skipped instead.
+
+    Attributes:
+        reasons (list[str]): The config-wide abort reasons.
+        triggered (list[str]): The reasons found in the output of an aborted command.
+    """
+
+    def __init__(self, reasons: list[str]) -> None:
+        """
+        Initialize the ConfigAbort instance, not triggered yet.
+
+        Args:
+            reasons (list[str]): The config-wide abort reasons.
+        """
+        self.reasons = reasons
+        self.triggered: list[str] = []
+
+    def check(self, process_infos: dict[str, Any]) -> None:
+        """
+        Trigger the abort if a failed command printed one of the reasons.
+
+        Args:
+            process_infos (dict[str, Any]): Status and output of the command execution.
+        """
+        returncode, output = process_infos["output"][-1]
+        if returncode and not self.triggered:
+            self.triggered = [reason for reason in self.reasons if reason in output]
+            if self.triggered:
+                logger.error(
+                    "Skipping the remaining commands because of %s", self.triggered
+                )
+
+    def skipped(self, config: dict[str, Any]) -> dict[str, Any]:
+        """
+        Build the status of a command which is skipped, in the format of `retry_process`.
+
+        Args:
+            config (dict[str, Any]): Configuration dictionary for command execution.
+
+        Returns:
+            dict[str, Any]: Status of the skipped command, ending with `SKIPPED_RETURNCODE`.
+        """
+        return {
+            "current_try": 0,
+            "tries_total": config.get("retry_count", 0) + 1,
+            "output": [(SKIPPED_RETURNCODE, f"Skipped because of {self.triggered}\n")],
+            "timeouts": 0,
+            "error_categories": [],
+            "skipped": True,
+            "time": 0.0,
+        }
+
 
 class MultiCommand:
     """
@@ -29,6 +410,11 @@ class MultiCommand:
         commands (Sequence[list[str] | str]): List of commands to execute.
         config (dict): Configuration dictionary for command execution.
         abort_reasons (list[str] | None): List of reasons to abort execution if found in the output.
+        executor (CommandExecutor | None): Shared executor, a temporary one is used if None.
+        config_abort_reasons (list[str] | None): Subset of the abort reasons which apply to
+            all commands, see `ConfigAbort`.
+        progress (Callable[[int, dict[str, Any]], None] | None): Called with the index of the
+            command and each progress message of a backup.
     """
 
     def __init__(
@@ -36,6 +422,9 @@ class MultiCommand:
         commands: Sequence[list[str] | str],
         config: dict[str, Any],
         abort_reasons: list[str] | None = None,
+        executor: CommandExecutor | None = None,
+        config_abort_reasons: list[str] | None = None,
+        progress: Callable[[int, dict[str, Any]], None] | None = None,
     ) -> None:
         """
         Initialize the MultiCommand instance.
@@ -44,78 +433,996 @@ class MultiCommand:
             commands (Sequence[list[str] | str]): List of commands to execute.
             config (dict): Configuration dictionary for command execution.
             abort_reasons (list[str] | None): List of reasons to abort execution if found in the output.
+            executor (CommandExecutor | None): Shared executor, a temporary one is used if None.
+            config_abort_reasons (list[str] | None): Subset of the abort reasons which apply to
+                all commands, the commands not started yet are skipped if one is found.
+            progress (Callable[[int, dict[str, Any]], None] | None): Called with the index of
+                the command and each progress message of a backup, see `retry_process`.
         """
-        self.processes: list[Future[dict[str, Any]]] = []
         self.commands = commands
         self.config = config
         self.abort_reasons = abort_reasons
-        self.process_pool_executor = ProcessPoolExecutor(
-            max_workers=len(commands) if config["parallel"] else 1
-        )
+        self.executor = executor
+        self.config_abort_reasons = config_abort_reasons
+        self.progress = progress
 
     def run(self) -> list[dict[str, Any]]:
         """
         Execute all commands and collect their results.
 
         Returns:
-            list[dict[str, Any]]: List of results for each command.
+            list[dict[str, Any]]: List of results for each command, in the order of the commands.
         """
-        for command in self.commands:
-            logger.debug("Spawning %s", command)
-            process = self.process_pool_executor.submit(
-                retry_process, command, self.config, self.abort_reasons
+        if self.executor is None:
+            with CommandExecutor() as executor:
+                return executor.run(self.run_async(executor))
+        return self.executor.run(self.run_async(self.executor))
+
+    async def run_async(self, executor: CommandExecutor) -> list[dict[str, Any]]:
+        """
+        Execute all commands on the executor's running event loop, limited to
+        `parallel_limit` at a time.
+
+        Args:
+            executor (CommandExecutor): The executor running the commands.
+
+        Returns:
+            list[dict[str, Any]]: List of results for each command, in the order of the commands.
+        """
+        executor.statistics["batches"] += 1
+        limit = parallel_limit(self.config, len(self.commands))
+        slots = Slots(limit, effective_concurrency(self.commands, self.config, limit))
+        config_abort = (
+            ConfigAbort(self.config_abort_reasons)
+            if self.config_abort_reasons
+            else None
+        )
+        return list(
+            await asyncio.gather(
+                *(
+                    executor.execute(
+                        command,
+                        self.config,
+                        self.abort_reasons,
+                        slots,
+                        config_abort,
+                        partial(self.progress, index) if self.progress else None,
+                    )
+                    for index, command in enumerate(self.commands)
+                )
             )
-            self.processes.append(process)
+        )
 
-        # result() is blocking. The function will return when all processes are done
-        return [process.result() for process in self.processes]
 
+def available_memory() -> int | None:
+    """
+    Read the memory available for new processes from `/proc/meminfo`.
 
-def log_messages(message: IO[str] | None, proc_cmd: str) -> str:
+    Returns:
+        int | None: Available memory in bytes, or None if it cannot be determined.
+    """
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        logger.debug("Unable to read the available memory from /proc/meminfo")
+    return None
+
+
+def auto_parallel_limit() -> int:
+    """
+    Derive a concurrency limit from the number of CPUs and the available memory.
+
+    Returns:
+        int: The number of processes which can run at the same time, at least 1.
+    """
+    limit = os.cpu_count() or 1
+    memory = available_memory()
+    if memory is not None:
+        limit = min(limit, memory // AUTO_PARALLEL_MEMORY)
+    return max(limit, 1)
+
+
+def parallel_limit(config: dict[str, Any], commands: int) -> int:
+    """
+    Determine how many commands may run at the same time.
+
+    Args:
+        config (dict[str, Any]): Configuration dictionary for command execution, using the
+            `parallel` and `max_parallel` (integer or "auto") settings.
+        commands (int): Number of commands to be executed.
+
+    Returns:
+        int: The concurrency limit, at least 1.
+    """
+    if not config.get("parallel"):
+        return 1
+    limit = config.get("max_parallel")
+    if limit == "auto":
+        limit = auto_parallel_limit()
+        logger.debug("Using max_parallel = %s", limit)
+    return max(min(limit, commands) if limit else commands, 1)
+
+
+def effective_concurrency(
+    commands: Sequence[list[str] | str], config: dict[str, Any], limit: int
+) -> int:
+    """
+    Determine how many commands of a batch can actually run at the same time.
+
+    Besides the `parallel_limit` of the batch, the commands of one resource class are
+    limited by its `resource_slots` and those of one backend by its `per_backend_limit`,
+    e.g. only one of several prunes may run at a time with `memory = 1`.
+
+    Args:
+        commands (Sequence[list[str] | str]): The commands of the batch.
+        config (dict[str, Any]): Configuration dictionary for command execution.
+        limit (int): The `parallel_limit` of the batch.
+
+    Returns:
+        int: The maximum number of concurrent processes, at least 1.
+    """
+    classes = Counter(resource_class(command) for command in commands)
+    backends = Counter(command_backend(command) for command in commands)
+    resource_slots = config.get("resource_slots", {})
+    by_class = sum(
+        min(resource_slots.get(resource) or number, number) if resource else number
+        for resource, number in classes.items()
+    )
+    by_backend = sum(
+        min(per_backend_limit(config, backend) or number, number) if backend else number
+        for backend, number in backends.items()
+    )
+    return max(min(limit, by_class, by_backend), 1)
+
+
+def per_backend_limit(config: dict[str, Any], backend: str) -> int | None:
+    """
+    Determine how many commands may run at the same time against one repository backend.
+
+    Args:
+        config (dict[str, Any]): Configuration dictionary for command execution. The
+            `per_host_parallel` setting is either a limit for every backend or a table of
+            limits per backend key (see `backend_key`) with an optional `default`.
+        backend (str): The backend key of the repository.
+
+    Returns:
+        int | None: The concurrency limit for the backend, or None if it is unlimited.
+    """
+    limit = config.get("per_host_parallel")
+    if isinstance(limit, dict):
+        limit = limit.get(backend, limit.get("default"))
+    return int(limit) if limit else None
+
+
+def command_backend(cmd: str | list[str]) -> str | None:
+    """
+    Get the backend key of the repository a restic command operates on.
+
+    Args:
+        cmd (str | list[str]): Command to execute.
+
+    Returns:
+        str | None: The backend key, or None if the command has no `-r` repository argument.
+    """
+    if isinstance(cmd, list) and "-r" in cmd[:-1]:
+        return backend_key(cmd[cmd.index("-r") + 1])
+    return None
+
+
+def command_action(cmd: str | list[str]) -> str | None:
+    """
+    Get the restic command (e.g. `backup`) of a command line.
+
+    Args:
+        cmd (str | list[str]): Command to execute.
+
+    Returns:
+        str | None: The restic command, or None if the command has no `-r` repository argument.
+    """
+    if isinstance(cmd, list) and "-r" in cmd[:-2]:
+        return cmd[cmd.index("-r") + 2]
+    return None
+
+
+def action_timeout(config: dict[str, Any], action: str | None) -> int | None:
+    """
+    Determine the maximum duration of one try of a command.
+
+    Args:
+        config (dict[str, Any]): Configuration dictionary for command execution. The
+            `timeout` setting is either a duration for every command or a table of durations
+            per restic command with an optional `default`.
+        action (str | None): The restic command, see `command_action`.
+
+    Returns:
+        int | None: The timeout in seconds, or None if the command is not limited.
+
+    Raises:
+        ValueError: If the timeout is not a duration, see `timeout_seconds`.
+    """
+    timeout = config.get("timeout")
+    if isinstance(timeout, dict):
+        timeout = timeout.get(action or "default", timeout.get("default"))
+    if not timeout:
+        return None
+    return timeout_seconds(timeout, "timeout")
+
+
+def timeout_seconds(value: str, setting: str) -> int | None:
+    """
+    Parse the duration of a timeout setting.
+
+    Unlike `parse_time`, an unparseable duration is an error of the configuration instead
+    of disabling the timeout.
+
+    Args:
+        value (str): The duration in the format "[HH:]MM:SS".
+        setting (str): The name of the setting, for the error message.
+
+    Returns:
+        int | None: The timeout in seconds, or None for a zero duration.
+
+    Raises:
+        ValueError: If the value is not in the format "[HH:]MM:SS".
+
+    >>> timeout_seconds("1:30:00", "timeout")
+    5400
+    >>> timeout_seconds("3600", "timeout")
+    Traceback (most recent call last):
+    ...
+    ValueError: Invalid [execution] timeout '3600', expected [HH:]MM:SS
+    """
+    if not RE_TIME.fullmatch(value):
+        raise ValueError(
+            f"Invalid [execution] {setting} '{value}', expected [HH:]MM:SS"
+        )
+    return parse_time(value) or None
+
+
+def retry_policy(config: dict[str, Any], category: str | None) -> str:
+    """
+    Determine whether a command failing with an error of the given category is retried.
+
+    Args:
+        config (dict[str, Any]): Configuration dictionary for command execution. The
+            `retry_policy` table overrides the `RETRY_POLICIES` per category.
+        category (str | None): The error category, see `classify_error`.
+
+    Returns:
+        str: "retry" or "abort". Unknown errors are always retried.
+    """
+    if category is None:
+        return "retry"
+    return str(config.get("retry_policy", {}).get(category, RETRY_POLICIES[category]))
+
+
+def stall_timeout(config: dict[str, Any]) -> int | None:
+    """
+    Determine how long a command may run without producing any output.
+
+    restic only prints its progress regularly if it is enabled with `RESTIC_PROGRESS_FPS`
+    (e.g. by `--show-progress`), otherwise a long running command is silent most of the
+    time. The `stall_timeout` setting is therefore only applied if the progress is enabled.
+
+    Args:
+        config (dict[str, Any]): Configuration dictionary for command execution.
+
+    Returns:
+        int | None: The stall timeout in seconds, or None if stalls are not detected.
+
+    Raises:
+        ValueError: If the stall timeout is not a duration, see `timeout_seconds`.
+    """
+    if not config.get("stall_timeout") or not os.environ.get("RESTIC_PROGRESS_FPS"):
+        return None
+    return timeout_seconds(config["stall_timeout"], "stall_timeout")
+
+
+def resource_class(cmd: str | list[str]) -> str | None:
+    """
+    Get the resource class of a restic command, i.e. the resource it mainly stresses.
+
+    - `io`: `backup` reads the local disk
+    - `network`: `check --read-data` downloads the whole repository
+    - `memory`: `prune` holds the repository index in memory
+
+    Args:
+        cmd (str | list[str]): Command to execute.
+
+    Returns:
+        str | None: The resource class, or None if the command is not classified.
+    """
+    action = command_action(cmd)
+    if action is None:
+        return None
+    if action == "check":
+        read_data = any(arg.startswith("--read-data") for arg in cmd)
+        return "network" if read_data else None
+    return ACTION_RESOURCE_CLASSES.get(action)
+
+
+def resource_profile(config: dict[str, Any], cmd: str | list[str]) -> dict[str, Any]:
+    """
+    Get the CPU, IO and memory settings applied to a restic command.
+
+    Args:
+        config (dict[str, Any]): Configuration dictionary for command execution. The
+            `resources` table holds the default settings and a table of overrides per
+            `resource_class`, e.g. `resources.memory` for `prune`.
+        cmd (str | list[str]): Command to execute.
+
+    Returns:
+        dict[str, Any]: The settings, empty for commands which are not restic commands.
+    """
+    if command_action(cmd) is None:
+        return {}
+    resources = config.get("resources", {})
+    profile = {
+        key: value for key, value in resources.items() if not isinstance(value, dict)
+    }
+    resource = resource_class(cmd)
+    if resource:
+        profile.update(resources.get(resource, {}))
+    return profile
+
+
+def priority_prefix(profile: dict[str, Any]) -> list[str]:
+    """
+    Build the `nice` and `ionice` wrapper of a command for the CPU priority and the IO
+    scheduling class of its profile.
+
+    The priorities are set by wrappers rather than in the child before `exec`, which is
+    not safe while other threads (e.g. those of `ChildProcess`) are running.
+
+    Args:
+        profile (dict[str, Any]): The settings of the command, see `resource_profile`.
+
+    Returns:
+        list[str]: The wrapper to prepend to the command, empty if no priority is set.
+    """
+    prefix: list[str] = []
+    if profile.get("nice"):
+        prefix += ["nice", "-n", str(profile["nice"])]
+    if not profile.get("ionice_class"):
+        return prefix
+    if not which("ionice"):
+        logger.warning("ionice is not installed, ignoring the ionice_class setting")
+        return prefix
+    io_class = IONICE_CLASSES[profile["ionice_class"]]
+    prefix += ["ionice", "-c", str(io_class)]
+    if "ionice_level" in profile and io_class != IONICE_CLASSES["idle"]:
+        prefix += ["-n", str(profile["ionice_level"])]
+    return prefix
+
+
+def go_environment(
+    profile: dict[str, Any], concurrency: int, memory: int | None
+) -> dict[str, str]:
+    """
+    Build the Go runtime settings of a restic command, which otherwise assumes that it owns
+    the whole machine.
+
+    With the default "auto", each of the concurrent processes gets an equal share of the
+    available memory as soft limit (`GOMEMLIMIT`) and of the CPUs (`GOMAXPROCS`). The auto
+    settings don't replace variables which are already set in the `[environment]`.
+
+    Args:
+        profile (dict[str, Any]): The settings of the command, see `resource_profile`. The
+            `gomemlimit`, `gogc` and `gomaxprocs` settings are either "auto", "off" (not
+            for `gogc`) or a value passed to restic as is.
+        concurrency (int): Number of processes which can run at the same time.
+        memory (int | None): The memory available at the start of the run, which is not
+            read again for each process, since it shrinks while the others are running.
+
+    Returns:
+        dict[str, str]: The environment variables to add for the command.
+    """
+    auto: dict[str, str] = {}
+    explicit: dict[str, str] = {}
+    memory_limit = profile.get("gomemlimit", "auto")
+    if memory_limit == "auto":
+        if memory and concurrency > 1:
+            auto["GOMEMLIMIT"] = str(int(memory * GO_MEMORY_SHARE / concurrency))
+    elif memory_limit != "off":
+        explicit["GOMEMLIMIT"] = str(memory_limit)
+    if "gogc" in profile:
+        explicit["GOGC"] = str(profile["gogc"])
+    max_procs = profile.get("gomaxprocs", "auto")
+    if max_procs == "auto":
+        if concurrency > 1:
+            auto["GOMAXPROCS"] = str(max((os.cpu_count() or 1) // concurrency, 1))
+    elif max_procs != "off":
+        explicit["GOMAXPROCS"] = str(max_procs)
+    auto = {key: value for key, value in auto.items() if key not in os.environ}
+    return auto | explicit
+
+
+class TransientCgroup:
+    """
+    A cgroup v2 created for one try of a command below the `cgroup_parent` of its profile.
+
+    The parent has to be delegated to the user running runrestic (e.g. with the systemd
+    `Delegate=yes` setting) and has to enable the controllers of the settings in its
+    `cgroup.subtree_control`.
+
+    Attributes:
+        path (str): Path of the cgroup directory.
+        settings (dict[str, str]): Values of the cgroup interface files, e.g. `cpu.weight`.
+    """
+
+    def __init__(self, parent: str, profile: dict[str, Any]) -> None:
+        """
+        Initialize the TransientCgroup instance without creating it yet.
+
+        Args:
+            parent (str): Path of the delegated parent cgroup.
+            profile (dict[str, Any]): The settings of the command, see `resource_profile`.
+        """
+        self.path = os.path.join(parent, f"runrestic-{os.getpid()}-{next(CGROUP_IDS)}")
+        self.settings = {
+            filename: str(profile[key])
+            for key, filename in CGROUP_SETTINGS.items()
+            if key in profile
+        }
+
+    def create(self) -> bool:
+        """
+        Create the cgroup and apply its settings.
+
+        Returns:
+            bool: True if the command can be moved into the cgroup.
+        """
+        try:
+            os.mkdir(self.path)
+        except OSError as err:
+            logger.warning("Unable to create the cgroup %s: %s", self.path, err)
+            return False
+        for filename, value in self.settings.items():
+            try:
+                with open(os.path.join(self.path, filename), "w") as file:
+                    file.write(value)
+            except OSError as err:
+                logger.warning("Unable to set %s of the cgroup: %s", filename, err)
+        return True
+
+    def add(self, pid: int) -> None:
+        """
+        Move a started command into the cgroup.
+
+        The command is moved by the parent right after it was started, since the child
+        can't safely do so before `exec` while other threads are running. Only the
+        startup of the command, before it forks any children, runs outside the cgroup.
+        Errors are ignored, the command rather runs outside the cgroup than not at all.
+
+        Args:
+            pid (int): Process ID of the command.
+        """
+        with (
+            suppress(OSError),
+            open(os.path.join(self.path, "cgroup.procs"), "w") as file,
+        ):
+            file.write(str(pid))
+
+    def remove(self) -> None:
+        """
+        Remove the cgroup once the command has ended.
+        """
+        try:
+            os.rmdir(self.path)
+        except OSError as err:
+            logger.debug("Unable to remove the cgroup %s: %s", self.path, err)
+
+
+class OutputCapture:
+    """
+    Capture the output of a command with bounded memory.
+
+    Only the last `tail_lines` lines are kept, plus up to `OUTPUT_RETAINED_LINES` earlier
+    lines needed by the parsers (see `RETAINED_LINES`), e.g. errors and summaries. The
+    other lines, like the "unchanged /path" lines of a verbose backup, are only counted.
+    The lines are kept as raw bytes and only decoded by `getvalue`.
+
+    Attributes:
+        retained (list[bytes]): Earlier lines needed by the parsers, in order.
+        tail (deque[bytes]): The last lines of the output.
+        omitted (int): Number of lines which were dropped.
+        unterminated (bool): The output didn't end with a line break.
+    """
+
+    def __init__(self, tail_lines: int = OUTPUT_TAIL_LINES) -> None:
+        """
+        Initialize an empty OutputCapture.
+
+        Args:
+            tail_lines (int): Number of last lines to keep, at least 1.
+        """
+        self.retained: list[bytes] = []
+        self.tail: deque[bytes] = deque(maxlen=max(tail_lines, 1))
+        self.omitted = 0
+        self.unterminated = False
+
+    def append(self, line: bytes) -> None:
+        """
+        Add a line of output, dropping the oldest line of the tail if it is full.
+
+        Args:
+            line (bytes): The raw line, without the line break.
+        """
+        if len(self.tail) == self.tail.maxlen:
+            evicted = self.tail[0]
+            if len(self.retained) < OUTPUT_RETAINED_LINES and RETAINED_LINES.match(
+                evicted
+            ):
+                self.retained.append(evicted)
+            else:
+                self.omitted += 1
+        self.tail.append(line)
+
+    def getvalue(self) -> str:
+        """
+        Get the captured output, with a note about the number of omitted lines.
+
+        Bytes which are not valid UTF-8 (e.g. in file names) are decoded with the
+        `surrogateescape` error handler, so that they don't spoil the rest of the output.
+
+        Returns:
+            str: The retained lines followed by the tail.
+        """
+        omitted = [b"[... %d lines omitted ...]" % self.omitted] if self.omitted else []
+        lines = [*self.retained, *omitted, *self.tail]
+        if not lines:
+            return ""
+        end = b"" if self.unterminated else b"\n"
+        return (b"\n".join(lines) + end).decode("UTF-8", "surrogateescape")
+
+
+class ChildProcess:
+    """
+    A command started by `spawn_process`, reaped with `os.wait4` to get its resource usage.
+
+    asyncio reaps its subprocesses itself and discards their `rusage`, so the command is
+    started with `subprocess.Popen` instead. The event loop reads its output, and like the
+    child watcher of asyncio a thread per process waits for its exit.
+
+    Attributes:
+        pid (int): Process ID of the command.
+        stdout (asyncio.StreamReader): The combined stdout and stderr of the command.
+        returncode (int | None): The exit code, negative for a signal, None until reaped.
+        rusage (resource.struct_rusage | None): The resource usage of the command and of
+            the child processes it has waited for, None until reaped.
+    """
+
+    def __init__(self, popen: "subprocess.Popen[bytes]") -> None:
+        """
+        Initialize the ChildProcess and start waiting for its exit.
+
+        Args:
+            popen (subprocess.Popen[bytes]): The started command, with a stdout pipe.
+        """
+        self.pid = popen.pid
+        self.stdout = asyncio.StreamReader(limit=STREAM_LIMIT)
+        self.returncode: int | None = None
+        self.rusage: resource.struct_rusage | None = None
+        self._popen = popen
+        self._loop = asyncio.get_running_loop()
+        self._exited: asyncio.Future[int] = self._loop.create_future()
+        threading.Thread(target=self._reap, daemon=True).start()
+
+    async def connect(self) -> None:
+        """
+        Start reading the output of the command into `stdout`.
+        """
+        await self._loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(self.stdout), self._popen.stdout
+        )
+
+    def _reap(self) -> None:
+        """
+        Wait for the exit of the command in the thread and report it to the event loop.
+        """
+        _, status, rusage = os.wait4(self.pid, 0)
+        returncode = os.waitstatus_to_exitcode(status)
+        self._popen.returncode = returncode  # reaped, not to be polled by subprocess
+        with suppress(RuntimeError):  # the event loop is already closed
+            self._loop.call_soon_threadsafe(self._exit, returncode, rusage)
+
+    def _exit(self, returncode: int, rusage: resource.struct_rusage) -> None:
+        """
+        Record the exit of the command in the event loop.
+        """
+        self.returncode = returncode
+        self.rusage = rusage
+        if not self._exited.done():
+            self._exited.set_result(returncode)
+
+    async def wait(self) -> int:
+        """
+        Wait for the command to exit.
+
+        Returns:
+            int: The exit code, negative if the command was killed by a signal.
+        """
+        return await asyncio.shield(self._exited)
+
+
+class Watchdog:
+    """
+    Kill the process group of a command which exceeds its timeout or stops producing output.
+
+    Attributes:
+        process (ChildProcess): The supervised process.
+        timeout (int | None): Maximum duration of the process in seconds.
+        stall_timeout (int | None): Maximum duration without any output in seconds.
+        expired (str | None): Description of the expired limit, once the process was killed.
+    """
+
+    def __init__(
+        self,
+        process: ChildProcess,
+        timeout: int | None,
+        stall_timeout: int | None,
+    ) -> None:
+        """
+        Initialize the Watchdog for a started process.
+
+        Args:
+            process (ChildProcess): The supervised process.
+            timeout (int | None): Maximum duration of the process in seconds.
+            stall_timeout (int | None): Maximum duration without any output in seconds.
+        """
+        self.process = process
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.expired: str | None = None
+        self._start = self._last_output = time.monotonic()
+
+    def touch(self) -> None:
+        """
+        Record that the process produced output.
+        """
+        self._last_output = time.monotonic()
+
+    async def watch(self) -> None:
+        """
+        Wait until a limit expires and kill the process group, or return immediately if
+        no limit is set. Cancel the task once the process has finished.
+        """
+        while self.timeout or self.stall_timeout:
+            deadlines = []
+            if self.timeout:
+                deadlines.append(
+                    (self._start + self.timeout, f"timeout of {self.timeout} sec")
+                )
+            if self.stall_timeout:
+                deadlines.append(
+                    (
+                        self._last_output + self.stall_timeout,
+                        f"no output for {self.stall_timeout} sec",
+                    )
+                )
+            deadline, reason = min(deadlines)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.expired = reason
+                await self.kill()
+                return
+            await asyncio.sleep(remaining)
+
+    async def kill(self) -> None:
+        """
+        Terminate the process group, and kill it if it is still running after `KILL_GRACE`.
+        """
+        logger.error("Killing process %s: %s", self.process.pid, self.expired)
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            await asyncio.wait_for(asyncio.shield(self.process.wait()), KILL_GRACE)
+        except ProcessLookupError:
+            pass
+        except asyncio.TimeoutError:
+            logger.error(
+                "Process %s ignored SIGTERM, sending SIGKILL", self.process.pid
+            )
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+class ResourceSampler:
+    """
+    Record the resource usage of a command.
+
+    While the command runs, the usage is sampled regularly from `/proc/<pid>` (Linux
+    only). Once the command is reaped, the samples are replaced by its `rusage`, which
+    also covers its last moments, e.g. the peak memory of a short command. The values
+    include the child processes which the command has waited for.
+
+    Attributes:
+        pid (int): Process ID of the command.
+        usage (dict[str, float]): CPU seconds, peak memory, IO bytes and context switches.
+    """
+
+    def __init__(self, pid: int) -> None:
+        """
+        Initialize the ResourceSampler without any samples yet.
+
+        Args:
+            pid (int): Process ID of the command.
+        """
+        self.pid = pid
+        self.usage: dict[str, float] = {}
+
+    def sample(self) -> None:
+        """
+        Update the usage from `/proc/<pid>/stat`, `status` and `io`, as far as readable.
+        """
+        proc = f"/proc/{self.pid}"
+        try:
+            with open(f"{proc}/stat") as file:
+                # the fields after the command name, starting with the state (field 3)
+                stat = file.read().rsplit(")", 1)[1].split()
+            ticks = os.sysconf("SC_CLK_TCK")
+            self.usage["cpu_user_seconds"] = (int(stat[11]) + int(stat[13])) / ticks
+            self.usage["cpu_system_seconds"] = (int(stat[12]) + int(stat[14])) / ticks
+        except (OSError, IndexError, ValueError):
+            return
+        for filename, fields in PROC_USAGE_FIELDS.items():
+            try:
+                with open(f"{proc}/{filename}") as file:
+                    for line in file:
+                        field, _, value = line.partition(":")
+                        if field in fields:
+                            key, unit = fields[field]
+                            self.usage[key] = int(value.split()[0]) * unit
+            except (OSError, IndexError, ValueError):
+                # e.g. /proc/<pid>/io is only readable by the owner of the process
+                continue
+
+    async def watch(self) -> None:
+        """
+        Sample the usage every `RESOURCE_SAMPLE_INTERVAL` seconds until cancelled.
+        """
+        while True:
+            self.sample()
+            await asyncio.sleep(RESOURCE_SAMPLE_INTERVAL)
+
+    def finish(self, rusage: resource.struct_rusage) -> None:
+        """
+        Replace the samples by the final usage of the reaped command.
+
+        Args:
+            rusage (resource.struct_rusage): The resource usage from `os.wait4`.
+        """
+        self.usage = {
+            "cpu_user_seconds": rusage.ru_utime,
+            "cpu_system_seconds": rusage.ru_stime,
+            "max_rss_bytes": rusage.ru_maxrss * 1024,
+            # blocks of 512 bytes, like read_bytes and write_bytes of /proc/<pid>/io
+            "read_bytes": rusage.ru_inblock * 512,
+            "write_bytes": rusage.ru_oublock * 512,
+            "voluntary_context_switches": rusage.ru_nvcsw,
+            "involuntary_context_switches": rusage.ru_nivcsw,
+        }
+
+
+def add_usage(total: dict[str, float], usage: dict[str, float]) -> None:
+    """
+    Add the resource usage of one try of a command to the usage of all of its tries.
+
+    Args:
+        total (dict[str, float]): The usage of the previous tries, updated in place.
+        usage (dict[str, float]): The usage of the try, see `ResourceSampler`.
+    """
+    for key, value in usage.items():
+        if key in RESOURCE_MAXIMA:
+            total[key] = max(total.get(key, 0), value)
+        else:
+            total[key] = total.get(key, 0) + value
+
+
+def kill_process_groups(signal_number: int) -> None:
+    """
+    Forward a signal to the process groups of all running commands.
+
+    Args:
+        signal_number (int): The signal to send.
+    """
+    for pgid in list(PROCESS_GROUPS):
+        try:
+            os.killpg(pgid, signal_number)
+        except ProcessLookupError:
+            PROCESS_GROUPS.discard(pgid)
+
+
+def proc_log_threshold(config: dict[str, Any]) -> int:
+    """
+    Determine the minimum level of the process output which is added to the logs.
+
+    Args:
+        config (dict[str, Any]): Configuration dictionary for command execution, using the
+            `proc_log_level` setting (default: debug).
+
+    Returns:
+        int: The higher of `proc_log_level` and the effective level of the logger.
+    """
+    level: int = logging.getLevelName(config.get("proc_log_level", "debug").upper())
+    return max(level, logger.getEffectiveLevel())
+
+
+def log_level(line: bytes) -> int:
+    """
+    Classify a raw line of process output by its prefix.
+
+    Lines which can't match `LOG_LEVEL_PATTERN` are recognized by their first byte,
+    the others are classified with a single match of the precompiled pattern.
+
+    Args:
+        line (bytes): The line of output.
+
+    Returns:
+        int: The logging level for the line.
+    """
+    if not line or line[0] not in LOG_LEVEL_INITIALS:
+        return logging.INFO
+    match = LOG_LEVEL_PATTERN.match(line)
+    return (
+        LOG_LEVEL_GROUPS[match.lastindex] if match and match.lastindex else logging.INFO
+    )
+
+
+async def log_messages(
+    message: asyncio.StreamReader | None,
+    proc_cmd: str,
+    on_output: Callable[[], None] | None = None,
+    tail_lines: int = OUTPUT_TAIL_LINES,
+    threshold: int = logging.NOTSET,
+    parser: BackupJsonParser | None = None,
+) -> str:
     """
     Capture the process output and generate appropriate log messages.
 
+    The output is read as raw bytes in chunks of `OUTPUT_CHUNK_SIZE` and split into lines.
+    Only the lines which are logged are decoded here, bytes which are not valid UTF-8 are
+    shown escaped. The captured lines are decoded at the end, see `OutputCapture`.
+
     Args:
-        message (IO[str] | None): Process output message.
+        message (asyncio.StreamReader | None): Process output stream.
         proc_cmd (str): Name of the executed command (as it should appear in the logs).
+        on_output (Callable[[], None] | None): Called for every chunk of output, e.g. to
+            feed a `Watchdog`.
+        tail_lines (int): Number of last lines to retain, see `OutputCapture`.
+        threshold (int): Minimum level of the lines which are logged, see
+            `proc_log_threshold`. The lines below are only captured.
+        parser (BackupJsonParser | None): Consumes the JSON messages as they arrive and
+            determines their logging level, the other lines are classified by `log_level`.
 
     Returns:
-        str: Complete process output.
+        str: Process output, bounded by `OutputCapture`.
     """
     if message is None:
         return ""
-    output = ""
-    for log_out in message:
-        if log_out.strip():
-            output += log_out
-            if re.match(r"^critical|fatal", log_out, re.I):
-                proc_log_level = logging.CRITICAL
-            elif re.match(r"^error", log_out, re.I):
-                proc_log_level = logging.ERROR
-            elif re.match(r"^warning", log_out, re.I):
-                proc_log_level = logging.WARNING
-            elif re.match(
-                r"^unchanged\s+/", log_out, re.I
-            ):  # unchanged files in restic output
-                proc_log_level = logging.DEBUG
-            else:
-                proc_log_level = logging.INFO
-            logger.log(proc_log_level, "[%s] %s", proc_cmd, log_out.strip())
-    return output
+    output = OutputCapture(tail_lines)
+    pending = b""
+    while True:
+        chunk = await message.read(OUTPUT_CHUNK_SIZE)
+        if chunk:
+            if on_output:
+                on_output()
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            if len(pending) > STREAM_LIMIT:  # don't wait forever for the line break
+                lines.append(pending)
+                pending = b""
+        else:  # end of the output
+            lines = [pending]
+            output.unterminated = bool(pending.strip())
+        for line in lines:
+            if not line or line.isspace():
+                continue
+            output.append(line)
+            json_log_level = parser.feed(line) if parser else None
+            proc_log_level = json_log_level or log_level(line)
+            if proc_log_level >= threshold and logger.isEnabledFor(proc_log_level):
+                if json_log_level:
+                    text = BackupJsonParser.describe(line)
+                else:
+                    text = line.decode("UTF-8", "backslashreplace").strip()
+                logger.log(proc_log_level, "[%s] %s", proc_cmd, text)
+        if not chunk:
+            return output.getvalue()
 
 
-def retry_process(
+async def spawn_process(
+    cmd: str | list[str],
+    shell: bool,
+    profile: dict[str, Any] | None = None,
+    cgroup: TransientCgroup | None = None,
+    env: dict[str, str] | None = None,
+) -> ChildProcess:
+    """
+    Start a command with stdout and stderr combined into one pipe.
+
+    The command is started in a new session, so that its whole process group (e.g. the
+    ssh process of an sftp repository) can be killed by the `Watchdog`.
+
+    Args:
+        cmd (str | list[str]): Command to execute.
+        shell (bool): Execute the command through the shell.
+        profile (dict[str, Any] | None): CPU and IO priority of the command, see
+            `resource_profile`.
+        cgroup (TransientCgroup | None): Created cgroup to move the command into.
+        env (dict[str, str] | None): Additional environment variables of the command.
+
+    Returns:
+        ChildProcess: The started process.
+    """
+    if isinstance(cmd, list):
+        cmd = priority_prefix(profile or {}) + cmd
+    kwargs: dict[str, Any] = {
+        "stdout": PIPE,
+        "stderr": STDOUT,
+        "start_new_session": True,
+    }
+    if env:
+        kwargs["env"] = os.environ | env
+    if shell:
+        popen = subprocess.Popen(
+            cmd if isinstance(cmd, str) else shlex.join(cmd), shell=True, **kwargs
+        )
+    else:
+        popen = subprocess.Popen([cmd] if isinstance(cmd, str) else cmd, **kwargs)
+    if cgroup:
+        cgroup.add(popen.pid)
+    process = ChildProcess(popen)
+    await process.connect()
+    return process
+
+
+async def retry_process(
     cmd: str | list[str],
     config: dict[str, Any],
     abort_reasons: list[str] | None = None,
+    slot: Callable[[], AbstractAsyncContextManager[bool]] | None = None,
+    concurrency: int = 1,
+    memory: int | None = None,
+    progress: Callable[[dict[str, Any]], None] | None = None,
 ) -> dict[str, Any]:
     """
     Execute a command with retries and optional abort conditions.
 
+    Each try is supervised by a `Watchdog` if a `timeout` or `stall_timeout` applies. A killed
+    try ends with `TIMEOUT_RETURNCODE` and is retried like any other failure.
+
+    The errors of failed restic commands are classified with `classify_error`, and the
+    command is not retried if the `retry_policy` of the category is "abort".
+
+    The JSON output of `restic backup --json` is parsed while it arrives, the summary of
+    the last try is returned as `summary`. Its status messages are passed to `progress`,
+    restic prints one every 10 seconds then.
+
+    restic commands are started with the CPU, IO and memory settings of their
+    `resource_profile`, optionally within a `TransientCgroup` per try, and with the Go
+    runtime settings of `go_environment`.
+
+    Each try runs within its own `slot`, which is released during the `retry_backoff`, so
+    that the retry queues up for a free slot again once the backoff has expired.
+
     Args:
         cmd (str | list[str]): Command to execute.
         config (dict[str, Any]): Configuration dictionary for command execution.
         abort_reasons (list[str] | None): List of reasons to abort execution if found in the output.
+        slot (Callable[[], AbstractAsyncContextManager[bool]] | None): Factory of the slot
+            held by each try, see `CommandExecutor.slot`. The remaining tries are skipped if
+            the slot yields False. Each try runs right away if None.
+        concurrency (int): Number of processes which can run at the same time, to share the
+            memory and CPUs between them, see `go_environment`.
+        memory (int | None): The memory available at the start of the run, see
+            `CommandExecutor.memory`.
+        progress (Callable[[dict[str, Any]], None] | None): Called with each status message
+            of `restic backup --json`.
 
     Returns:
         dict[str, Any]: Status and output of the command execution.
@@ -124,23 +1431,98 @@ def retry_process(
 
     shell = config.get("shell", False)
     tries_total = config.get("retry_count", 0) + 1
-    status = {"current_try": 0, "tries_total": tries_total, "output": []}
+    action = command_action(cmd)
+    profile = resource_profile(config, cmd)
+    timeout = action_timeout(config, action)
+    stall = stall_timeout(config)
+    tail_lines = config.get("output_tail_lines", OUTPUT_TAIL_LINES)
+    threshold = proc_log_threshold(config)
+    status: dict[str, Any] = {
+        "current_try": 0,
+        "tries_total": tries_total,
+        "output": [],
+        "timeouts": 0,
+        "error_categories": [],
+        "resources": {},
+    }
+    json_backup = action == "backup" and "--json" in cmd
     proc_cmd = (
         cmd[0]
         if isinstance(cmd, list)
         else os.path.basename(cmd.split(" ", maxsplit=1)[0])
     )
     for i in range(tries_total):
-        status["current_try"] = i + 1
+        async with slot() if slot else nullcontext(True) as runnable:
+            if not runnable:
+                if i:
+                    logger.error(
+                        "Not retrying '%s' after a config-wide abort", proc_cmd
+                    )
+                break
+            status["current_try"] = i + 1
 
-        with Popen(
-            cmd, stdout=PIPE, stderr=STDOUT, shell=shell, encoding="UTF-8"
-        ) as process:  # noqa: S603
-            output = log_messages(process.stdout, proc_cmd)
-        returncode = process.returncode
+            cgroup = None
+            if profile.get("cgroup_parent"):
+                cgroup = TransientCgroup(profile["cgroup_parent"], profile)
+                if not cgroup.create():
+                    cgroup = None
+            try:
+                env = go_environment(profile, concurrency, memory) if action else {}
+                parser = None
+                if json_backup:
+                    show_progress = "RESTIC_PROGRESS_FPS" in os.environ
+                    parser = BackupJsonParser(show_progress, progress)
+                    if not show_progress:
+                        env["RESTIC_PROGRESS_FPS"] = (
+                            LIVE_PROGRESS_FPS if progress else JSON_PROGRESS_FPS
+                        )
+                process = await spawn_process(cmd, shell, profile, cgroup, env)
+                PROCESS_GROUPS.add(process.pid)
+                watchdog = Watchdog(process, timeout, stall)
+                watch = asyncio.create_task(watchdog.watch())
+                sampler = ResourceSampler(process.pid)
+                sampling = asyncio.create_task(sampler.watch())
+                try:
+                    output = await log_messages(
+                        process.stdout,
+                        proc_cmd,
+                        watchdog.touch,
+                        tail_lines,
+                        threshold,
+                        parser,
+                    )
+                    returncode = await process.wait()
+                finally:
+                    watch.cancel()
+                    sampling.cancel()
+                    if process.returncode is None:
+                        # interrupted, e.g. cancelled after another command of the batch
+                        # has failed: the process group would be left orphaned
+                        watchdog.expired = "interrupted"
+                        await watchdog.kill()
+                    PROCESS_GROUPS.discard(process.pid)
+                if process.rusage:
+                    sampler.finish(process.rusage)
+                add_usage(status["resources"], sampler.usage)
+                if parser:
+                    status["summary"] = parser.summary
+            finally:
+                if cgroup:
+                    cgroup.remove()
+        if watchdog.expired and returncode != 0:
+            returncode = TIMEOUT_RETURNCODE
+            status["timeouts"] += 1
+        elif returncode < 0:  # killed by a signal, report it like a shell
+            returncode = 128 - returncode
         status["output"].append((returncode, output))
         if returncode == 0:
             break
+        # only the output of restic is classified, the hooks may print anything
+        category = classify_error(output) if action else None
+        if category:
+            status["error_categories"].append(category)
+        if i + 1 == tries_total:
+            break
 
         if abort_reasons and any(
             abort_reason in output for abort_reason in abort_reasons
@@ -155,6 +1537,9 @@ def retry_process(
                 ],
             )
             break
+        if retry_policy(config, category) == "abort":
+            logger.error("Not retrying '%s' because of a %s error", proc_cmd, category)
+            break
         if config.get("retry_backoff"):
             if " " in config["retry_backoff"]:
                 duration, strategy = config["retry_backoff"].split(" ")
@@ -171,11 +1556,11 @@ def retry_process(
             )
 
             if strategy == "linear":
-                time.sleep(duration * (i + 1))
+                await asyncio.sleep(duration * (i + 1))
             elif strategy == "exponential":
-                time.sleep(duration << i)
+                await asyncio.sleep(duration << i)
             else:  # strategy = "static"
-                time.sleep(duration)
+                await asyncio.sleep(duration)
         else:
             logger.info(
                 "Retry %s/%s command '%s'",
@@ -224,3 +1609,37 @@ def redact_password(repo_str: str, pw_replacement: str) -> str:
         if pw_replacement
         else re_repo.sub(r"\1\3", repo_str)
     )
+
+
+def backend_key(repo_str: str) -> str:
+    """
+    Derive the key of the backend endpoint which stores a repository.
+
+    Repositories sharing the key are served by the same host (or S3 bucket), e.g.
+    `sftp:backup@nas:/srv/a` and `sftp:backup@nas:/srv/b` both map to `sftp:nas`.
+    Local paths map to `local`. No credentials are included in the key.
+
+    Args:
+        repo_str (str): Repository string as passed to `restic -r`.
+
+    Returns:
+        str: The backend key.
+    """
+    scheme, separator, location = repo_str.partition(":")
+    if not separator or scheme == "local" or "/" in scheme:
+        return "local"
+    if location.startswith(("http://", "https://", "//")):
+        url = urlsplit(location)
+        host = url.hostname or ""
+        if url.port:
+            host += f":{url.port}"
+        path = url.path
+    elif scheme == "sftp":
+        host, _, path = location.rpartition("@")[2].partition(":")
+    else:
+        host, _, path = location.partition("/")
+        host = host.split(":", maxsplit=1)[0]
+    if scheme == "s3":
+        bucket = path.strip("/").split("/", maxsplit=1)[0]
+        return f"{scheme}:{host}/{bucket}" if bucket else f"{scheme}:{host}"
+    return f"{scheme}:{host}"
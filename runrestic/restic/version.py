@@ -0,0 +1,186 @@
+"""
+This module probes the version of the Restic binary and derives the features it supports.
+
+The version is cached in `$XDG_CACHE_HOME/runrestic/restic-version.json`, keyed by the path,
+modification time and size of the binary, so `restic version` only runs again after restic
+has been replaced, e.g. by an update.
+"""
+
+import logging
+import os
+import re
+import subprocess
+from dataclasses import dataclass
+from functools import cache
+from shutil import which
+
+from runrestic.runrestic.tools import cache_directory, load_cache, save_cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = "restic-version.json"
+VERSION_TIMEOUT = 30
+RE_VERSION = re.compile(r"restic (\d+)\.(\d+)\.(\d+)")
+# first Restic versions supporting a feature
+JSON_BACKUP_VERSION = (0, 9, 0)
+NEW_PRUNE_VERSION = (0, 12, 0)
+NO_SCAN_VERSION = (0, 15, 0)
+FORGET_KEEP_OLDEST_VERSION = (0, 17, 0)
+
+
+@dataclass(frozen=True, slots=True)
+class ResticCapabilities:
+    """
+    The features of the Restic binary, derived from its version.
+
+    If the version is unknown, the output of current Restic releases is assumed and no
+    optional flags are used.
+
+    Attributes:
+        version (tuple[int, int, int] | None): The version of Restic, None if unknown.
+    """
+
+    version: tuple[int, int, int] | None = None
+
+    @property
+    def json_backup(self) -> bool:
+        """
+        Whether `restic backup --json` reports its status and summary as JSON messages.
+        """
+        return self.version is None or self.version >= JSON_BACKUP_VERSION
+
+    @property
+    def new_prune(self) -> bool:
+        """
+        Whether `restic prune` prints the statistics of restic 0.12.0 and later.
+        """
+        return self.version is None or self.version >= NEW_PRUNE_VERSION
+
+    @property
+    def no_scan(self) -> bool:
+        """
+        Whether `restic backup` supports `--no-scan`.
+        """
+        return self.version is not None and self.version >= NO_SCAN_VERSION
+
+    @property
+    def forget_keeps_oldest(self) -> bool:
+        """
+        Whether `restic forget` keeps the oldest snapshot for `keep-*` counts left over.
+        """
+        return self.version is None or self.version >= FORGET_KEEP_OLDEST_VERSION
+
+
+def parse_version(output: str) -> tuple[int, int, int] | None:
+    """
+    Parse the output of `restic version`.
+
+    Args:
+        output (str): The output, e.g. "restic 0.16.4 compiled with go1.21.6 on linux/amd64".
+
+    Returns:
+        tuple[int, int, int] | None: The version, None if not found in the output.
+
+    Examples:
+        >>> parse_version("restic 0.16.4 compiled with go1.21.6 on linux/amd64")
+        (0, 16, 4)
+        >>> parse_version("restic 0.17.0-dev (compiled manually) compiled with go1.22.1")
+        (0, 17, 0)
+        >>> parse_version("command not found") is None
+        True
+    """
+    match = RE_VERSION.search(output)
+    if not match:
+        return None
+    major, minor, patch = map(int, match.groups())
+    return major, minor, patch
+
+
+def probe_version(binary: str) -> tuple[int, int, int] | None:
+    """
+    Run `restic version` to get the version of the binary.
+
+    Args:
+        binary (str): The path of the Restic binary.
+
+    Returns:
+        tuple[int, int, int] | None: The version, None if it could not be determined.
+    """
+    try:
+        result = subprocess.run(
+            [binary, "version"],
+            capture_output=True,
+            text=True,
+            timeout=VERSION_TIMEOUT,
+            check=False,
+        )
+    except (OSError, subprocess.SubprocessError) as err:
+        logger.warning("Unable to determine the restic version: %s", err)
+        return None
+    version = parse_version(result.stdout)
+    if version is None:
+        logger.warning("Unable to parse the restic version: %s", result.stdout.strip())
+    return version
+
+
+@cache
+def cached_version(
+    binary: str, mtime_ns: int, size: int
+) -> tuple[int, int, int] | None:
+    """
+    Get the version of a binary from the cache file, or probe and cache it.
+
+    The results are also memoized in the process, so that the runners of all
+    configurations share them.
+
+    Args:
+        binary (str): The resolved path of the Restic binary.
+        mtime_ns (int): The modification time of the binary in nanoseconds.
+        size (int): The size of the binary in bytes.
+
+    Returns:
+        tuple[int, int, int] | None: The version, None if it could not be determined.
+    """
+    path = os.path.join(cache_directory(), CACHE_FILE)
+    cache_content = load_cache(path)
+    entry = cache_content.get(binary)
+    if (
+        isinstance(entry, dict)
+        and entry.get("mtime_ns") == mtime_ns
+        and entry.get("size") == size
+        and isinstance(entry.get("version"), list)
+        and len(entry["version"]) == 3
+    ):
+        major, minor, patch = entry["version"]
+        return major, minor, patch
+
+    version = probe_version(binary)
+    if version is not None:
+        cache_content[binary] = {
+            "mtime_ns": mtime_ns,
+            "size": size,
+            "version": list(version),
+        }
+        save_cache(path, cache_content)
+    return version
+
+
+def restic_capabilities() -> ResticCapabilities:
+    """
+    Get the capabilities of the `restic` binary found in the PATH.
+
+    Returns:
+        ResticCapabilities: The capabilities, with an unknown version if restic is not
+        installed or its version could not be determined.
+    """
+    binary = which("restic")
+    if not binary:
+        return ResticCapabilities()
+    binary = os.path.realpath(binary)
+    try:
+        stat = os.stat(binary)
+    except OSError:
+        return ResticCapabilities()
+    version = cached_version(binary, stat.st_mtime_ns, stat.st_size)
+    logger.debug("Using restic %s at %s", version, binary)
+    return ResticCapabilities(version)
@@ -9,7 +9,7 @@ JSON schema to ensure correctness.
 import json
 import logging
 import os
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
 from importlib.resources import open_text
 from typing import Any
 
@@ -32,6 +32,32 @@ with open_text("runrestic.runrestic", "schema.json", encoding="utf-8") as schema
     SCHEMA: dict[str, Any] = json.load(schema_file)
 
 
+def parallel_limit_argument(value: str) -> int | str:
+    """
+    Validate the value of the `--max-parallel` CLI argument.
+
+    Args:
+        value (str): Either "auto" or a positive integer.
+
+    Returns:
+        int | str: "auto" or the integer limit.
+
+    Raises:
+        ArgumentTypeError: If the value is neither "auto" nor a positive integer.
+    """
+    if value == "auto":
+        return value
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ArgumentTypeError(
+            f"invalid value '{value}', use 'auto' or a positive integer"
+        )  # noqa: TRY003
+    return limit
+
+
 def cli_arguments(args: list[str] | None = None) -> tuple[Namespace, list[str]]:
     """
     Parse command-line arguments for the `runrestic` application.
@@ -54,7 +80,8 @@ def cli_arguments(args: list[str] | None = None) -> tuple[Namespace, list[str]]:
         "actions",
         type=str,
         nargs="*",
-        help="one or more from the following actions: [shell, init, backup, prune, check, stats, unlock]",
+        help="one or more from the following actions: "
+        "[shell, init, backup, prune, check, stats, unlock, forget-preview]",
     )
     parser.add_argument(
         "-n",
@@ -71,6 +98,16 @@ def cli_arguments(args: list[str] | None = None) -> tuple[Namespace, list[str]]:
         default="info",
         help="Choose from: critical, error, warning, info, debug. (default: info)",
     )
+    parser.add_argument(
+        "-p",
+        "--proc-log-level",
+        metavar="LOG_LEVEL",
+        dest="proc_log_level",
+        choices=["critical", "error", "warning", "info", "debug"],
+        help="Minimum level of the restic and hook output added to the logs, choose from: "
+        "critical, error, warning, info, debug. Overrides [execution] proc_log_level "
+        "(default: debug)",
+    )
     parser.add_argument(
         "-c",
         "--config",
@@ -82,6 +119,13 @@ def cli_arguments(args: list[str] | None = None) -> tuple[Namespace, list[str]]:
         metavar="INTERVAL",
         help="Updated interval in seconds for restic progress (default: None)",
     )
+    parser.add_argument(
+        "--max-parallel",
+        metavar="LIMIT",
+        type=parallel_limit_argument,
+        help="Run up to LIMIT restic processes in parallel, 'auto' derives it from CPUs "
+        "and memory. Overrides [execution] parallel and max_parallel (default: None)",
+    )
     parser.add_argument(
         "-v", "--version", action="version", version="%(prog)s " + __version__
     )
@@ -90,7 +134,16 @@ def cli_arguments(args: list[str] | None = None) -> tuple[Namespace, list[str]]:
     if extras:
         extras = [x for x in extras if x != "--"]
     else:
-        valid_actions = ["shell", "init", "backup", "prune", "check", "stats", "unlock"]
+        valid_actions = [
+            "shell",
+            "init",
+            "backup",
+            "prune",
+            "check",
+            "stats",
+            "unlock",
+            "forget-preview",
+        ]
         extras = []
         new_actions: list[str] = []
         for act in options.actions:
@@ -15,6 +15,7 @@ from typing import Any
 from runrestic.restic.installer import restic_check
 from runrestic.restic.runner import ResticRunner
 from runrestic.restic.shell import restic_shell
+from runrestic.restic.tools import CommandExecutor, kill_process_groups
 from runrestic.runrestic.configuration import (
     cli_arguments,
     configuration_file_paths,
@@ -47,7 +48,8 @@ def configure_signals() -> None:
     Configure signal handling for the application.
 
     This function ensures that the application properly handles termination signals
-    by killing the entire process group.
+    by killing the entire process group, including the process groups of the running
+    commands which are started in their own sessions.
     """
 
     def kill_the_group(signal_number: signal.Signals, _frame: Any) -> None:
@@ -58,6 +60,7 @@ def configure_signals() -> None:
             signal_number (signal.Signals): The signal received.
             _frame (Any): The current stack frame (unused).
         """
+        kill_process_groups(signal_number)
         os.killpg(os.getpgrp(), signal_number)
 
     signals = [
@@ -105,15 +108,31 @@ def runrestic() -> None:
     if args.show_progress:
         os.environ["RESTIC_PROGRESS_FPS"] = str(1 / float(args.show_progress))
 
+    if args.max_parallel:
+        for config in configs:
+            config["execution"] = {
+                **config["execution"],
+                "parallel": True,
+                "max_parallel": args.max_parallel,
+            }
+
+    if args.proc_log_level:
+        for config in configs:
+            config["execution"] = {
+                **config["execution"],
+                "proc_log_level": args.proc_log_level,
+            }
+
     if "shell" in args.actions:
         restic_shell(configs)
         return
 
     # Track the results (number of errors) per config
     result: list[int] = []
-    for config in configs:
-        runner = ResticRunner(config, args, extras)
-        result.append(runner.run())
+    with CommandExecutor() as executor:
+        for config in configs:
+            runner = ResticRunner(config, args, extras, executor)
+            result.append(runner.run())
 
     if sum(result) > 0:
         sys.exit(1)
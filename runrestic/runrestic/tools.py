@@ -1,17 +1,35 @@
 """
 This module provides utility functions for parsing and manipulating data related to Restic operations.
 
-It includes functions to parse sizes, times, and lines of text using regular expressions, as well as
-a utility to deeply update nested dictionaries. These functions are used throughout the application
-to process and format data.
+It includes functions to parse sizes, times, and lines of text using regular expressions, the
+`FieldParser` which extracts several fields from an output in a single pass, a utility to deeply
+update nested dictionaries, and the JSON files of the runrestic cache. These functions are used
+throughout the application to process and format data.
 """
 
+import hashlib
+import json
 import logging
+import os
 import re
 from typing import Any, TypeVar
 
 logger = logging.getLogger(__name__)
 
+RE_SIZE = re.compile(r"([0-9.]+) ?([a-zA-Z]*B)")
+SIZE_UNITS = {
+    "B": 1,
+    "kB": 10**3,
+    "MB": 10**6,
+    "GB": 10**9,
+    "TB": 10**12,
+    "KiB": 1024,
+    "MiB": 2**20,
+    "GiB": 2**30,
+    "TiB": 2**40,
+}
+RE_TIME = re.compile(r"(?:([0-9]+):)?([0-9]+):([0-9]+)")
+
 
 def make_size(size: int) -> str:
     """
@@ -44,24 +62,12 @@ def parse_size(size: str) -> float:
     Returns:
         float: The size in bytes. Returns 0.0 if parsing fails.
     """
-    re_bytes = re.compile(r"([0-9.]+) ?([a-zA-Z]*B)")
-    try:
-        number, unit = re_bytes.findall(size)[0]
-    except IndexError:
+    match = RE_SIZE.search(size)
+    if match is None:
         logger.error("Failed to parse size of '%s'", size)
         return 0.0
-    units = {
-        "B": 1,
-        "kB": 10**3,
-        "MB": 10**6,
-        "GB": 10**9,
-        "TB": 10**12,
-        "KiB": 1024,
-        "MiB": 2**20,
-        "GiB": 2**30,
-        "TiB": 2**40,
-    }
-    return float(number) * units.get(unit, 1)
+    number, unit = match.groups()
+    return float(number) * SIZE_UNITS.get(unit, 1)
 
 
 def parse_time(time_str: str) -> int:
@@ -74,14 +80,11 @@ def parse_time(time_str: str) -> int:
     Returns:
         int: The total time in seconds. Returns 0 if parsing fails.
     """
-    re_time = re.compile(r"(?:([0-9]+):)?([0-9]+):([0-9]+)")
-    try:
-        hours, minutes, seconds = (
-            int(x) if x else 0 for x in re_time.findall(time_str)[0]
-        )
-    except IndexError:
+    match = RE_TIME.search(time_str)
+    if match is None:
         logger.error("Failed to parse time of '%s'", time_str)
         return 0
+    hours, minutes, seconds = (int(x) if x else 0 for x in match.groups())
     if minutes:
         seconds += minutes * 60
     if hours:
@@ -112,6 +115,73 @@ def deep_update(base: dict[Any, Any], update: dict[Any, Any]) -> dict[Any, Any]:
     return new
 
 
+def cache_directory() -> str:
+    """
+    Get the runrestic directory in the user cache, which is also used by Restic.
+
+    Returns:
+        str: The path of the directory, which may not exist yet.
+    """
+    user_cache_directory = os.getenv("XDG_CACHE_HOME") or os.path.expandvars(
+        os.path.join("$HOME", ".cache")
+    )
+    return os.path.join(user_cache_directory, "runrestic")
+
+
+def repository_digest(repo: str) -> str:
+    """
+    Get a short hash of a repository for the names of its cache files, which keeps the
+    credentials of a repository URL out of the file names.
+
+    Args:
+        repo (str): The repository.
+
+    Returns:
+        str: The hexadecimal hash.
+
+    Examples:
+        >>> repository_digest("/tmp/restic-repo")
+        '0f3721505743b319'
+    """
+    return hashlib.sha256(repo.encode()).hexdigest()[:16]
+
+
+def load_cache(path: str) -> dict[str, Any]:
+    """
+    Load a JSON cache file.
+
+    Args:
+        path (str): The path of the cache file.
+
+    Returns:
+        dict[str, Any]: The cached content, empty if the file is missing or unreadable.
+    """
+    try:
+        with open(path) as file:
+            content = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return content if isinstance(content, dict) else {}
+
+
+def save_cache(path: str, content: dict[str, Any]) -> None:
+    """
+    Replace a JSON cache file atomically, failures are only logged as the cache is optional.
+
+    Args:
+        path (str): The path of the cache file.
+        content (dict[str, Any]): The content to cache.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, "w") as file:
+            json.dump(content, file)
+        os.replace(temp_path, path)
+    except OSError as err:
+        logger.warning("Unable to write the cache file %s: %s", path, err)
+
+
 ParsedType = TypeVar("ParsedType", str, tuple[str, ...])
 
 
@@ -141,11 +211,11 @@ def parse_line(
         ... )
         ('10', '5', '20')
     """
-    try:
-        parsed = re.findall(regex, output)[0]
-    except IndexError:
+    match = re.search(regex, output)
+    if match is None:
         logger.error("No match in output for regex '%s'", regex)
         return default
+    parsed = _match_value(match.groups()) if match.re.groups else match.group(0)
     if isinstance(parsed, type(default)):
         return parsed
     else:
@@ -153,3 +223,103 @@ def parse_line(
             f"The format of the parsed output '{parsed}' does not match the expected format as per default '{default}'.",
         )
     return default
+
+
+def _match_value(groups: tuple[str, ...]) -> str | tuple[str, ...]:
+    """
+    Convert the groups of a match like `re.findall`: a string for a single group.
+
+    Args:
+        groups (tuple[str, ...]): The groups of the match.
+
+    Returns:
+        str | tuple[str, ...]: The single group, or all groups.
+    """
+    return groups[0] if len(groups) == 1 else groups
+
+
+class FieldParser:
+    r"""
+    Extract several fields from an output in a single pass.
+
+    The regular expressions of all fields are compiled once into one alternation, so the
+    output is scanned only once, until each field has been found. Like `parse_line`, the
+    first match of a field wins and a missing field gets its default value. With `start`,
+    e.g. the first line of a summary, the output before its first occurrence is skipped.
+
+    Args:
+        fields (dict[str, tuple[str, str | tuple[str, ...]]]): The regular expression and
+            the default value per field. The regular expressions must not use named groups
+            or backreferences.
+        start (str | None): Literal text preceding all fields in the output.
+
+    Examples:
+        >>> parser = FieldParser({
+        ...     "files": (r"Files:\s+([0-9]+) new,\s+([0-9]+) changed", ("0", "0")),
+        ...     "added": (r"Added to the repo: ([0-9.]+ [a-zA-Z]*B)", "0 B"),
+        ... })
+        >>> parser.parse("Files: 10 new, 5 changed\nAdded to the repo: 1.2 MiB")
+        {'files': ('10', '5'), 'added': '1.2 MiB'}
+    """
+
+    def __init__(
+        self,
+        fields: dict[str, tuple[str, str | tuple[str, ...]]],
+        start: str | None = None,
+    ) -> None:
+        self.fields = fields
+        self.start = start
+        self._groups: dict[str, slice] = {}
+        # the field of each group, to look up the field of a match by its `lastindex`
+        self._group_fields: dict[int, str] = {}
+        alternatives = []
+        index = 0
+        for name, (regex, _default) in fields.items():
+            if not re.compile(regex).groups:  # the whole match, like `re.findall`
+                regex = f"({regex})"
+            width = re.compile(regex).groups
+            self._groups[name] = slice(index, index + width)
+            self._group_fields.update(
+                dict.fromkeys(range(index + 1, index + width + 1), name)
+            )
+            index += width
+            alternatives.append(regex)
+        # plain alternatives, so that the regex engine can still skip ahead to the
+        # possible first characters
+        self.pattern = re.compile("|".join(alternatives))
+
+    def parse(self, output: str) -> dict[str, Any]:
+        """
+        Extract all fields from the output.
+
+        Args:
+            output (str): The text output to be parsed.
+
+        Returns:
+            dict[str, Any]: The parsed value or the default value per field.
+        """
+        values: dict[str, Any] = {}
+        position = max(output.find(self.start), 0) if self.start else 0
+        for match in self.pattern.finditer(output, position):
+            name = self._group_fields.get(match.lastindex or 0)
+            if name is None or name in values:
+                continue
+            default = self.fields[name][1]
+            parsed = _match_value(match.groups()[self._groups[name]])
+            if isinstance(parsed, type(default)):
+                values[name] = parsed
+            else:
+                logger.error(
+                    "The format of the parsed output '%s' does not match the expected "
+                    "format as per default '%s'.",
+                    parsed,
+                    default,
+                )
+                values[name] = default
+            if len(values) == len(self.fields):
+                break
+        for name, (regex, default) in self.fields.items():
+            if name not in values:
+                logger.error("No match in output for regex '%s'", regex)
+                values[name] = default
+        return values
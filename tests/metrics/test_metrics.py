@@ -1,8 +1,22 @@
+import os
+import tempfile
 from typing import Any
 from unittest import TestCase
 from unittest.mock import mock_open, patch
 
-from runrestic.metrics import prometheus, write_metrics
+from runrestic.metrics import ProgressWriter, prometheus, write_metrics
+from runrestic.restic import output_parsing
+from runrestic.restic.results import (
+    BackupResult,
+    CheckResult,
+    CommandResult,
+    Counts,
+    ForgetResult,
+    NewPruneResult,
+    Processed,
+    PruneResult,
+    StatsResult,
+)
 
 
 class TestResticMetrics(TestCase):
@@ -43,6 +57,59 @@ class TestResticMetrics(TestCase):
         mock_generate_lines.assert_not_called()
 
 
+class TestProgressWriter(TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "progress.prom")
+        self.config = {
+            "name": "test",
+            "metrics": {
+                "prometheus": {"path": "/prometheus_path", "progress_path": self.path}
+            },
+        }
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def read(self) -> str:
+        with open(self.path) as file:
+            return file.read()
+
+    def test_update_throttled(self):
+        writer = ProgressWriter(self.config)
+        self.assertEqual(writer.interval, 30)
+        writer.update("repo1", {"message_type": "status", "percent_done": 0.25})
+        self.assertIn(
+            'restic_backup_progress_percent_done{config="test",repository="repo1"} 0.25',
+            self.read(),
+        )
+        # within the interval, the file is not written again
+        writer.update("repo1", {"message_type": "status", "percent_done": 0.5})
+        self.assertNotIn("0.5", self.read())
+        self.assertEqual(writer.progress["repo1"]["percent_done"], 0.5)
+        self.assertEqual(os.listdir(self.temp_dir.name), ["progress.prom"])
+
+    def test_finish(self):
+        self.config["metrics"]["prometheus"]["progress_interval"] = 0
+        writer = ProgressWriter(self.config)
+        writer.update("repo1", {"message_type": "status", "percent_done": 0.5})
+        writer.update("repo2", {"message_type": "status", "bytes_done": 1024})
+        self.assertIn(
+            'restic_backup_progress_bytes_done{config="test",repository="repo2"} 1024',
+            self.read(),
+        )
+        writer.finish("repo1")
+        self.assertNotIn("repo1", self.read())
+        writer.finish("repo2")
+        self.assertEqual(self.read(), "")
+
+    @patch("runrestic.metrics.logger.warning")
+    def test_write_error(self, mock_warning):
+        self.config["metrics"]["prometheus"]["progress_path"] = "/nonexistent/p.prom"
+        ProgressWriter(self.config).update("repo1", {"message_type": "status"})
+        mock_warning.assert_called_once()
+
+
 def mock_metrics_func(metrics, name):
     return f"{name}: {metrics}"
 
@@ -116,6 +183,75 @@ class TestResticMetricsPrometheus(TestCase):
                 lines = prometheus.generate_lines(metrics, sc["name"])
                 self.assertEqual(list(lines), expected_lines)
 
+    def test_generate_lines_error_categories(self):
+        prometheus._restic_help_general = "restic_help_general"
+        prometheus._restic_general = "restic_general:{name}:{errors}"
+        metrics = {"errors": 2, "error_categories": {"network": 2, "auth": 0}}
+        lines = list(prometheus.generate_lines(metrics, "test"))
+        self.assertEqual(
+            lines[2:],
+            [
+                prometheus._restic_help_error_categories,
+                'restic_total_error_category{config="test",category="network"} 2\n',
+                'restic_total_error_category{config="test",category="auth"} 0\n',
+            ],
+        )
+
+    def test_resource_metrics(self):
+        metrics = {
+            "errors": 0,
+            "backup": {
+                "_restic_pre_hooks": {"rc": 0, "duration_seconds": 1},
+                "repo1": CommandResult(rc=0, resources={"cpu_user_seconds": 1.5}),
+                "repo2": CommandResult(rc=1),
+            },
+            "check": {"repo1": CommandResult(rc=0, resources={"max_rss_bytes": 1024})},
+        }
+        lines = prometheus.resource_metrics(metrics, "test").splitlines()
+        self.assertIn(
+            'restic_process_cpu_user_seconds{config="test",action="backup",repository="repo1"} 1.5',
+            lines,
+        )
+        self.assertIn(
+            'restic_process_read_bytes{config="test",action="backup",repository="repo1"} 0',
+            lines,
+        )
+        self.assertIn(
+            'restic_process_max_rss_bytes{config="test",action="check",repository="repo1"} 1024',
+            lines,
+        )
+        self.assertFalse([line for line in lines if "repo2" in line])
+        self.assertEqual(prometheus.resource_metrics({"errors": 0}, "test"), "")
+
+    def test_progress_metrics(self):
+        progress = {
+            "repo1": {
+                "message_type": "status",
+                "percent_done": 0.5,
+                "total_bytes": 2048,
+                "seconds_remaining": 60,
+                "last_update": 1700000000.0,
+            }
+        }
+        lines = prometheus.progress_metrics(progress, "test").splitlines()
+        self.assertIn(
+            'restic_backup_progress_percent_done{config="test",repository="repo1"} 0.5',
+            lines,
+        )
+        self.assertIn(
+            'restic_backup_progress_seconds_remaining{config="test",repository="repo1"} 60',
+            lines,
+        )
+        self.assertIn(
+            'restic_backup_progress_files_done{config="test",repository="repo1"} 0',
+            lines,
+        )
+        self.assertIn(
+            'restic_backup_progress_last_update{config="test",repository="repo1"} 1700000000.0',
+            lines,
+        )
+        self.assertEqual(prometheus.progress_metrics({}, "test"), "")
+
     def test_backup_metrics(self):
         scenarios: list[dict[str, Any]] = [
             {
@@ -123,30 +259,22 @@ class TestResticMetricsPrometheus(TestCase):
                 "metrics": {
                     "_restic_pre_hooks": {"duration_seconds": 2, "rc": 0},
                     "_restic_post_hooks": {"duration_seconds": 4, "rc": 0},
-                    "repo1": {
-                        "files": {"new": "1", "changed": "2", "unmodified": "3"},
-                        "dirs": {"new": "1", "changed": "2", "unmodified": "3"},
-                        "processed": {
-                            "files": "1",
-                            "size_bytes": 2,
-                            "duration_seconds": 3,
-                        },
-                        "added_to_repo": 7,
-                        "duration_seconds": 9,
-                        "rc": 0,
-                    },
-                    "repo2": {
-                        "files": {"new": "1", "changed": "2", "unmodified": "3"},
-                        "dirs": {"new": "1", "changed": "2", "unmodified": "3"},
-                        "processed": {
-                            "files": "1",
-                            "size_bytes": 2,
-                            "duration_seconds": 3,
-                        },
-                        "added_to_repo": 5,
-                        "duration_seconds": 8,
-                        "rc": 1,
-                    },
+                    "repo1": BackupResult(
+                        files=Counts(1, 2, 3),
+                        dirs=Counts(1, 2, 3),
+                        processed=Processed(1, 2, 3),
+                        added_to_repo=7,
+                        duration_seconds=9,
+                        rc=0,
+                    ),
+                    "repo2": BackupResult(
+                        files=Counts(1, 2, 3),
+                        dirs=Counts(1, 2, 3),
+                        processed=Processed(1, 2, 3),
+                        added_to_repo=5,
+                        duration_seconds=8,
+                        rc=1,
+                    ),
                 },
                 "expected_lines": [
                     "restic_help_backup",
@@ -161,30 +289,22 @@ class TestResticMetricsPrometheus(TestCase):
             {
                 "name": "without_hooks",
                 "metrics": {
-                    "repo1": {
-                        "files": {"new": "1", "changed": "2", "unmodified": "3"},
-                        "dirs": {"new": "1", "changed": "2", "unmodified": "3"},
-                        "processed": {
-                            "files": "1",
-                            "size_bytes": 2,
-                            "duration_seconds": 3,
-                        },
-                        "added_to_repo": 7,
-                        "duration_seconds": 9,
-                        "rc": 0,
-                    },
-                    "repo2": {
-                        "files": {"new": "1", "changed": "2", "unmodified": "3"},
-                        "dirs": {"new": "1", "changed": "2", "unmodified": "3"},
-                        "processed": {
-                            "files": "1",
-                            "size_bytes": 2,
-                            "duration_seconds": 3,
-                        },
-                        "added_to_repo": 5,
-                        "duration_seconds": 8,
-                        "rc": 1,
-                    },
+                    "repo1": BackupResult(
+                        files=Counts(1, 2, 3),
+                        dirs=Counts(1, 2, 3),
+                        processed=Processed(1, 2, 3),
+                        added_to_repo=7,
+                        duration_seconds=9,
+                        rc=0,
+                    ),
+                    "repo2": BackupResult(
+                        files=Counts(1, 2, 3),
+                        dirs=Counts(1, 2, 3),
+                        processed=Processed(1, 2, 3),
+                        added_to_repo=5,
+                        duration_seconds=8,
+                        rc=1,
+                    ),
                 },
                 "expected_lines": [
                     "restic_help_backup",
@@ -199,7 +319,7 @@ class TestResticMetricsPrometheus(TestCase):
         # check call with simplified output
         prometheus._restic_help_backup = "restic_help_backup|"
         prometheus._restic_backup = (
-            "restic_backup_data:{name}:{added_to_repo}:{duration_seconds}|"
+            "restic_backup_data:{name}:{r.added_to_repo}:{r.duration_seconds}|"
         )
         for sc in scenarios:
             with self.subTest(sc["name"]):
@@ -209,25 +329,48 @@ class TestResticMetricsPrometheus(TestCase):
                     "|".join(sc["expected_lines"]),
                 )
 
+    def test_backup_metrics_json(self):
+        process_infos = {
+            "output": [(0, "")],
+            "time": 9,
+            "summary": {
+                "files_new": 1,
+                "data_added": 100,
+                "data_added_packed": 40,
+                "total_bytes_processed": 1000,
+                "data_blobs": 12,
+                "tree_blobs": 3,
+            },
+        }
+        metrics = {"repo1": output_parsing.parse_backup_json(process_infos)}
+        text = prometheus.backup_metrics(metrics, "my_backup")
+        for line in [
+            'restic_backup_data_added_packed{config="my_backup",repository="repo1"} 40',
+            'restic_backup_total_bytes_processed{config="my_backup",repository="repo1"} 1000',
+            'restic_backup_data_blobs{config="my_backup",repository="repo1"} 12',
+            'restic_backup_tree_blobs{config="my_backup",repository="repo1"} 3',
+            "# TYPE restic_backup_data_blobs gauge",
+        ]:
+            self.assertIn(line, text)
+
+        # older restic versions don't report the packed size
+        del process_infos["summary"]["data_added_packed"]
+        metrics = {"repo1": output_parsing.parse_backup_json(process_infos)}
+        text = prometheus.backup_metrics(metrics, "my_backup")
+        self.assertIn("# TYPE restic_backup_data_blobs gauge", text)
+        self.assertNotIn("restic_backup_data_added_packed", text)
+
     def test_forget_metrics(self):
         metrics = {
-            "repo1": {
-                "removed_snapshots": "7",
-                "duration_seconds": 9,
-                "rc": 0,
-            },
-            "repo2": {
-                "removed_snapshots": "2",
-                "duration_seconds": 4.4,
-                "rc": 1,
-            },
+            "repo1": ForgetResult(removed_snapshots=7, duration_seconds=9, rc=0),
+            "repo2": ForgetResult(removed_snapshots=2, duration_seconds=4.4, rc=1),
         }
         # check that forget_metrics can be called with sample metrics
         _lines = prometheus.forget_metrics(metrics, "my_forget")
         # check call with simplified output
         prometheus._restic_help_forget = "restic_help_forget|"
         prometheus._restic_forget = (
-            "restic_forget_data:{name}:{removed_snapshots}:{duration_seconds}|"
+            "restic_forget_data:{name}:{r.removed_snapshots}:{r.duration_seconds}|"
         )
         lines = prometheus.forget_metrics(metrics, "my_forget")
         self.assertEqual(
@@ -243,66 +386,66 @@ class TestResticMetricsPrometheus(TestCase):
 
     def test_new_prune_metrics(self):
         metrics = {
-            "/tmp/restic-repo1": {  # noqa: S108
-                "containing_packs_before": "576",
-                "containing_blobs": "95060",
-                "containing_size_bytes": 2764885196.8,
-                "duplicate_blobs": "0",
-                "duplicate_size_bytes": 0.0,
-                "in_use_blobs": "95055",
-                "removed_blobs": "5",
-                "invalid_files": "0",
-                "deleted_packs": "2",
-                "rewritten_packs": "0",
-                "size_freed_bytes": 16679.936,
-                "removed_index_files": "2",
-                "duration_seconds": 4.2,
-                "rc": 0,
-            },
+            "/tmp/restic-repo1": PruneResult(  # noqa: S108
+                containing_packs_before=576,
+                containing_blobs=95060,
+                containing_size_bytes=2764885196.8,
+                duplicate_blobs=0,
+                duplicate_size_bytes=0.0,
+                in_use_blobs=95055,
+                removed_blobs=5,
+                invalid_files=0,
+                deleted_packs=2,
+                rewritten_packs=0,
+                size_freed_bytes=16679.936,
+                removed_index_files=2,
+                duration_seconds=4.2,
+                rc=0,
+            ),
             # data block with old prune metrics
-            "/tmp/restic-repo2": {  # noqa: S108
-                "to_repack_blobs": "864",
-                # "containing_blobs": "95060",
-                "to_repack_bytes": 2764885196.8,
-                "removed_blobs": "11",
-                "removed_bytes": 42.0,
-                "to_delete_blobs": "96358",
-                "to_delete_bytes": 5249.936,
-                "total_prune_blobs": "5",
-                "total_prune_bytes": 85176.225,
-                "remaining_blobs": "2",
-                "remaining_bytes": 52.244,
-                "remaining_unused_size": 16679.936,
-                "duration_seconds": 7.3,
-                "rc": 0,
-            },
+            "/tmp/restic-repo2": NewPruneResult(  # noqa: S108
+                to_repack_blobs=864,
+                # containing_blobs=95060,
+                to_repack_bytes=2764885196.8,
+                removed_blobs=11,
+                removed_bytes=42.0,
+                to_delete_blobs=96358,
+                to_delete_bytes=5249.936,
+                total_prune_blobs=5,
+                total_prune_bytes=85176.225,
+                remaining_blobs=2,
+                remaining_bytes=52.244,
+                remaining_unused_size=16679.936,
+                duration_seconds=7.3,
+                rc=0,
+            ),
             # data block with new prune metrics and rc > 0
-            "/tmp/restic-repo3": {  # noqa: S108
-                "containing_packs_before": "575",
-                "containing_blobs": "95052",
-                "containing_size_bytes": 2765958938.624,
-                "duplicate_blobs": "0",
-                "duplicate_size_bytes": 0.0,
-                "in_use_blobs": "95047",
-                "removed_blobs": "5",
-                "invalid_files": "0",
-                "deleted_packs": "2",
-                "rewritten_packs": "0",
-                "size_freed_bytes": 16613.376,
-                "removed_index_files": "2",
-                "duration_seconds": 4.281890153884888,
-                "rc": 1,
-            },
+            "/tmp/restic-repo3": PruneResult(  # noqa: S108
+                containing_packs_before=575,
+                containing_blobs=95052,
+                containing_size_bytes=2765958938.624,
+                duplicate_blobs=0,
+                duplicate_size_bytes=0.0,
+                in_use_blobs=95047,
+                removed_blobs=5,
+                invalid_files=0,
+                deleted_packs=2,
+                rewritten_packs=0,
+                size_freed_bytes=16613.376,
+                removed_index_files=2,
+                duration_seconds=4.281890153884888,
+                rc=1,
+            ),
         }
         # check that prune_metrics can be called with sample metrics
         _lines = prometheus.prune_metrics(metrics, "my_prune")
         # check call with simplified output
         prometheus._restic_help_prune = "restic_help_prune|"
         prometheus._restic_prune = (
-            "restic_prune_data:{name}:{containing_packs_before}:{duration_seconds}|"
+            "restic_prune_data:{name}:{r.containing_packs_before}:{r.duration_seconds}|"
         )
         prometheus._restic_new_prune = (
-            "restic_prune_data:{name}:{to_repack_blobs}:{duration_seconds}|"
+            "restic_prune_data:{name}:{r.to_repack_blobs}:{r.duration_seconds}|"
         )
         lines = prometheus.prune_metrics(metrics, "my_prune")
         self.assertEqual(
@@ -319,31 +462,31 @@ class TestResticMetricsPrometheus(TestCase):
 
     def test_check_metrics(self):
         metrics = {
-            "/tmp/restic-repo1": {  # noqa: S108
-                "errors": 0,
-                "errors_data": 0,
-                "errors_snapshots": 7,
-                "read_data": 1,
-                "check_unused": 1,
-                "duration_seconds": 9,
-                "rc": 0,
-            },
-            "/tmp/restic-repo2": {  # noqa: S108
-                "errors": 0,
-                "errors_data": 0,
-                "errors_snapshots": 0,
-                "read_data": 1,
-                "check_unused": 1,
-                "duration_seconds": 28.380418062210083,
-                "rc": 1,
-            },
+            "/tmp/restic-repo1": CheckResult(  # noqa: S108
+                errors=0,
+                errors_data=0,
+                errors_snapshots=7,
+                read_data=1,
+                check_unused=1,
+                duration_seconds=9,
+                rc=0,
+            ),
+            "/tmp/restic-repo2": CheckResult(  # noqa: S108
+                errors=0,
+                errors_data=0,
+                errors_snapshots=0,
+                read_data=1,
+                check_unused=1,
+                duration_seconds=28.380418062210083,
+                rc=1,
+            ),
         }
         # check that check_metrics can be called with sample metrics
         _lines = prometheus.check_metrics(metrics, "my_check")
         # check call with simplified output
         prometheus._restic_help_check = "restic_help_check|"
         prometheus._restic_check = (
-            "restic_check_data:{name}:{errors_snapshots}:{duration_seconds}|"
+            "restic_check_data:{name}:{r.errors_snapshots}:{r.duration_seconds}|"
         )
         lines = prometheus.check_metrics(metrics, "my_check")
         self.assertEqual(
@@ -359,25 +502,25 @@ class TestResticMetricsPrometheus(TestCase):
 
     def test_stats_metrics(self):
         metrics = {
-            "/tmp/restic-repo1": {  # noqa: S108
-                "total_file_count": 7,
-                "total_size_bytes": 18148185424,
-                "duration_seconds": 9,
-                "rc": 0,
-            },
-            "/tmp/restic-repo2": {  # noqa: S108
-                "total_file_count": 885276,
-                "total_size_bytes": 18148185424,
-                "duration_seconds": 20.466784715652466,
-                "rc": 1,
-            },
+            "/tmp/restic-repo1": StatsResult(  # noqa: S108
+                total_file_count=7,
+                total_size_bytes=18148185424,
+                duration_seconds=9,
+                rc=0,
+            ),
+            "/tmp/restic-repo2": StatsResult(  # noqa: S108
+                total_file_count=885276,
+                total_size_bytes=18148185424,
+                duration_seconds=20.466784715652466,
+                rc=1,
+            ),
         }
         # stats that stats_metrics can be called with sample metrics
         _lines = prometheus.stats_metrics(metrics, "my_stats")
         # stats call with simplified output
         prometheus._restic_help_stats = "restic_help_stats|"
         prometheus._restic_stats = (
-            "restic_stats_data:{name}:{total_file_count}:{duration_seconds}|"
+            "restic_stats_data:{name}:{r.total_file_count}:{r.duration_seconds}|"
         )
         lines = prometheus.stats_metrics(metrics, "my_stats")
         self.assertEqual(
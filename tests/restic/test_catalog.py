@@ -0,0 +1,91 @@
+import os
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from runrestic.restic.catalog import SnapshotCatalog, parse_snapshot_time
+
+
+def snapshot(id_: str, day: int, hostname: str = "host", **fields):
+    return {
+        "id": id_,
+        "time": f"2024-01-{day:02}T12:00:00.123456789+01:00",
+        "hostname": hostname,
+        "username": "root",
+        "paths": ["/data"],
+        **fields,
+    }
+
+
+@pytest.fixture
+def cache_home(tmp_path):
+    with patch.dict(os.environ, {"XDG_CACHE_HOME": str(tmp_path)}):
+        yield tmp_path
+
+
+def test_parse_snapshot_time():
+    assert parse_snapshot_time("2024-01-02T02:04:05.5Z") == 1704161045.5
+    assert parse_snapshot_time("2024-01-02T03:04:05+01:00") == 1704161045.0
+    with pytest.raises(ValueError):
+        parse_snapshot_time("yesterday")
+
+
+def test_catalog_update(cache_home):
+    snapshots = [
+        snapshot("a", 1, tags=["daily"]),
+        snapshot("b", 2, "other", paths=["/etc", "/data"]),
+        snapshot("c", 3),
+    ]
+    with SnapshotCatalog("sftp:user:secret@host:/repo") as catalog:
+        assert "secret" not in catalog.path
+        assert catalog.path.startswith(str(cache_home / "runrestic" / "catalog"))
+        assert catalog.update(snapshots)
+        assert not catalog.update(list(reversed(snapshots)))
+
+    # forget "a" and add "d", the catalog is persistent
+    with SnapshotCatalog("sftp:user:secret@host:/repo") as catalog:
+        assert catalog.snapshot_ids() == {"a", "b", "c"}
+        assert catalog.update([*snapshots[1:], snapshot("d", 4, tags=["weekly"])])
+        assert catalog.snapshot_ids() == {"b", "c", "d"}
+        tags = catalog.connection.execute("SELECT tag FROM tags").fetchall()
+        assert tags == [("weekly",)]
+
+
+def test_catalog_queries(cache_home):
+    with SnapshotCatalog("/repo") as catalog:
+        assert catalog.latest() is None
+        catalog.update(
+            [
+                snapshot("a", 1, tags=["daily"]),
+                snapshot("b", 2, "other", paths=["/etc"]),
+                snapshot("c", 3, tags=["daily", "manual"]),
+                snapshot("d", 4, "other", paths=["/etc"]),
+            ]
+        )
+
+        def ids(snapshots):
+            return [snapshot["id"] for snapshot in snapshots]
+
+        assert ids(catalog.snapshots()) == ["a", "b", "c", "d"]
+        assert ids(catalog.snapshots(hostname="host")) == ["a", "c"]
+        assert ids(catalog.snapshots(path="/etc")) == ["b", "d"]
+        assert ids(catalog.snapshots(tag="daily")) == ["a", "c"]
+        since = parse_snapshot_time("2024-01-02T00:00:00Z")
+        until = parse_snapshot_time("2024-01-04T00:00:00Z")
+        assert ids(catalog.snapshots(since=since, until=until)) == ["b", "c"]
+        assert catalog.latest(hostname="host", tag="manual") == snapshot(
+            "c", 3, tags=["daily", "manual"]
+        )
+        assert catalog.latest(path="/data")["id"] == "c"
+
+
+def test_catalog_rebuilt_on_version_change(cache_home):
+    with SnapshotCatalog("/repo") as catalog:
+        catalog.update([snapshot("a", 1)])
+        path = catalog.path
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA user_version = 0")
+    connection.close()
+    with SnapshotCatalog("/repo") as catalog:
+        assert catalog.snapshot_ids() == set()
@@ -0,0 +1,164 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from runrestic.restic.forget_policy import (
+    Duration,
+    ForgetPolicy,
+    parse_duration,
+    parse_group_by,
+    simulate_forget,
+)
+
+
+def snapshot(id_: str, time: str, hostname: str = "host", **fields):
+    return {
+        "id": id_,
+        "time": f"2024-01-{time}:00:00.123456789+01:00",
+        "hostname": hostname,
+        "paths": ["/data"],
+        **fields,
+    }
+
+
+SNAPSHOTS = [
+    snapshot("a", "01T10", tags=["manual"]),
+    snapshot("b", "08T10"),
+    snapshot("c", "10T10"),
+    snapshot("d", "10T18"),
+    snapshot("e", "11T10"),
+    snapshot("f", "09T10", "other", paths=["/etc", "/data"]),
+]
+
+# Expected result of `restic forget --dry-run --json --keep-daily 3 --keep-weekly 2
+# --keep-tag manual` for SNAPSHOTS, written by hand from restic's documented policy rules
+# in the layout of its JSON output, with the snapshots shortened to their IDs and without
+# the counters. It is not captured restic output: checking the simulation against a real
+# restic run (and a recorded restic version) is out of scope of these tests.
+EXPECTED_FORGET = """[
+  {
+    "tags": null,
+    "host": "host",
+    "paths": ["/data"],
+    "keep": [{"id": "e"}, {"id": "d"}, {"id": "b"}, {"id": "a"}],
+    "remove": [{"id": "c"}],
+    "reasons": [
+      {"snapshot": {"id": "e"}, "matches": ["daily snapshot", "weekly snapshot"]},
+      {"snapshot": {"id": "d"}, "matches": ["daily snapshot"]},
+      {"snapshot": {"id": "b"}, "matches": ["daily snapshot"]},
+      {"snapshot": {"id": "a"}, "matches": ["has tags [manual]", "weekly snapshot"]}
+    ]
+  },
+  {
+    "tags": null,
+    "host": "other",
+    "paths": ["/data", "/etc"],
+    "keep": [{"id": "f"}],
+    "remove": null,
+    "reasons": [
+      {"snapshot": {"id": "f"}, "matches": ["daily snapshot", "weekly snapshot"]}
+    ]
+  }
+]"""
+
+
+def as_forget_groups(groups):
+    """
+    Reduce the simulated groups to the values compared with EXPECTED_FORGET.
+    """
+    return [
+        {
+            "host": group.host,
+            "paths": group.paths,
+            "tags": group.tags,
+            "keep": [snapshot["id"] for snapshot in group.keep],
+            "remove": [snapshot["id"] for snapshot in group.remove],
+            "reasons": group.reasons,
+        }
+        for group in groups
+    ]
+
+
+def test_simulate_forget_documented_rules():
+    prune_config = {"keep-daily": 3, "keep-weekly": 2, "keep-tag": "manual"}
+    expected = [
+        {
+            "host": group["host"],
+            "paths": group["paths"],
+            "tags": group["tags"],
+            "keep": [snapshot["id"] for snapshot in group["keep"]],
+            "remove": [snapshot["id"] for snapshot in group["remove"] or []],
+            "reasons": {
+                reason["snapshot"]["id"]: reason["matches"]
+                for reason in group["reasons"]
+            },
+        }
+        for group in json.loads(EXPECTED_FORGET)
+    ]
+    assert as_forget_groups(simulate_forget(SNAPSHOTS, prune_config)) == expected
+
+
+@pytest.mark.parametrize(
+    "prune_config, keep_oldest, keep, reasons",
+    [
+        ({}, True, "edcba", {}),
+        ({"keep-last": 2}, True, "ed", {"d": ["last snapshot"]}),
+        ({"keep-last": -1}, True, "edcba", {"a": ["last snapshot"]}),
+        ({"keep-within": "2d"}, True, "edc", {"c": ["within 2d"]}),
+        ({"keep-within-daily": "3d"}, True, "ed", {"d": ["daily within 3d"]}),
+        ({"keep-hourly": 10}, True, "edcba", {"c": ["hourly snapshot"]}),
+        ({"keep-yearly": 1}, True, "e", {"e": ["yearly snapshot"]}),
+        ({"keep-monthly": 2}, True, "ea", {"a": ["oldest monthly snapshot"]}),
+        ({"keep-monthly": 2}, False, "e", {"e": ["monthly snapshot"]}),
+        ({"keep-tag": ["manual,other"]}, True, "", {}),
+    ],
+)
+def test_simulate_forget_policies(prune_config, keep_oldest, keep, reasons):
+    prune_config = {"group-by": "", "prune-pack": 3, **prune_config}
+    # all snapshots of "host" in one group, the unrelated keys are ignored
+    (group,) = simulate_forget(SNAPSHOTS[:5], prune_config, keep_oldest)
+    assert (group.host, group.paths, group.tags) == ("", None, None)
+    assert "".join(snapshot["id"] for snapshot in group.keep) == keep
+    assert len(group.keep) + len(group.remove) == 5
+    for snapshot_id, matches in reasons.items():
+        assert group.reasons[snapshot_id] == matches
+
+
+def test_simulate_forget_group_by_tags():
+    groups = simulate_forget(SNAPSHOTS, {"keep-last": 1, "group-by": "tags"})
+    assert [(group.tags, len(group.keep), len(group.remove)) for group in groups] == [
+        (["manual"], 1, 0),
+        ([], 1, 4),
+    ]
+
+
+def test_simulate_forget_invalid_config():
+    with pytest.raises(ValueError, match="keep-everything"):
+        simulate_forget(SNAPSHOTS, {"keep-everything": 1})
+    with pytest.raises(ValueError, match="Invalid duration"):
+        simulate_forget(SNAPSHOTS, {"keep-within": "2w"})
+    with pytest.raises(ValueError, match="group-by"):
+        simulate_forget(SNAPSHOTS, {"keep-last": 1, "group-by": "user"})
+
+
+def test_forget_policy_from_config():
+    policy = ForgetPolicy.from_config(
+        {"keep-last": "3", "keep-within": "1y2m", "keep-tag": "a,b", "prune": True}
+    )
+    assert policy == ForgetPolicy(
+        {"keep-last": 3}, Duration(years=1, months=2), {}, [["a", "b"]]
+    )
+    assert not policy.empty
+    assert ForgetPolicy.from_config({"keep-daily": 0}).empty
+
+
+def test_duration_before_normalizes_like_go():
+    end_of_march = datetime(2024, 3, 31, 12, tzinfo=timezone.utc)
+    assert Duration(months=1).before(end_of_march) == datetime(
+        2024, 3, 2, 12, tzinfo=timezone.utc
+    )
+    assert parse_duration("1y1d2h").before(end_of_march) == datetime(
+        2023, 3, 30, 10, tzinfo=timezone.utc
+    )
+    assert sorted(parse_group_by(" host , paths")) == ["host", "paths"]
@@ -1,8 +1,21 @@
 """Test the restic output parsing"""
 
+import logging
 from textwrap import dedent
 
+import pytest
+
 from runrestic.restic import output_parsing
+from runrestic.restic.results import (
+    BackupResult,
+    CommandResult,
+    Counts,
+    ForgetResult,
+    NewPruneResult,
+    Processed,
+    PruneResult,
+    StatsResult,
+)
 
 
 def test_parse_backup():
@@ -22,27 +35,15 @@ def test_parse_backup():
         snapshot 215cf0fa saved
         """
     )
-    data = {
-        "files": {
-            "new": "22391",
-            "changed": "42",
-            "unmodified": "5",
-        },
-        "dirs": {
-            "new": "2927",
-            "changed": "1",
-            "unmodified": "3",
-        },
-        "processed": {
-            "files": "22438",
-            "size_bytes": 302.750 * 2**20,
-            "duration_seconds": 72,
-        },
-        "added_to_repo": 259.569 * 2**20,
-        "duration_seconds": 35.8,
-        "rc": 0,
-    }
-    process_infos = {"output": [(0, output)], "time": data["duration_seconds"]}
+    data = BackupResult(
+        files=Counts(new=22391, changed=42, unmodified=5),
+        dirs=Counts(new=2927, changed=1, unmodified=3),
+        processed=Processed(files=22438, size_bytes=302.750 * 2**20, duration_seconds=72),
+        added_to_repo=259.569 * 2**20,
+        duration_seconds=35.8,
+        rc=0,
+    )
+    process_infos = {"output": [(0, output)], "time": data.duration_seconds}
     result = output_parsing.parse_backup(process_infos)
     assert result == data
 
@@ -50,27 +51,15 @@ def test_parse_backup():
 def test_parse_backup_defaults():
     """Validate that all backup parsing uses defaults in case of unexpected formatting"""
     output = "UNEXPECTED OUTPUT"
-    data = {
-        "files": {
-            "new": "0",
-            "changed": "0",
-            "unmodified": "0",
-        },
-        "dirs": {
-            "new": "0",
-            "changed": "0",
-            "unmodified": "0",
-        },
-        "processed": {
-            "files": "0",
-            "size_bytes": 0,
-            "duration_seconds": 0,
-        },
-        "added_to_repo": 0,
-        "duration_seconds": 123,
-        "rc": 0,
-    }
-    process_infos = {"output": [(0, output)], "time": data["duration_seconds"]}
+    data = BackupResult(
+        files=Counts(),
+        dirs=Counts(),
+        processed=Processed(),
+        added_to_repo=0,
+        duration_seconds=123,
+        rc=0,
+    )
+    process_infos = {"output": [(0, output)], "time": data.duration_seconds}
     result = output_parsing.parse_backup(process_infos)
     assert result == data
 
@@ -100,12 +89,8 @@ def test_parse_forget():
         [0:00] 100.00%  1 / 1 files deleted
         """
     )
-    data = {
-        "removed_snapshots": "1",
-        "duration_seconds": 12.7,
-        "rc": 0,
-    }
-    process_infos = {"output": [(0, output)], "time": data["duration_seconds"]}
+    data = ForgetResult(removed_snapshots=1, duration_seconds=12.7, rc=0)
+    process_infos = {"output": [(0, output)], "time": data.duration_seconds}
     result = output_parsing.parse_forget(process_infos)
     assert result == data
 
@@ -113,12 +98,8 @@ def test_parse_forget():
 def test_parse_forget_defaults():
     """Validate that all forget details uses defaults in case of unexpected formatting"""
     output = "UNEXPECTED OUTPUT"
-    data = {
-        "removed_snapshots": "0",
-        "duration_seconds": 123,
-        "rc": 0,
-    }
-    process_infos = {"output": [(0, output)], "time": data["duration_seconds"]}
+    data = ForgetResult(removed_snapshots=0, duration_seconds=123, rc=0)
+    process_infos = {"output": [(0, output)], "time": data.duration_seconds}
     result = output_parsing.parse_forget(process_infos)
     assert result == data
 
@@ -149,23 +130,23 @@ def test_parse_prune():
         done
         """
     )
-    data = {
-        "containing_packs_before": "11981",
-        "containing_blobs": "345057",
-        "containing_size_bytes": 56.676 * 2**30,
-        "duplicate_blobs": "0",
-        "duplicate_size_bytes": 0.0,
-        "in_use_blobs": "2",
-        "removed_blobs": "345055",
-        "invalid_files": "0",
-        "deleted_packs": "11979",
-        "rewritten_packs": "0",
-        "size_freed_bytes": 56.664 * 2**30,
-        "removed_index_files": "11",
-        "duration_seconds": 3.27,
-        "rc": 0,
-    }
-    process_infos = {"output": [(0, output)], "time": data["duration_seconds"]}
+    data = PruneResult(
+        containing_packs_before=11981,
+        containing_blobs=345057,
+        containing_size_bytes=56.676 * 2**30,
+        duplicate_blobs=0,
+        duplicate_size_bytes=0.0,
+        in_use_blobs=2,
+        removed_blobs=345055,
+        invalid_files=0,
+        deleted_packs=11979,
+        rewritten_packs=0,
+        size_freed_bytes=56.664 * 2**30,
+        removed_index_files=11,
+        duration_seconds=3.27,
+        rc=0,
+    )
+    process_infos = {"output": [(0, output)], "time": data.duration_seconds}
     result = output_parsing.parse_prune(process_infos)
     assert result == data
 
@@ -173,23 +154,23 @@ def test_parse_prune():
 def test_parse_prune_defaults():
     """Validate that all prune details uses defaults in case of unexpected formatting (version < 12.0)"""
     output = "UNEXPECTED OUTPUT"
-    data = {
-        "containing_packs_before": "0",
-        "containing_blobs": "0",
-        "containing_size_bytes": 0,
-        "duplicate_blobs": "0",
-        "duplicate_size_bytes": 0,
-        "in_use_blobs": "0",
-        "removed_blobs": "0",
-        "invalid_files": "0",
-        "deleted_packs": "0",
-        "rewritten_packs": "0",
-        "size_freed_bytes": 0,
-        "removed_index_files": "0",
-        "duration_seconds": 123,
-        "rc": 0,
-    }
-    process_infos = {"output": [(0, output)], "time": data["duration_seconds"]}
+    data = PruneResult(
+        containing_packs_before=0,
+        containing_blobs=0,
+        containing_size_bytes=0,
+        duplicate_blobs=0,
+        duplicate_size_bytes=0,
+        in_use_blobs=0,
+        removed_blobs=0,
+        invalid_files=0,
+        deleted_packs=0,
+        rewritten_packs=0,
+        size_freed_bytes=0,
+        removed_index_files=0,
+        duration_seconds=123,
+        rc=0,
+    )
+    process_infos = {"output": [(0, output)], "time": data.duration_seconds}
     result = output_parsing.parse_prune(process_infos)
     assert result == data
 
@@ -224,22 +205,22 @@ def test_parse_new_prune():
         done
         """
     )
-    data = {
-        "to_repack_blobs": "1",
-        "to_repack_bytes": 1234.0,
-        "removed_blobs": "2",
-        "removed_bytes": 5678.0,
-        "to_delete_blobs": "32",
-        "to_delete_bytes": 158.830 * 2**10,
-        "total_prune_blobs": "35",
-        "total_prune_bytes": 158.830 * 2**10,
-        "remaining_blobs": "19154",
-        "remaining_bytes": 260.161 * 2**20,
-        "remaining_unused_size": 0.0,
-        "duration_seconds": 8.47,
-        "rc": 0,
-    }
-    process_infos = {"output": [(0, output)], "time": data["duration_seconds"]}
+    data = NewPruneResult(
+        to_repack_blobs=1,
+        to_repack_bytes=1234.0,
+        removed_blobs=2,
+        removed_bytes=5678.0,
+        to_delete_blobs=32,
+        to_delete_bytes=158.830 * 2**10,
+        total_prune_blobs=35,
+        total_prune_bytes=158.830 * 2**10,
+        remaining_blobs=19154,
+        remaining_bytes=260.161 * 2**20,
+        remaining_unused_size=0.0,
+        duration_seconds=8.47,
+        rc=0,
+    )
+    process_infos = {"output": [(0, output)], "time": data.duration_seconds}
     result = output_parsing.parse_new_prune(process_infos)
     assert result == data
 
@@ -247,22 +228,22 @@ def test_parse_new_prune():
 def test_parse_new_prune_defaults():
     """Validate that all prune details uses defaults in case of unexpected formatting (version >= 12.0)"""
     output = "UNEXPECTED OUTPUT"
-    data = {
-        "to_repack_blobs": "0",
-        "to_repack_bytes": 0,
-        "removed_blobs": "0",
-        "removed_bytes": 0,
-        "to_delete_blobs": "0",
-        "to_delete_bytes": 0,
-        "total_prune_blobs": "0",
-        "total_prune_bytes": 0,
-        "remaining_blobs": "0",
-        "remaining_bytes": 0,
-        "remaining_unused_size": 0,
-        "duration_seconds": 123,
-        "rc": 0,
-    }
-    process_infos = {"output": [(0, output)], "time": data["duration_seconds"]}
+    data = NewPruneResult(
+        to_repack_blobs=0,
+        to_repack_bytes=0,
+        removed_blobs=0,
+        removed_bytes=0,
+        to_delete_blobs=0,
+        to_delete_bytes=0,
+        total_prune_blobs=0,
+        total_prune_bytes=0,
+        remaining_blobs=0,
+        remaining_bytes=0,
+        remaining_unused_size=0,
+        duration_seconds=123,
+        rc=0,
+    )
+    process_infos = {"output": [(0, output)], "time": data.duration_seconds}
     result = output_parsing.parse_new_prune(process_infos)
     assert result == data
 
@@ -270,13 +251,8 @@ def test_parse_new_prune_defaults():
 def test_parse_stats_quiet():
     """Validate that all stats are correctly captured"""
     output = '{"total_size":317458353,"total_file_count":50653}'
-    data = {
-        "total_file_count": 50653,
-        "total_size_bytes": 317458353,
-        "duration_seconds": 1.57,
-        "rc": 0,
-    }
-    process_infos = {"output": [(0, output)], "time": data["duration_seconds"]}
+    data = StatsResult(total_file_count=50653, total_size_bytes=317458353, duration_seconds=1.57, rc=0)
+    process_infos = {"output": [(0, output)], "time": data.duration_seconds}
     result = output_parsing.parse_stats(process_infos)
     assert result == data
 
@@ -289,13 +265,8 @@ def test_parse_stats_verbose():
         {"total_size":317458353,"total_file_count":50653}
         """
     )
-    data = {
-        "total_file_count": 50653,
-        "total_size_bytes": 317458353,
-        "duration_seconds": 1.57,
-        "rc": 0,
-    }
-    process_infos = {"output": [(0, output)], "time": data["duration_seconds"]}
+    data = StatsResult(total_file_count=50653, total_size_bytes=317458353, duration_seconds=1.57, rc=0)
+    process_infos = {"output": [(0, output)], "time": data.duration_seconds}
     result = output_parsing.parse_stats(process_infos)
     assert result == data
 
@@ -303,12 +274,144 @@ def test_parse_stats_verbose():
 def test_parse_stats_quiet_defaults():
     """Validate that all stats uses defaults in case of unexpected formatting"""
     output = '{"UNEXPECTED": "OUTPUT"}'
-    data = {
-        "total_file_count": 0,
-        "total_size_bytes": 0,
-        "duration_seconds": 0,
-        "rc": 0,
-    }
-    process_infos = {"output": [(0, output)], "time": data["duration_seconds"]}
+    data = StatsResult(total_file_count=0, total_size_bytes=0, duration_seconds=0, rc=0)
+    process_infos = {"output": [(0, output)], "time": data.duration_seconds}
     result = output_parsing.parse_stats(process_infos)
     assert result == data
+
+
+def test_parse_stats_strict():
+    """Validate that a strict parse rejects the output without totals instead of zeros"""
+    for output in ['{"total_size": 5}', "no statistics"]:
+        with pytest.raises(ValueError):
+            output_parsing.parse_stats({"output": [(0, output)], "time": 1}, strict=True)
+
+
+def test_classify_error():
+    """Validate that the errors of failed commands are categorized"""
+    outputs = {
+        "Fatal: unable to open config file: Stat: dial tcp 10.0.0.2:22: connect: connection refused": "network",
+        "Load(<data/1234>) returned error: 503 Service Unavailable": "network",
+        "Fatal: unable to create lock in backend: repository is already locked exclusively by PID 1234": "lock",
+        "Fatal: wrong password or no key found": "auth",
+        "Fatal: unable to open repository: Access Denied": "auth",
+        "error: ciphertext verification failed": "corruption",
+        "Fatal: repository contains errors": "corruption",
+        "Fatal: unable to open config file: stat /srv/restic/config: no such file or directory\n"
+        "Is there a repository at the following location?": "config",
+        "snapshot 1e3c30a1 saved": None,
+    }
+    for output, category in outputs.items():
+        assert output_parsing.classify_error(output) == category
+
+
+def test_backup_json_parser():
+    """Validate that the JSON messages of a backup are consumed line by line"""
+    parser = output_parsing.BackupJsonParser()
+    lines = {
+        b'{"message_type":"status","percent_done":0.5,"total_files":4,"files_done":2}': logging.DEBUG,
+        b'{"message_type":"verbose_status","action":"unchanged","item":"/data/a"}': logging.DEBUG,
+        b'{"message_type":"verbose_status","action":"new","item":"/data/b"}': logging.INFO,
+        b'{"message_type":"error","error":{"message":"permission denied"},"during":"archival","item":"/data/c"}': logging.ERROR,
+        b'{"message_type":"summary","files_new":1,"data_blobs":2,"snapshot_id":"1e3c30a1"}': logging.INFO,
+        b'{"message_type":"exit_error","code":1,"message":"Fatal: wrong password"}': logging.CRITICAL,
+        b"Warning: at least one source file could not be read": None,
+        b'{"unrelated": "json"}': None,
+        b"{not json": None,
+    }
+    for line, level in lines.items():
+        assert parser.feed(line) == level
+    assert parser.errors == 1
+    assert parser.summary == {
+        "message_type": "summary",
+        "files_new": 1,
+        "data_blobs": 2,
+        "snapshot_id": "1e3c30a1",
+    }
+    assert output_parsing.BackupJsonParser(progress=True).feed(b'{"message_type":"status"}') == logging.INFO
+    statuses = []
+    parser = output_parsing.BackupJsonParser(on_status=statuses.append)
+    parser.feed(b'{"message_type":"status","percent_done":0.5}')
+    parser.feed(b'{"message_type":"verbose_status","action":"new","item":"/data/b"}')
+    assert statuses == [{"message_type": "status", "percent_done": 0.5}]
+
+    describe = output_parsing.BackupJsonParser.describe
+    assert describe(b'{"message_type":"status","percent_done":0.5,"total_files":4,"files_done":2}') == (
+        "[0s] 50.00% 2 / 4 files 0 / 0 bytes"
+    )
+    assert describe(b'{"message_type":"verbose_status","action":"new","item":"/data/b"}') == "new /data/b"
+    assert describe(b'{"message_type":"error","error":{"message":"permission denied"},"item":"/data/c"}') == (
+        "error: /data/c: permission denied"
+    )
+    assert describe(b'{"message_type":"exit_error","code":1,"message":"wrong password"}') == "Fatal: wrong password"
+    assert describe(b'{"message_type":"summary","files_new":1,"snapshot_id":"1e3c30a1"}').endswith(
+        "snapshot 1e3c30a1 saved"
+    )
+
+
+def test_parse_backup_json():
+    """Validate that the summary of a JSON backup provides the backup metrics"""
+    summary = {
+        "message_type": "summary",
+        "files_new": 22391,
+        "files_changed": 42,
+        "files_unmodified": 5,
+        "dirs_new": 2927,
+        "dirs_changed": 1,
+        "dirs_unmodified": 3,
+        "data_blobs": 21000,
+        "tree_blobs": 2900,
+        "data_added": 272171418,
+        "data_added_packed": 150000000,
+        "total_files_processed": 22438,
+        "total_bytes_processed": 317456384,
+        "total_duration": 72.5,
+        "snapshot_id": "215cf0fa",
+    }
+    process_infos = {"output": [(0, "")], "time": 80.1, "summary": summary}
+    assert output_parsing.parse_backup_json(process_infos) == BackupResult(
+        files=Counts(new=22391, changed=42, unmodified=5),
+        dirs=Counts(new=2927, changed=1, unmodified=3),
+        processed=Processed(files=22438, size_bytes=317456384, duration_seconds=72.5),
+        added_to_repo=272171418,
+        data_added_packed=150000000,
+        total_bytes_processed=317456384,
+        data_blobs=21000,
+        tree_blobs=2900,
+        duration_seconds=80.1,
+        rc=0,
+    )
+    # the keys missing in older restic versions are absent instead of 0
+    del summary["data_added_packed"], summary["data_blobs"]
+    result = output_parsing.parse_backup_json(process_infos)
+    assert (result.data_added_packed, result.data_blobs, result.tree_blobs) == (None, None, 2900)
+
+
+def test_parse_failure():
+    """Validate that a failed command is recorded with its return code and resource usage"""
+    usage = {"cpu_user_seconds": 1.5}
+    process_infos = {"output": [(0, ""), (3, "Fatal: error")], "resources": usage}
+    result = output_parsing.parse_failure(process_infos)
+    assert result == CommandResult(rc=3, resources=usage)
+    assert output_parsing.parse_failure({"output": [(1, "")], "resources": {}}).resources is None
+
+
+def test_retained_lines_json():
+    """Validate that only the JSON messages not consumed while streaming are retained"""
+    assert output_parsing.RETAINED_LINES.match(b'{"total_size":317458353,"total_file_count":50653}')
+    assert output_parsing.RETAINED_LINES.match(b'{"message_type":"error","item":"/data/c"}')
+    assert not output_parsing.RETAINED_LINES.match(b'{"message_type":"status","percent_done":0.5}')
+    assert not output_parsing.RETAINED_LINES.match(b'{"message_type":"verbose_status"}')
+
+
+def test_parse_snapshots():
+    process_infos = {
+        "output": [(0, 'warning: ignored\n[{"id":"a1","time":"t"},{"id":"b2"}]\n')]
+    }
+    assert output_parsing.parse_snapshots(process_infos) == [
+        {"id": "a1", "time": "t"},
+        {"id": "b2"},
+    ]
+    assert output_parsing.parse_snapshots({"output": [(0, "[]\n")]}) == []
+    with pytest.raises(ValueError):
+        output_parsing.parse_snapshots({"output": [(0, "no list\n")]})
@@ -1,12 +1,28 @@
+import asyncio
+import logging
+import os
+import tempfile
 from argparse import Namespace
 from typing import Any
 from unittest import TestCase
 from unittest.mock import patch
 
-from runrestic.restic import runner
+from runrestic.restic import runner, tools
+from runrestic.restic.results import CheckResult, CommandResult, StatsResult
+from runrestic.restic.stats_cache import StatsCache
+from runrestic.restic.version import ResticCapabilities
 
 
 class TestResticRunner(TestCase):
+    def setUp(self) -> None:
+        # do not probe the restic installed on the host, assume an unknown version
+        patcher = patch(
+            "runrestic.restic.runner.restic_capabilities",
+            return_value=ResticCapabilities(),
+        )
+        self.mock_capabilities = patcher.start()
+        self.addCleanup(patcher.stop)
+
     @patch("runrestic.restic.runner.initialize_environment")
     def test_runner_class_init(self, mock_init_env):
         """
@@ -25,6 +41,7 @@ class TestResticRunner(TestCase):
         runner_instance = runner.ResticRunner(config, args, restic_args)
         self.assertEqual(runner_instance.args, args)
         self.assertEqual(runner_instance.restic_args, restic_args)
+        self.assertIsNone(runner_instance.executor)
         self.assertTrue(runner_instance.log_metrics)
         self.assertEqual(runner_instance.pw_replacement, "dummy_pw")
 
@@ -35,10 +52,12 @@ class TestResticRunner(TestCase):
     @patch.object(runner.ResticRunner, "check")
     @patch.object(runner.ResticRunner, "stats")
     @patch.object(runner.ResticRunner, "unlock")
+    @patch.object(runner.ResticRunner, "refresh_catalog")
     @patch("runrestic.restic.runner.write_metrics")
     def test_run_dispatcher(
         self,
         mock_write_metrics,
+        mock_catalog,
         mock_unlock,
         mock_stats,
         mock_check,
@@ -74,6 +93,7 @@ class TestResticRunner(TestCase):
                     "check": 1,
                     "stats": 1,
                     "unlock": 1,
+                    "catalog": 0,  # refreshed by the stats action
                 },
                 "write_metrics": True,
                 "expected_errors": 2,
@@ -97,6 +117,7 @@ class TestResticRunner(TestCase):
                     "check": 0,
                     "stats": 0,
                     "unlock": 0,
+                    "catalog": 0,
                 },
                 "write_metrics": False,
                 "expected_errors": 5,
@@ -120,6 +141,7 @@ class TestResticRunner(TestCase):
                     "check": 1,
                     "stats": 1,
                     "unlock": 0,
+                    "catalog": 0,
                 },
                 "write_metrics": True,
                 "expected_errors": 0,
@@ -143,6 +165,7 @@ class TestResticRunner(TestCase):
                     "check": 1,
                     "stats": 0,
                     "unlock": 0,
+                    "catalog": 1,  # after the snapshots were changed without stats
                 },
                 "write_metrics": False,
                 "expected_errors": 0,
@@ -169,6 +192,9 @@ class TestResticRunner(TestCase):
                 self.assertEqual(mock_check.call_count, sc["expected_calls"]["check"])
                 self.assertEqual(mock_stats.call_count, sc["expected_calls"]["stats"])
                 self.assertEqual(mock_unlock.call_count, sc["expected_calls"]["unlock"])
+                self.assertEqual(
+                    mock_catalog.call_count, sc["expected_calls"]["catalog"]
+                )
 
                 # verify write_metrics
                 if sc["write_metrics"]:
@@ -187,10 +213,395 @@ class TestResticRunner(TestCase):
                     mock_check,
                     mock_stats,
                     mock_unlock,
+                    mock_catalog,
                     mock_write_metrics,
                 ):
                     m.reset_mock()
 
+    @patch("runrestic.restic.runner.write_metrics")
+    def test_run_reports_executor_statistics(self, mock_write_metrics):
+        """
+        Test that run() adds the statistics of a shared executor to the metrics.
+        """
+        config = {
+            "name": "test",
+            "repositories": ["repo"],
+            "environment": {},
+            "execution": {},
+        }
+        args = Namespace(actions=["unknown"], dry_run=False)
+        executor = runner.CommandExecutor()
+        executor.statistics["batches"] = 3
+        runner_instance = runner.ResticRunner(config, args, [], executor)
+
+        runner_instance.run()
+        self.assertEqual(runner_instance.metrics["executor"]["batches"], 3)
+        mock_write_metrics.assert_not_called()
+
+    @patch("runrestic.restic.runner.MultiCommand")
+    def test_forget_records_resources(self, mock_mc):
+        """
+        Test that the resource usage of the commands is added to the metrics per repository.
+        """
+        config = {
+            "repositories": ["repo1", "repo2"],
+            "environment": {},
+            "execution": {},
+            "prune": {"keep-last": 1},
+        }
+        usage = {"cpu_user_seconds": 1.5, "max_rss_bytes": 1 << 20}
+        mock_mc.return_value.run.return_value = [
+            {"output": [(0, "")], "time": 1, "resources": usage},
+            {"output": [(1, "")], "time": 1, "resources": {}},
+        ]
+        runner_instance = runner.ResticRunner(config, Namespace(dry_run=False), [])
+        runner_instance.forget()
+
+        self.assertEqual(runner_instance.metrics["forget"]["repo1"].resources, usage)
+        self.assertEqual(
+            runner_instance.metrics["forget"]["repo2"], CommandResult(rc=1)
+        )
+
+    @patch("runrestic.restic.runner.MultiCommand")
+    def test_backup_counts_error_categories(self, mock_mc):
+        """
+        Test that the categories of the failed tries are counted in the metrics.
+        """
+        config = {
+            "repositories": ["repo1", "repo2"],
+            "environment": {},
+            "execution": {},
+            "backup": {},
+        }
+        mock_mc.return_value.run.return_value = [
+            {"output": [(1, ""), (0, "")], "time": 1, "error_categories": ["lock"]},
+            {"output": [(1, "")], "time": 1, "error_categories": ["network", "auth"]},
+        ]
+        runner_instance = runner.ResticRunner(config, Namespace(dry_run=False), [])
+        runner_instance.backup()
+
+        self.assertEqual(
+            runner_instance.metrics["error_categories"],
+            {"network": 1, "lock": 1, "auth": 1, "corruption": 0, "config": 0},
+        )
+
+    @patch("runrestic.restic.runner.parse_backup", return_value={"parsed": True})
+    @patch("runrestic.restic.runner.parse_forget", return_value={"forgotten": True})
+    @patch("runrestic.restic.runner.parse_new_prune", return_value={"pruned": True})
+    @patch("runrestic.restic.runner.write_metrics")
+    def test_run_pipelined(self, mock_write, mock_prune, mock_forget, mock_backup):
+        """
+        Test that in pipeline mode each repository walks its own chain of actions,
+        and that the hooks wrap all backups.
+        """
+        config = {
+            "name": "test",
+            "repositories": ["slow", "fast"],
+            "environment": {},
+            "execution": {"parallel": True, "pipeline": True},
+            "backup": {
+                "sources": ["/data"],
+                "pre_hooks": ["pre"],
+                "post_hooks": ["post"],
+            },
+            "prune": {"keep-last": 1},
+        }
+        events: list[str] = []
+        concurrency: set[int] = set()
+
+        async def fake_retry_process(cmd, config, abort_reasons=None, **kwargs):
+            name = cmd if isinstance(cmd, str) else f"{cmd[2]}:{cmd[3]}"
+            if isinstance(cmd, list):
+                concurrency.add(kwargs["concurrency"])
+            await asyncio.sleep(0.2 if name == "slow:backup" else 0.01)
+            events.append(name)
+            return {"current_try": 1, "tries_total": 1, "output": [(0, "")], "time": 1}
+
+        args = Namespace(actions=["backup", "prune", "check"], dry_run=False)
+        with runner.CommandExecutor() as executor:
+            runner_instance = runner.ResticRunner(config, args, [], executor)
+            with patch("runrestic.restic.tools.retry_process", new=fake_retry_process):
+                self.assertEqual(runner_instance.run(), 0)
+
+        # the catalog is refreshed after forget and prune have changed the snapshots
+        fast_chain = [
+            *["fast:backup", "fast:forget", "fast:prune", "fast:snapshots"],
+            "fast:check",
+        ]
+        slow_chain = [
+            *["slow:backup", "post", "slow:forget", "slow:prune", "slow:snapshots"],
+            "slow:check",
+        ]
+        self.assertEqual(events, ["pre", *fast_chain, *slow_chain])
+        # the two chains and the post_hooks running next to the slow chain
+        self.assertEqual(concurrency, {3})
+
+        metrics = runner_instance.metrics
+        self.assertEqual(
+            metrics["backup"],
+            {
+                "_restic_pre_hooks": {"duration_seconds": 1, "rc": 0},
+                "_restic_post_hooks": {"duration_seconds": 1, "rc": 0},
+                "slow": {"parsed": True},
+                "fast": {"parsed": True},
+            },
+        )
+        self.assertEqual(metrics["forget"]["fast"], {"forgotten": True})
+        self.assertEqual(metrics["prune"]["slow"], {"pruned": True})
+        self.assertEqual(metrics["check"]["fast"].rc, 0)
+        self.assertEqual(metrics["executor"]["commands"], 12)
+
+    def test_verbosity_args(self):
+        """
+        Test the restic verbosity arguments for the process log level per step.
+        """
+        scenarios: list[dict[str, Any]] = [
+            {"level": "debug", "step": "backup", "expected": ["--verbose"]},
+            {"level": "info", "step": "backup", "expected": []},
+            {"level": "warning", "step": "unlock", "expected": []},
+            {"level": "error", "step": "unlock", "expected": ["--quiet"]},
+            # the output of backup, forget, prune and check is parsed, even without metrics
+            {"level": "error", "step": "backup", "expected": []},
+            {"level": "critical", "step": "forget", "expected": []},
+            {
+                "level": "error",
+                "step": "backup",
+                "metrics": {"prometheus": {}},
+                "expected": [],
+            },
+            {
+                "level": "critical",
+                "step": "init",
+                "metrics": {"prometheus": {}},
+                "expected": ["--quiet"],
+            },
+            {
+                "level": "debug",
+                "step": "backup",
+                "restic_args": ["-vv"],
+                "expected": [],
+            },
+        ]
+        for sc in scenarios:
+            with self.subTest(f"{sc['level']} {sc['step']}"):
+                config = {
+                    "repositories": ["repo"],
+                    "environment": {},
+                    "execution": {"proc_log_level": sc["level"]},
+                    "backup": {},
+                }
+                if "metrics" in sc:
+                    config["metrics"] = sc["metrics"]
+                runner_instance = runner.ResticRunner(
+                    config, Namespace(dry_run=False), sc.get("restic_args", [])
+                )
+                with patch.object(
+                    tools.logger, "getEffectiveLevel", return_value=logging.DEBUG
+                ):
+                    self.assertEqual(
+                        runner_instance._verbosity_args(sc["step"]), sc["expected"]
+                    )
+                    if sc["step"] == "backup":
+                        command = runner_instance._backup_command("repo")
+                        self.assertEqual(
+                            command[3 : 5 + len(sc["expected"])],
+                            ["backup", "--json", *sc["expected"]],
+                        )
+
+    def test_backup_command_capabilities(self):
+        """
+        Test the `restic backup` flags selected by the restic version.
+        """
+        scenarios: list[dict[str, Any]] = [
+            {"name": "unknown", "version": None, "json": True, "no_scan": False},
+            {"name": "old", "version": (0, 8, 3), "json": False, "no_scan": False},
+            {"name": "no_scan", "version": (0, 16, 4), "json": True, "no_scan": True},
+            {
+                "name": "progress",
+                "version": (0, 16, 4),
+                "environment": {"RESTIC_PROGRESS_FPS": "1"},
+                "json": True,
+                "no_scan": False,
+            },
+            {
+                "name": "explicit",
+                "version": (0, 16, 4),
+                "restic_args": ["--no-scan"],
+                "json": True,
+                "no_scan": True,
+            },
+        ]
+        for sc in scenarios:
+            with self.subTest(sc["name"]):
+                self.mock_capabilities.return_value = ResticCapabilities(sc["version"])
+                config = {
+                    "repositories": ["repo"],
+                    "environment": {},
+                    "execution": {},
+                    "backup": {"sources": ["/data"]},
+                }
+                runner_instance = runner.ResticRunner(
+                    config, Namespace(dry_run=False), sc.get("restic_args", [])
+                )
+                with patch.dict(
+                    "os.environ", sc.get("environment", {}), clear=False
+                ) as environ:
+                    if "environment" not in sc:
+                        environ.pop("RESTIC_PROGRESS_FPS", None)
+                    command = runner_instance._backup_command("repo")
+                self.assertEqual("--json" in command, sc["json"])
+                self.assertEqual(command.count("--no-scan"), int(sc["no_scan"]))
+
+    @patch("runrestic.restic.runner.MultiCommand")
+    def test_backup_counts_timeouts(self, mock_mc):
+        """
+        Test that the tries killed by the watchdog are counted in the timeouts metric.
+        """
+        config = {
+            "repositories": ["repo1", "repo2"],
+            "environment": {},
+            "execution": {"timeout": "1:00"},
+            "backup": {"pre_hooks": ["pre"]},
+        }
+        mock_mc.return_value.run.side_effect = [
+            [{"output": [(0, "")], "time": 1, "timeouts": 1}],
+            [
+                {"output": [(124, "")], "time": 60, "timeouts": 2},
+                {"output": [(124, "")], "time": 60, "timeouts": 1},
+            ],
+        ]
+        runner_instance = runner.ResticRunner(config, Namespace(dry_run=False), [])
+        runner_instance.backup()
+
+        self.assertEqual(runner_instance.metrics["timeouts"], 4)
+        self.assertEqual(runner_instance.metrics["errors"], 2)
+        self.assertEqual(
+            runner_instance.metrics["backup"]["repo1"], CommandResult(rc=124)
+        )
+
+    @patch("runrestic.restic.runner.parse_backup", return_value={"parsed": True})
+    @patch("runrestic.restic.runner.write_metrics")
+    def test_run_pipelined_config_abort(self, mock_write, mock_backup):
+        """
+        Test that a config-wide abort in one chain skips the same step of all chains
+        which has not been started yet, like the batch of an action in sequence.
+        """
+        config = {
+            "name": "test",
+            "repositories": ["repo1", "repo2"],
+            "environment": {},
+            "execution": {"pipeline": True},
+            "backup": {"sources": ["/data"]},
+        }
+        spawned: list[str] = []
+
+        async def fake_retry_process(
+            cmd, config, abort_reasons=None, slot=None, **_kwargs
+        ):
+            async with slot() as runnable:
+                if not runnable:
+                    return {"current_try": 0, "output": []}
+                spawned.append(f"{cmd[2]}:{cmd[3]}")
+                return {
+                    "current_try": 1,
+                    "output": [(1, "Fatal: wrong password")],
+                    "time": 1,
+                }
+
+        args = Namespace(actions=["backup", "check"], dry_run=False)
+        runner_instance = runner.ResticRunner(config, args, [])
+        with patch("runrestic.restic.tools.retry_process", new=fake_retry_process):
+            self.assertEqual(runner_instance.run(), 4)
+
+        self.assertEqual(spawned, ["repo1:backup", "repo1:snapshots", "repo1:check"])
+        # backup, catalog refresh and check of repo2
+        self.assertEqual(runner_instance.metrics["skipped"], 3)
+        self.assertEqual(
+            runner_instance.metrics["backup"]["repo2"], CommandResult(rc=125)
+        )
+        self.assertEqual(runner_instance.metrics["check"]["repo2"].rc, 125)
+
+    @patch("runrestic.restic.runner.ProgressWriter")
+    @patch("runrestic.restic.runner.write_metrics")
+    def test_run_pipelined_backup_progress(self, mock_write, mock_writer_cls):
+        """
+        Test that the status messages of the backups are passed to the progress writer,
+        and that each repository is removed from it once its backup is done.
+        """
+        config = {
+            "name": "test",
+            "repositories": ["repo1"],
+            "environment": {},
+            "execution": {"pipeline": True},
+            "backup": {"sources": ["/data"]},
+            "metrics": {
+                "prometheus": {"path": "/metrics.prom", "progress_path": "/p.prom"}
+            },
+        }
+
+        async def fake_retry_process(cmd, config, abort_reasons=None, **kwargs):
+            if kwargs["progress"]:
+                kwargs["progress"]({"message_type": "status", "percent_done": 0.5})
+            return {"current_try": 1, "output": [(1, "failed")], "time": 1}
+
+        args = Namespace(actions=["backup", "check"], dry_run=False)
+        runner_instance = runner.ResticRunner(config, args, [])
+        with patch("runrestic.restic.tools.retry_process", new=fake_retry_process):
+            runner_instance.run()
+
+        writer = mock_writer_cls.return_value
+        writer.update.assert_called_once_with(
+            "repo1", {"message_type": "status", "percent_done": 0.5}
+        )
+        writer.finish.assert_called_once_with("repo1")
+
+    @patch("runrestic.restic.runner.write_metrics")
+    def test_run_pipelined_chain_error(self, mock_write):
+        """
+        Test that an error in one chain lets the other chains finish before it is raised.
+        """
+        config = {
+            "name": "test",
+            "repositories": ["repo1", "repo2"],
+            "environment": {},
+            "execution": {"pipeline": True},
+        }
+        spawned: list[str] = []
+
+        async def fake_retry_process(cmd, config, abort_reasons=None, **_kwargs):
+            if cmd[2] == "repo1":
+                raise RuntimeError("broken")
+            await asyncio.sleep(0.01)
+            spawned.append(f"{cmd[2]}:{cmd[3]}")
+            return {"current_try": 1, "output": [(0, "")], "time": 1}
+
+        args = Namespace(actions=["unlock", "check"], dry_run=False)
+        runner_instance = runner.ResticRunner(config, args, [])
+        with patch("runrestic.restic.tools.retry_process", new=fake_retry_process):
+            with self.assertRaisesRegex(RuntimeError, "broken"):
+                runner_instance.run()
+
+        self.assertEqual(spawned, ["repo2:unlock", "repo2:check"])
+
+    @patch("runrestic.restic.runner.CommandExecutor")
+    def test_run_pipelined_temporary_executor(self, mock_executor_cls):
+        """
+        Test that the pipeline uses a temporary executor if the runner has none.
+        """
+        config = {
+            "name": "test",
+            "repositories": ["repo"],
+            "environment": {},
+            "execution": {"pipeline": True},
+        }
+        args = Namespace(actions=["unlock"], dry_run=False)
+        runner_instance = runner.ResticRunner(config, args, [])
+        runner_instance.run()
+
+        executor = mock_executor_cls.return_value.__enter__.return_value
+        executor.run.assert_called_once()
+        executor.run.call_args[0][0].close()  # avoid "coroutine never awaited"
+
     @patch("runrestic.restic.runner.MultiCommand")
     def test_init_runs_commands(self, mock_mc):
         """
@@ -221,6 +632,10 @@ class TestResticRunner(TestCase):
         mock_mc.assert_called_once()
         actual_call_args = mock_mc.call_args[0][0]
         self.assertEqual(actual_call_args, expected_commands)
+        # the same config-wide abort scope as the other actions
+        self.assertEqual(
+            mock_mc.call_args[1]["config_abort_reasons"], runner.CONFIG_ABORT_REASONS
+        )
 
         # Validate run() was invoked
         mock_mc.return_value.run.assert_called_once()
@@ -264,6 +679,7 @@ class TestResticRunner(TestCase):
                 "-r",
                 "repo1",
                 "backup",
+                "--json",
                 "--opt",
                 "--files-from",
                 "/data/files.txt",
@@ -280,6 +696,7 @@ class TestResticRunner(TestCase):
                 "-r",
                 "repo2",
                 "backup",
+                "--json",
                 "--opt",
                 "--files-from",
                 "/data/files.txt",
@@ -297,13 +714,18 @@ class TestResticRunner(TestCase):
             "Fatal: wrong password",
         ]
         mock_mc.assert_called_once_with(
-            expected_commands, config["execution"], expected_abort
+            expected_commands,
+            config["execution"],
+            expected_abort,
+            executor=None,
+            config_abort_reasons=["Fatal: wrong password"],
+            progress=None,
         )
         mock_mc.return_value.run.assert_called_once()
 
         metrics = runner_instance.metrics["backup"]
         self.assertEqual(metrics["repo1"], {"parsed": True})
-        self.assertEqual(metrics["repo2"], {"rc": 1})
+        self.assertEqual(metrics["repo2"], CommandResult(rc=1))
         self.assertEqual(runner_instance.metrics["errors"], 1)
 
     @patch("runrestic.restic.runner.MultiCommand")
@@ -359,7 +781,7 @@ class TestResticRunner(TestCase):
         calls = mock_mc.call_args_list
         # 1) pre_hooks
         self.assertEqual(calls[0][0][0], config["backup"]["pre_hooks"])
-        self.assertEqual(calls[0][1], {"config": hooks_cfg})
+        self.assertEqual(calls[0][1], {"config": hooks_cfg, "executor": None})
         # 2) main backup
         expected_cmds = [
             [
@@ -367,6 +789,7 @@ class TestResticRunner(TestCase):
                 "-r",
                 "repo",
                 "backup",
+                "--json",
                 *restic_args,
                 *config["backup"]["sources"],
             ]
@@ -377,7 +800,7 @@ class TestResticRunner(TestCase):
         self.assertEqual(calls[1][0][2], expected_abort)
         # 3) post_hooks
         self.assertEqual(calls[2][0][0], config["backup"]["post_hooks"])
-        self.assertEqual(calls[2][1], {"config": hooks_cfg})
+        self.assertEqual(calls[2][1], {"config": hooks_cfg, "executor": None})
 
         # Assert metrics
         m = runner_instance.metrics["backup"]
@@ -429,6 +852,8 @@ class TestResticRunner(TestCase):
                 "Fatal: unable to open config file",
                 "Fatal: wrong password",
             ],
+            executor=None,
+            config_abort_reasons=["Fatal: wrong password"],
         )
         mock_mc.return_value.run.assert_called_once()
 
@@ -499,7 +924,7 @@ class TestResticRunner(TestCase):
 
         # Metrics for repo should record rc only
         forget_metrics = runner_instance.metrics["forget"]
-        self.assertEqual(forget_metrics["repo"], {"rc": 1})
+        self.assertEqual(forget_metrics["repo"], CommandResult(rc=1))
         # Error counter should be incremented
         self.assertEqual(runner_instance.metrics["errors"], 1)
 
@@ -514,6 +939,8 @@ class TestResticRunner(TestCase):
                 "Fatal: unable to open config file",
                 "Fatal: wrong password",
             ],
+            executor=None,
+            config_abort_reasons=["Fatal: wrong password"],
         )
 
     @patch("runrestic.restic.runner.MultiCommand")
@@ -564,10 +991,12 @@ class TestResticRunner(TestCase):
                 "Fatal: unable to open config file",
                 "Fatal: wrong password",
             ],
+            executor=None,
+            config_abort_reasons=["Fatal: wrong password"],
         )
 
     @patch("runrestic.restic.runner.MultiCommand")
-    @patch("runrestic.restic.runner.parse_new_prune", side_effect=IndexError)
+    @patch("runrestic.restic.runner.parse_new_prune")
     @patch("runrestic.restic.runner.parse_prune")
     @patch(
         "runrestic.restic.runner.redact_password", side_effect=lambda repo, repl: repo
@@ -576,8 +1005,9 @@ class TestResticRunner(TestCase):
         self, mock_redact, mock_parse_prune, mock_new_prune, mock_mc
     ):
         """
-        Test prune() falls back to parse_prune when parse_new_prune raises IndexError.
+        Test prune() uses parse_prune for restic <0.12.0.
         """
+        self.mock_capabilities.return_value = ResticCapabilities((0, 11, 1))
         config = {
             "repositories": ["repo"],
             "environment": {},
@@ -593,6 +1023,7 @@ class TestResticRunner(TestCase):
         runner_instance.prune()
         metrics = runner_instance.metrics["prune"]
         self.assertEqual(metrics["repo"], {"pruned": True})
+        mock_new_prune.assert_not_called()
 
     @patch("runrestic.restic.runner.MultiCommand")
     @patch("runrestic.restic.runner.parse_new_prune")
@@ -658,69 +1089,352 @@ class TestResticRunner(TestCase):
 
         # Metrics should record the rc and errors should increment
         prune_metrics = runner_instance.metrics["prune"]
-        self.assertEqual(prune_metrics["repo"], {"rc": 1})
+        self.assertEqual(prune_metrics["repo"], CommandResult(rc=1))
         self.assertEqual(runner_instance.metrics["errors"], 1)
 
-    @patch("runrestic.restic.runner.MultiCommand")
-    @patch(
-        "runrestic.restic.runner.redact_password", side_effect=lambda repo, repl: repo
-    )
-    @patch("runrestic.restic.runner.parse_stats")
-    def test_stats_metrics(self, mock_parse_stats, mock_redact, mock_mc):
+    def _run_stats(self, config, outputs, restic_args=None):
+        """
+        Run stats() with fake restic commands.
+
+        Args:
+            config (dict[str, Any]): The configuration.
+            outputs (dict[str, tuple[int, str]]): Return code and output per subcommand
+                and the snapshot IDs passed to it, e.g. "stats a b".
+            restic_args (list[str] | None): Additional arguments for restic.
+
+        Returns:
+            tuple[ResticRunner, list[list[str]]]: The runner and the executed commands.
+        """
+        commands: list[list[str]] = []
+
+        async def fake_retry_process(cmd, config, abort_reasons=None, **_kwargs):
+            commands.append(cmd)
+            snapshot_ids = [arg for arg in cmd[4:] if not arg.startswith("-")]
+            key = " ".join([cmd[3], *snapshot_ids[1:]]) if cmd[3] == "stats" else cmd[3]
+            return {
+                "current_try": 1,
+                "tries_total": 1,
+                "output": [outputs[key]],
+                "time": 0.5,
+                "resources": {"cpu_user_seconds": 1.0},
+            }
+
+        # keep the XDG_CACHE_HOME of the test, which is reset for root
+        with patch("runrestic.restic.runner.initialize_environment"):
+            runner_instance = runner.ResticRunner(
+                config, Namespace(dry_run=False), restic_args or []
+            )
+        with patch("runrestic.restic.tools.retry_process", new=fake_retry_process):
+            runner_instance.stats()
+        return runner_instance, commands
+
+    def test_stats_incremental(self):
+        """
+        Test that stats() only counts the snapshots which are not cached yet and
+        aggregates the restore size of all snapshots from the cache.
+        """
+        config = {"repositories": ["repo"], "environment": {}, "execution": {}}
+        stats = '{"total_size":%d,"total_file_count":%d,"snapshots_count":1}'
+        snapshot = '{"id":"%s","time":"2024-01-0%dT00:00:00Z","hostname":"host"}'
+        with (
+            tempfile.TemporaryDirectory() as cache_home,
+            patch.dict(os.environ, {"XDG_CACHE_HOME": cache_home}),
+        ):
+            runner_instance, commands = self._run_stats(
+                config,
+                {
+                    "snapshots": (0, f"[{snapshot % ('a', 1)},{snapshot % ('b', 2)}]"),
+                    "stats a b": (0, stats % (300, 30)),
+                },
+            )
+            # all snapshots of a cold cache are counted at once
+            self.assertEqual(
+                commands,
+                [
+                    ["restic", "-r", "repo", "snapshots", "--json"],
+                    ["restic", "-r", "repo", "stats", "--json"]
+                    + ["--mode", "restore-size", "-q", "a", "b"],
+                ],
+            )
+            self.assertEqual(
+                runner_instance.metrics["stats"]["repo"],
+                StatsResult(
+                    total_file_count=30,
+                    total_size_bytes=300,
+                    duration_seconds=1.0,
+                    rc=0,
+                    resources={"cpu_user_seconds": 2.0},
+                ),
+            )
+
+            # "c" is new, only it is counted
+            listed = [snapshot % ("a", 1), snapshot % ("b", 2), snapshot % ("c", 3)]
+            runner_instance, commands = self._run_stats(
+                config,
+                {
+                    "snapshots": (0, f"[{','.join(listed)}]"),
+                    "stats c": (0, stats % (400, 40)),
+                },
+            )
+            self.assertEqual([command[-1] for command in commands], ["--json", "c"])
+            result = runner_instance.metrics["stats"]["repo"]
+            self.assertEqual(
+                (result.total_size_bytes, result.total_file_count), (700, 70)
+            )
+
+            # "a" was forgotten, so the rest of its batch is counted again with "d"
+            listed = [snapshot % ("b", 2), snapshot % ("c", 3), snapshot % ("d", 4)]
+            runner_instance, commands = self._run_stats(
+                config,
+                {
+                    "snapshots": (0, f"[{','.join(listed)}]"),
+                    "stats b d": (0, stats % (500, 50)),
+                },
+            )
+            self.assertEqual(commands[1][-2:], ["b", "d"])
+            result = runner_instance.metrics["stats"]["repo"]
+            self.assertEqual(
+                (result.total_size_bytes, result.total_file_count), (900, 90)
+            )
+            self.assertEqual(runner_instance.metrics["errors"], 0)
+
+            # the catalog is synchronized with the listed snapshots
+            with runner_instance.catalog("repo") as catalog:
+                self.assertEqual(catalog.snapshot_ids(), {"b", "c", "d"})
+                self.assertEqual(catalog.latest(hostname="host")["id"], "d")
+
+    def test_stats_incomplete_result_not_cached(self):
+        """
+        Test that a result without totals fails the stats and is not cached.
+        """
+        config = {"repositories": ["repo"], "environment": {}, "execution": {}}
+        outputs = {
+            "snapshots": (0, '[{"id":"a","time":"2024-01-01T00:00:00Z"}]'),
+            "stats a": (0, '{"total_size":5}'),
+        }
+        with (
+            tempfile.TemporaryDirectory() as cache_home,
+            patch.dict(os.environ, {"XDG_CACHE_HOME": cache_home}),
+        ):
+            runner_instance, _commands = self._run_stats(config, outputs)
+            self.assertEqual(runner_instance.metrics["errors"], 1)
+            self.assertEqual(StatsCache("repo", "restore-size").entries, {})
+            _runner, commands = self._run_stats(config, outputs)
+            self.assertEqual(commands[-1][-1], "a")
+
+    def test_stats_modes(self):
         """
-        Test stats() calls parse_stats and updates metrics correctly.
+        Test that the non-additive modes count all snapshots at once, which is only
+        cached until the snapshots change.
         """
         config = {
             "repositories": ["repo"],
             "environment": {},
             "execution": {},
+            "stats": {"mode": "raw-data"},
         }
-        args = Namespace(dry_run=False)
-        restic_args = ["--verbose"]
-        runner_instance = runner.ResticRunner(config, args, restic_args)
-        process_info = {"output": [(0, "")], "time": 0.1}
-        mock_mc.return_value.run.return_value = [process_info]
-        mock_parse_stats.return_value = {"stats": True}
-
-        runner_instance.stats()
-        metrics = runner_instance.metrics["stats"]
-        self.assertEqual(metrics["repo"], {"stats": True})
-        self.assertEqual(runner_instance.metrics["errors"], 0)
+        outputs = {
+            "snapshots": (0, '[{"id":"b"},{"id":"a"}]\n'),
+            "stats a b": (0, '{"total_size":5,"total_file_count":1}'),
+        }
+        with (
+            tempfile.TemporaryDirectory() as cache_home,
+            patch.dict(os.environ, {"XDG_CACHE_HOME": cache_home}),
+        ):
+            runner_instance, commands = self._run_stats(config, outputs, ["--verbose"])
+            self.assertEqual(
+                commands[1],
+                ["restic", "-r", "repo", "stats", "--json", "--mode", "raw-data"]
+                + ["--verbose", "a", "b"],
+            )
+            self.assertEqual(
+                runner_instance.metrics["stats"]["repo"].total_size_bytes, 5
+            )
+            _runner, commands = self._run_stats(config, outputs, ["--verbose"])
+            self.assertEqual(len(commands), 1)
+
+    def test_stats_without_snapshot_list(self):
+        """
+        Test that all snapshots are counted at once if they cannot be listed.
+        """
+        config = {"repositories": ["repo"], "environment": {}, "execution": {}}
+        runner_instance, commands = self._run_stats(
+            config,
+            {
+                "snapshots": (0, "unexpected\n"),
+                "stats": (0, '{"total_size":5,"total_file_count":1}'),
+            },
+        )
+        self.assertEqual(commands[1][-1], "-q")
+        self.assertEqual(runner_instance.metrics["stats"]["repo"].total_file_count, 1)
 
-    @patch("runrestic.restic.runner.MultiCommand")
     @patch(
         "runrestic.restic.runner.redact_password", side_effect=lambda repo, repl: repo
     )
-    @patch("runrestic.restic.runner.parse_stats")
-    def test_stats_failure_increments_errors(
-        self, mock_parse_stats, mock_redact, mock_mc
-    ):
+    def test_stats_failure_increments_errors(self, mock_redact):
         """
-        Test stats() handles return_code > 0 by recording rc and incrementing errors.
+        Test stats() handles return_code > 0 by recording rc and incrementing errors,
+        and keeps the snapshots counted before the failure in the cache.
         """
-        config = {
-            "repositories": ["repo"],
-            "environment": {},
-            "execution": {},
-        }
-        args = Namespace(dry_run=False)
-        restic_args = ["--verbose"]
-        runner_instance = runner.ResticRunner(config, args, restic_args)
-
-        # simulate failure
-        process_info = {"output": [(1, "error occurred")], "time": 0.1}
-        mock_mc.return_value.run.return_value = [process_info]
+        config = {"repositories": ["repo"], "environment": {}, "execution": {}}
+        scenarios: list[dict[str, Any]] = [
+            {"name": "snapshots", "outputs": {"snapshots": (1, "error occurred")}},
+            {
+                "name": "stats",
+                "outputs": {
+                    "snapshots": (0, '[{"id":"a"},{"id":"b"}]\n'),
+                    "stats a": (0, '{"total_size":5,"total_file_count":1}'),
+                    "stats b": (1, "error occurred"),
+                },
+                "cached": [["a"]],
+            },
+        ]
+        for sc in scenarios:
+            with self.subTest(sc["name"]), tempfile.TemporaryDirectory() as cache_home:
+                with (
+                    patch.dict(os.environ, {"XDG_CACHE_HOME": cache_home}),
+                    # one snapshot per batch
+                    patch("runrestic.restic.stats_cache.STATS_BATCH_SIZE", 1),
+                ):
+                    runner_instance, _commands = self._run_stats(config, sc["outputs"])
+                    cache = StatsCache("repo", "restore-size")
+                self.assertEqual(
+                    runner_instance.metrics["stats"]["repo"],
+                    CommandResult(rc=1, resources={"cpu_user_seconds": 1.0}),
+                )
+                self.assertEqual(runner_instance.metrics["errors"], 1)
+                self.assertEqual(
+                    [entry[2] for entry in cache.entries.values()],
+                    sc.get("cached", []),
+                )
 
-        runner_instance.stats()
+    @patch("runrestic.restic.runner.write_metrics")
+    def test_forget_preview(self, mock_write_metrics):
+        """
+        Test that forget-preview simulates the prune policy on the snapshot catalogs,
+        without running restic or replacing the exported metrics.
+        """
+        snapshots = [
+            {"id": f"{day:08}", "time": f"2024-01-0{day}T00:00:00Z", "hostname": "h"}
+            for day in range(1, 5)
+        ]
+        for pipeline in (False, True):
+            config = {
+                "name": "test",
+                "repositories": ["repo", "new-repo", "bad-repo"],
+                "environment": {},
+                "execution": {"pipeline": pipeline},
+                "metrics": {"prometheus": {}},
+                "prune": {"keep-last": 2, "group-by": "host"},
+            }
+            with (
+                self.subTest(pipeline=pipeline),
+                tempfile.TemporaryDirectory() as cache_home,
+                patch.dict(os.environ, {"XDG_CACHE_HOME": cache_home}),
+                patch("runrestic.restic.runner.initialize_environment"),
+                patch("runrestic.restic.tools.retry_process") as mock_retry,
+                self.assertLogs("runrestic.restic.runner") as logs,
+            ):
+                runner_instance = runner.ResticRunner(
+                    config, Namespace(dry_run=False, actions=["forget-preview"]), []
+                )
+                runner_instance._update_catalog("repo", snapshots)
+                # a snapshot without time in the catalog fails the simulation
+                with runner_instance.catalog("bad-repo") as catalog:
+                    catalog.update(snapshots[:1])
+                    with catalog.connection:
+                        catalog.connection.execute(
+                            'UPDATE snapshots SET data = \'{"id": "x"}\''
+                        )
+                self.assertEqual(runner_instance.run(), 1)
+
+            mock_retry.assert_not_called()
+            mock_write_metrics.assert_not_called()
+            self.assertIn(
+                "INFO:runrestic.restic.runner:repo: snapshots for (host [h])"
+                " would keep 2 and remove 2",
+                logs.output,
+            )
+            self.assertIn(
+                "INFO:runrestic.restic.runner:  remove 00000002 "
+                "2024-01-02T00:00:00Z",
+                logs.output,
+            )
+            self.assertTrue(
+                any("No snapshot catalog of new-repo" in line for line in logs.output)
+            )
+            self.assertTrue(
+                any(
+                    "Unable to preview forget for bad-repo" in line
+                    for line in logs.output
+                )
+            )
+            self.assertNotIn("forget-preview", runner_instance.metrics)
 
-        # parse_stats should NOT be called on failure
-        mock_parse_stats.assert_not_called()
+    def test_with_catalog_refresh(self):
+        """
+        Test that the catalog is refreshed after the last action changing the snapshots,
+        unless a later stats action refreshes it.
+        """
+        scenarios = [
+            (["backup"], ["backup", "catalog"]),
+            (["backup", "prune", "check"], ["backup", "prune", "catalog", "check"]),
+            (
+                ["backup", "prune", "check", "stats"],
+                ["backup", "prune", "check", "stats"],
+            ),
+            (["stats", "backup"], ["stats", "backup", "catalog"]),
+            (["check", "forget-preview"], ["check", "forget-preview"]),
+        ]
+        for actions, expected in scenarios:
+            with self.subTest(actions=actions):
+                self.assertEqual(runner.with_catalog_refresh(actions), expected)
 
-        metrics = runner_instance.metrics["stats"]
-        # rc should be recorded
-        self.assertEqual(metrics["repo"], {"rc": 1})
-        # errors counter should have been incremented by 1
-        self.assertEqual(runner_instance.metrics["errors"], 1)
+    @patch("runrestic.restic.runner.write_metrics")
+    def test_backup_refreshes_catalog(self, mock_write_metrics):
+        """
+        Test that a backup refreshes the snapshot catalog without the stats action, and
+        that a failed refresh is only logged.
+        """
+        listed = '[{"id":"a","time":"2024-01-01T00:00:00Z","hostname":"h"}]'
+        for pipeline in (False, True):
+            config = {
+                "name": "test",
+                "repositories": ["repo", "bad-repo"],
+                "environment": {},
+                "execution": {"pipeline": pipeline},
+                "backup": {"sources": ["/data"]},
+            }
+
+            async def fake_retry_process(cmd, config, abort_reasons=None, **_kwargs):
+                output = listed if cmd[2] == "repo" and cmd[3] == "snapshots" else ""
+                rc = 1 if cmd[2] == "bad-repo" and cmd[3] == "snapshots" else 0
+                return {"current_try": 1, "tries_total": 1, "output": [(rc, output)]}
+
+            with (
+                self.subTest(pipeline=pipeline),
+                tempfile.TemporaryDirectory() as cache_home,
+                patch.dict(os.environ, {"XDG_CACHE_HOME": cache_home}),
+                patch("runrestic.restic.runner.initialize_environment"),
+                patch("runrestic.restic.runner.parse_backup", return_value=None),
+                patch("runrestic.restic.tools.retry_process", new=fake_retry_process),
+                self.assertLogs("runrestic.restic.runner", logging.WARNING) as logs,
+            ):
+                runner_instance = runner.ResticRunner(
+                    config, Namespace(dry_run=False, actions=["backup"]), []
+                )
+                self.assertEqual(runner_instance.run(), 0)
+                with runner_instance.catalog("repo") as catalog:
+                    self.assertEqual(catalog.snapshot_ids(), {"a"})
+                self.assertFalse(
+                    os.path.exists(runner.SnapshotCatalog.catalog_path("bad-repo"))
+                )
+            self.assertTrue(
+                any(
+                    "Unable to refresh the snapshot catalog of bad-repo" in line
+                    for line in logs.output
+                )
+            )
 
     @patch("runrestic.restic.runner.MultiCommand")
     def test_check_metrics_with_and_without_options(self, mock_mc):
@@ -808,20 +1522,22 @@ class TestResticRunner(TestCase):
                     expected_commands,
                     config=sc["config"]["execution"],
                     abort_reasons=expected_abort,
+                    executor=None,
+                    config_abort_reasons=["Fatal: wrong password"],
                 )
                 mock_mc.return_value.run.assert_called_once()
 
                 # self.assertEqual(config, base_config)
                 # combined per-repo metrics assertion
-                expected_stats = {
-                    "errors": 1,
-                    "errors_snapshots": 1,
-                    "errors_data": 1,
-                    "check_unused": sc["expected_stats"]["check_unused"],
-                    "read_data": sc["expected_stats"]["read_data"],
-                    "duration_seconds": 0.5,
-                    "rc": 1,
-                }
+                expected_stats = CheckResult(
+                    errors=1,
+                    errors_snapshots=1,
+                    errors_data=1,
+                    check_unused=sc["expected_stats"]["check_unused"],
+                    read_data=sc["expected_stats"]["read_data"],
+                    duration_seconds=0.5,
+                    rc=1,
+                )
                 self.assertEqual(
                     runner_instance.metrics["check"]["repo"], expected_stats
                 )
@@ -886,7 +1602,7 @@ class TestResticRunner(TestCase):
                 self.assertEqual(runner_instance.metrics["errors"], sc["global_errors"])
                 # check errors counter
                 self.assertEqual(
-                    runner_instance.metrics["check"]["repo"]["errors"],
+                    runner_instance.metrics["check"]["repo"].errors,
                     sc["check_errors"],
                 )
                 # reset between subtests
@@ -94,3 +94,29 @@ class TestResticShell(TestCase):
             str(context.exception)
             == "Invalid selection. Please choose a valid repository index."
         )
+
+    @patch("runrestic.restic.shell.logger")
+    @patch("runrestic.restic.shell.sys.exit")
+    def test_restic_shell_catalog(self, mock_sys_exit, mock_logger):
+        """
+        Test that the path of an existing snapshot catalog is set in the shell.
+        """
+        configs = [
+            {
+                "name": "TestConfig",
+                "repositories": ["test_repo"],
+                "environment": {},
+            }
+        ]
+        with (
+            patch("builtins.print"),
+            patch("runrestic.restic.shell.pty.spawn"),
+            patch(
+                "runrestic.restic.shell.SnapshotCatalog.catalog_path",
+                return_value="/cache/catalog.sqlite",
+            ),
+            patch("runrestic.restic.shell.os.path.exists", return_value=True),
+            patch.dict(os.environ, {}),
+        ):
+            shell.restic_shell(configs)
+            self.assertEqual(os.environ["RUNRESTIC_CATALOG"], "/cache/catalog.sqlite")
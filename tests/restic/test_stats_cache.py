@@ -0,0 +1,66 @@
+import os
+from unittest.mock import patch
+
+from runrestic.restic.results import StatsResult
+from runrestic.restic.stats_cache import StatsCache
+
+
+def stats_result(size: int, files: int) -> StatsResult:
+    return StatsResult(
+        total_file_count=files, total_size_bytes=size, duration_seconds=1, rc=0
+    )
+
+
+def test_stats_cache_restore_size(tmp_path):
+    with patch.dict(os.environ, {"XDG_CACHE_HOME": str(tmp_path)}):
+        cache = StatsCache("sftp:user:secret@host:/repo", "restore-size")
+        assert "secret" not in cache.path
+        assert cache.path.startswith(str(tmp_path / "runrestic" / "stats"))
+        assert cache.missing(["a", "b"]) == [["a", "b"]]
+        cache.add(["a", "b"], stats_result(300, 30))
+        assert cache.missing(["a", "b"]) == []
+        cache.save()
+
+        cache = StatsCache("sftp:user:secret@host:/repo", "restore-size")
+        assert cache.missing(["a", "b", "c"]) == [["c"]]
+        cache.add(["c"], stats_result(400, 40))
+        assert cache.total(["a", "b", "c"]) == (700, 70)
+        # forgetting "a" invalidates its batch, "b" is counted again
+        assert cache.missing(["b", "c", "d"]) == [["b", "d"]]
+        cache.add(["b", "d"], stats_result(500, 50))
+        assert cache.total(["b", "c", "d"]) == (900, 90)
+        assert sorted(entry[2] for entry in cache.entries.values()) == [
+            ["b", "d"],
+            ["c"],
+        ]
+
+
+def test_stats_cache_batches(tmp_path):
+    with (
+        patch.dict(os.environ, {"XDG_CACHE_HOME": str(tmp_path)}),
+        patch("runrestic.restic.stats_cache.STATS_BATCH_SIZE", 2),
+    ):
+        cache = StatsCache("/repo", "restore-size")
+        assert cache.missing(["c", "a", "b"]) == [["c", "a"], ["b"]]
+
+
+def test_stats_cache_non_additive(tmp_path):
+    with patch.dict(os.environ, {"XDG_CACHE_HOME": str(tmp_path)}):
+        cache = StatsCache("/repo", "files-by-contents")
+        assert cache.missing([]) == []
+        assert cache.total([]) == (0, 0)
+        assert cache.missing(["b", "a"]) == [["a", "b"]]
+        cache.add(["a", "b"], stats_result(5, 1))
+        assert cache.missing(["a", "b"]) == []
+        assert cache.missing(["a", "b", "c"]) == [["a", "b", "c"]]
+        assert cache.missing(["a"]) == [["a"]]
+        assert cache.total(["a", "b"]) == (5, 1)
+
+
+def test_stats_cache_invalid_entries(tmp_path):
+    with patch.dict(os.environ, {"XDG_CACHE_HOME": str(tmp_path)}):
+        cache = StatsCache("/repo", "restore-size")
+        os.makedirs(os.path.dirname(cache.path))
+        with open(cache.path, "w") as file:
+            file.write('{"x": [1, 2, ["a"]], "y": [1, 2], "z": "garbage"}')
+        assert StatsCache("/repo", "restore-size").entries == {"x": [1, 2, ["a"]]}
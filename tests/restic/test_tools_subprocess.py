@@ -1,22 +1,64 @@
 """Test log output for sub-processes
 
-Using pytest-subprocess plugin https://pytest-subprocess.readthedocs.io/
+The processes are replaced by fakes which replay registered output, like the
+pytest-subprocess plugin https://pytest-subprocess.readthedocs.io/ does for
+`subprocess.Popen`, which `spawn_process` needs real pipes and process IDs for.
 """
 
+import asyncio
 import logging
-import subprocess
-from io import StringIO
+from collections import deque
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
 
 from runrestic.restic import tools
 
 
+class FakeCommands:
+    """Replay the registered output and return codes of commands in order."""
+
+    def __init__(self) -> None:
+        self.calls: deque = deque()
+
+    def register(self, cmd, stdout, returncode, occurrences=1):
+        self.calls.extend([(cmd, stdout, returncode)] * occurrences)
+
+    async def spawn_process(self, cmd, *_args):
+        expected, stdout, returncode = self.calls.popleft()
+        assert cmd == expected
+        process = MagicMock()
+        process.pid = 2**22 + 1  # above the maximum pid of Linux
+        process.stdout = asyncio.StreamReader()
+        process.stdout.feed_data("".join(f"{line}\n" for line in stdout).encode())
+        process.stdout.feed_eof()
+        process.wait = AsyncMock(return_value=returncode)
+        process.returncode = returncode
+        process.rusage = None
+        return process
+
+
+@pytest.fixture
+def fake_commands(monkeypatch):
+    commands = FakeCommands()
+    monkeypatch.setattr(tools, "spawn_process", commands.spawn_process)
+    return commands
+
+
 def test_log_messages_no_output():
     """Test log messages with no output"""
-    assert tools.log_messages(None, "test_cmd") == ""
-    assert tools.log_messages(StringIO("    "), "test_cmd") == ""
 
+    async def log_blank() -> str:
+        stream = asyncio.StreamReader()
+        stream.feed_data(b"    ")
+        stream.feed_eof()
+        return await tools.log_messages(stream, "test_cmd")
 
-def test_restic_logs(caplog, fp, monkeypatch):  # pylint: disable=invalid-name
+    assert asyncio.run(tools.log_messages(None, "test_cmd")) == ""
+    assert asyncio.run(log_blank()) == ""
+
+
+def test_restic_logs(caplog, fake_commands):
     cmd = ["restic", "-r", "test_repo", "backup"]
     out = [
         "using parent snapshot b601066b",
@@ -26,16 +68,17 @@ def test_restic_logs(caplog, fp, monkeypatch):  # pylint: disable=invalid-name
         "processed 1888 files, 11.342 GiB in 0:00",
         "snapshot 1e3c30a1 saved",
     ]
-    fp.register(
+    fake_commands.register(
         cmd,
         stdout=out,
         returncode=0,
     )
-    monkeypatch.setattr(tools, "Popen", subprocess.Popen)
     caplog.set_level(logging.INFO)
-    result = tools.retry_process(
-        cmd,
-        config={},
+    result = asyncio.run(
+        tools.retry_process(
+            cmd,
+            config={},
+        )
     )
     assert result["output"] == [(0, "\n".join([*out, ""]))]
     for log in out:
@@ -52,15 +95,16 @@ def test_restic_logs(caplog, fp, monkeypatch):  # pylint: disable=invalid-name
     )
 
 
-def test_restic_abort(caplog, fp, monkeypatch):  # pylint: disable=invalid-name
+def test_restic_abort(caplog, fake_commands):
     cmd = ["restic", "-r", "test_repo", "backup"]
     out = ["Fatal: wrong password"]
     # Register 3 calls failing
-    fp.register(cmd, stdout=out, returncode=1, occurrences=3)
-    monkeypatch.setattr(tools, "Popen", subprocess.Popen)
+    fake_commands.register(cmd, stdout=out, returncode=1, occurrences=3)
     caplog.set_level(logging.INFO)
-    result = tools.retry_process(
-        cmd, config={"retry_count": 2}, abort_reasons=["Fatal: wrong password"]
+    result = asyncio.run(
+        tools.retry_process(
+            cmd, config={"retry_count": 2}, abort_reasons=["Fatal: wrong password"]
+        )
     )
     assert result["output"] == [(1, "\n".join([*out, ""]))]
     assert (
@@ -75,19 +119,22 @@ def test_restic_abort(caplog, fp, monkeypatch):  # pylint: disable=invalid-name
     ) in caplog.record_tuples
 
 
-def test_retry_pass_logs(caplog, fp, monkeypatch):  # pylint: disable=invalid-name
+def test_retry_pass_logs(caplog, fake_commands):
     cmd = ["restic", "-r", "test_repo", "backup"]
     out_fail = ["Fatal: something went wrong"]
     out_pass = ["snapshot 1e3c30a1 saved"]
     retries = 2
     # Register #'retries' calls failing
-    fp.register(cmd, stdout=out_fail, returncode=1, occurrences=retries)
+    fake_commands.register(cmd, stdout=out_fail, returncode=1, occurrences=retries)
     # Register final call success
-    fp.register(cmd, stdout=out_pass, returncode=0)
-    monkeypatch.setattr(tools, "Popen", subprocess.Popen)
+    fake_commands.register(cmd, stdout=out_pass, returncode=0)
     caplog.set_level(logging.INFO)
-    result = tools.retry_process(
-        cmd, config={"retry_count": retries}, abort_reasons=["Fatal: wrong password"]
+    result = asyncio.run(
+        tools.retry_process(
+            cmd,
+            config={"retry_count": retries},
+            abort_reasons=["Fatal: wrong password"],
+        )
     )
     assert result["output"] == [(1, out_fail[0] + "\n")] * retries + [
         (0, out_pass[0] + "\n")
@@ -104,19 +151,22 @@ def test_retry_pass_logs(caplog, fp, monkeypatch):  # pylint: disable=invalid-na
     ) in caplog.record_tuples
 
 
-def test_retry_fail_logs(caplog, fp, monkeypatch):  # pylint: disable=invalid-name
+def test_retry_fail_logs(caplog, fake_commands):
     cmd = ["restic", "-r", "test_repo", "backup"]
     out_fail = ["Fatal: something went wrong"]
     out_pass = ["snapshot 1e3c30a1 saved"]
     retries = 3
     # Register 2 calls failing
-    fp.register(cmd, stdout=out_fail, returncode=1, occurrences=retries + 1)
+    fake_commands.register(cmd, stdout=out_fail, returncode=1, occurrences=retries + 1)
     # Register 3rd call success
-    fp.register(cmd, stdout=out_pass, returncode=0)
-    monkeypatch.setattr(tools, "Popen", subprocess.Popen)
+    fake_commands.register(cmd, stdout=out_pass, returncode=0)
     caplog.set_level(logging.INFO)
-    result = tools.retry_process(
-        cmd, config={"retry_count": retries}, abort_reasons=["Fatal: wrong password"]
+    result = asyncio.run(
+        tools.retry_process(
+            cmd,
+            config={"retry_count": retries},
+            abort_reasons=["Fatal: wrong password"],
+        )
     )
     assert result["output"] == [(1, out_fail[0] + "\n")] * (retries + 1)
     assert (
@@ -131,7 +181,7 @@ def test_retry_fail_logs(caplog, fp, monkeypatch):  # pylint: disable=invalid-na
     ) in caplog.record_tuples
 
 
-def test_log_level_mapping(caplog, fp, monkeypatch):  # pylint: disable=invalid-name
+def test_log_level_mapping(caplog, fake_commands):
     cmd = ["restic", "-r", "test_repo", "backup"]
     test_messages = {
         "Random log message, not an ERROR": logging.INFO,
@@ -142,13 +192,16 @@ def test_log_level_mapping(caplog, fp, monkeypatch):  # pylint: disable=invalid-
         "FATAL as critical message": logging.CRITICAL,
         "CRITICAL log message": logging.CRITICAL,
     }
-    fp.register(cmd, stdout=list(test_messages.keys()), returncode=1, occurrences=3)
-    monkeypatch.setattr(tools, "Popen", subprocess.Popen)
+    fake_commands.register(
+        cmd, stdout=list(test_messages.keys()), returncode=1, occurrences=3
+    )
     caplog.set_level(logging.DEBUG)
 
-    result = tools.retry_process(
-        cmd,
-        config={},
+    result = asyncio.run(
+        tools.retry_process(
+            cmd,
+            config={},
+        )
     )
     assert result["output"][-1] == (1, "\n".join(test_messages.keys()) + "\n")
     for message, level in test_messages.items():
@@ -159,7 +212,7 @@ def test_log_level_mapping(caplog, fp, monkeypatch):  # pylint: disable=invalid-
         ) in caplog.record_tuples
 
 
-def test_hook_log(caplog, fp, monkeypatch):  # pylint: disable=invalid-name
+def test_hook_log(caplog, fake_commands):
     cmd = "hook_cmd --some-option 123 -v"
     test_messages = {
         "Random log message, not an ERROR": logging.INFO,
@@ -170,13 +223,16 @@ def test_hook_log(caplog, fp, monkeypatch):  # pylint: disable=invalid-name
         "FATAL as critical message": logging.CRITICAL,
         "CRITICAL log message": logging.CRITICAL,
     }
-    fp.register(cmd, stdout=list(test_messages.keys()), returncode=0, occurrences=1)
-    monkeypatch.setattr(tools, "Popen", subprocess.Popen)
+    fake_commands.register(
+        cmd, stdout=list(test_messages.keys()), returncode=0, occurrences=1
+    )
     caplog.set_level(logging.DEBUG)
 
-    result = tools.retry_process(
-        cmd,
-        config={},
+    result = asyncio.run(
+        tools.retry_process(
+            cmd,
+            config={"shell": True},
+        )
     )
     assert result["output"] == [(0, "\n".join(test_messages.keys()) + "\n")]
     for message, level in test_messages.items():
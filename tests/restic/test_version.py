@@ -0,0 +1,113 @@
+import json
+import os
+import subprocess
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from runrestic.restic import version
+
+
+class TestResticVersion(TestCase):
+    def setUp(self) -> None:
+        version.cached_version.cache_clear()
+        self.addCleanup(version.cached_version.cache_clear)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch.dict(os.environ, {"XDG_CACHE_HOME": self.tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache_file = os.path.join(self.tmp.name, "runrestic", version.CACHE_FILE)
+
+    def test_capabilities(self):
+        """
+        Test the features derived from the restic version.
+        """
+        scenarios = [
+            (None, (True, True, False, True)),
+            ((0, 8, 3), (False, False, False, False)),
+            ((0, 11, 1), (True, False, False, False)),
+            ((0, 12, 0), (True, True, False, False)),
+            ((0, 15, 0), (True, True, True, False)),
+            ((0, 17, 0), (True, True, True, True)),
+            ((1, 0, 0), (True, True, True, True)),
+        ]
+        for restic_version, expected in scenarios:
+            with self.subTest(restic_version):
+                capabilities = version.ResticCapabilities(restic_version)
+                self.assertEqual(
+                    (
+                        capabilities.json_backup,
+                        capabilities.new_prune,
+                        capabilities.no_scan,
+                        capabilities.forget_keeps_oldest,
+                    ),
+                    expected,
+                )
+
+    @patch("runrestic.restic.version.subprocess.run")
+    def test_cached_version_probes_once(self, mock_run):
+        """
+        Test that the version is probed once and then read from the cache file.
+        """
+        mock_run.return_value = MagicMock(
+            stdout="restic 0.16.4 compiled with go1.21.6 on linux/amd64\n"
+        )
+        self.assertEqual(version.cached_version("/bin/restic", 1, 2), (0, 16, 4))
+        mock_run.assert_called_once()
+        with open(self.cache_file) as file:
+            self.assertEqual(
+                json.load(file),
+                {"/bin/restic": {"mtime_ns": 1, "size": 2, "version": [0, 16, 4]}},
+            )
+
+        # a new process only reads the cache file
+        version.cached_version.cache_clear()
+        self.assertEqual(version.cached_version("/bin/restic", 1, 2), (0, 16, 4))
+        mock_run.assert_called_once()
+
+        # an updated binary is probed again
+        mock_run.return_value.stdout = "restic 0.17.0 compiled with go1.22.5"
+        self.assertEqual(version.cached_version("/bin/restic", 3, 2), (0, 17, 0))
+        self.assertEqual(mock_run.call_count, 2)
+
+    @patch("runrestic.restic.version.subprocess.run")
+    def test_cached_version_probe_failure(self, mock_run):
+        """
+        Test that a failed probe returns None and is not cached.
+        """
+        scenarios = [
+            {"name": "timeout", "side_effect": subprocess.TimeoutExpired("restic", 30)},
+            {"name": "missing", "side_effect": FileNotFoundError("restic")},
+            {"name": "unparsable", "return_value": MagicMock(stdout="garbage")},
+        ]
+        for sc in scenarios:
+            with self.subTest(sc["name"]):
+                version.cached_version.cache_clear()
+                mock_run.side_effect = sc.get("side_effect")
+                mock_run.return_value = sc.get("return_value")
+                self.assertIsNone(version.cached_version("/bin/restic", 1, 2))
+                self.assertFalse(os.path.exists(self.cache_file))
+
+    @patch("runrestic.restic.version.which", return_value=None)
+    def test_restic_capabilities_not_installed(self, _mock_which):
+        """
+        Test that a missing restic results in an unknown version.
+        """
+        self.assertEqual(version.restic_capabilities(), version.ResticCapabilities())
+
+    @patch("runrestic.restic.version.cached_version", return_value=(0, 14, 0))
+    def test_restic_capabilities(self, mock_cached):
+        """
+        Test that the binary is keyed by its resolved path, mtime and size.
+        """
+        binary = os.path.join(self.tmp.name, "restic")
+        with open(binary, "w") as file:
+            file.write("binary")
+        with patch("runrestic.restic.version.which", return_value=binary):
+            capabilities = version.restic_capabilities()
+        self.assertEqual(capabilities.version, (0, 14, 0))
+        stat = os.stat(binary)
+        mock_cached.assert_called_once_with(
+            os.path.realpath(binary), stat.st_mtime_ns, stat.st_size
+        )
@@ -2,6 +2,7 @@ import os
 from argparse import Namespace
 from unittest.mock import patch
 
+import jsonschema
 import pytest
 from toml import TomlDecodeError
 
@@ -20,6 +21,8 @@ def test_cli_arguments():
             config_file=None,
             dry_run=False,
             log_level="info",
+            max_parallel=None,
+            proc_log_level=None,
             show_progress=None,
         ),
         [],
@@ -30,6 +33,8 @@ def test_cli_arguments():
             config_file=None,
             dry_run=False,
             log_level="debug",
+            max_parallel=None,
+            proc_log_level=None,
             show_progress=None,
         ),
         [],
@@ -40,16 +45,24 @@ def test_cli_arguments():
             config_file=None,
             dry_run=False,
             log_level="info",
+            max_parallel=None,
+            proc_log_level=None,
             show_progress=None,
         ),
         [],
     )
+    assert cli_arguments(["stats", "forget-preview"])[0].actions == [
+        "stats",
+        "forget-preview",
+    ]
     assert cli_arguments(["backup", "--", "--one-file-system"]) == (
         Namespace(
             actions=["backup"],
             config_file=None,
             dry_run=False,
             log_level="info",
+            max_parallel=None,
+            proc_log_level=None,
             show_progress=None,
         ),
         ["--one-file-system"],
@@ -58,6 +71,21 @@ def test_cli_arguments():
         cli_arguments(["-h"])
 
 
+def test_cli_arguments_max_parallel():
+    assert cli_arguments(["--max-parallel", "4"])[0].max_parallel == 4
+    assert cli_arguments(["--max-parallel", "auto"])[0].max_parallel == "auto"
+    for invalid in ["0", "-2", "many"]:
+        with pytest.raises(SystemExit):
+            cli_arguments(["--max-parallel", invalid])
+
+
+def test_cli_arguments_proc_log_level():
+    assert cli_arguments(["-p", "warning"])[0].proc_log_level == "warning"
+    assert cli_arguments(["--proc-log-level", "debug"])[0].proc_log_level == "debug"
+    with pytest.raises(SystemExit):
+        cli_arguments(["-p", "verbose"])
+
+
 @pytest.fixture
 def restic_dir(tmpdir):
     os.environ["XDG_CONFIG_HOME"] = str(tmpdir)
@@ -189,6 +217,43 @@ def test_parse_configuration_broken_conf(caplog, restic_minimal_broken_conf):
         parse_configuration(restic_minimal_broken_conf)
 
 
+@pytest.mark.parametrize(
+    "execution, valid",
+    [
+        ('timeout = "6:00:00"', True),
+        ('timeout = "30:00"', True),
+        ('timeout = "3600"', False),
+        ('timeout = "1:00x"', False),
+        ('timeout = { backup = "6:00:00", default = "30:00" }', True),
+        ('timeout = { backup = "6h" }', False),
+        ('stall_timeout = "5:00"', True),
+        ('stall_timeout = "300"', False),
+    ],
+)
+def test_parse_configuration_timeout(restic_dir, execution, valid):
+    """
+    Test that the timeouts must be durations in the format of `parse_time`.
+    """
+    p = restic_dir.join("timeout.toml")
+    p.write(
+        'repositories = ["/tmp/restic-repo-1"]\n'  # noqa: S108
+        "[environment]\n"
+        'RESTIC_PASSWORD = "CHANGEME"\n'
+        "[backup]\n"
+        'sources = ["/etc"]\n'
+        "[prune]\n"
+        "keep-last = 10\n"
+        "[execution]\n"
+        f"{execution}\n"
+    )
+    if valid:
+        assert parse_configuration(p)["execution"]
+    else:
+        with pytest.raises(jsonschema.exceptions.ValidationError) as error:
+            parse_configuration(p)
+        assert "timeout" in error.value.json_path
+
+
 def test_cli_arguments_with_extra_args():
     assert cli_arguments(
         ["backup", "--one-file-system", "pos_arg", "--", "--more"]
@@ -198,6 +263,8 @@ def test_cli_arguments_with_extra_args():
             config_file=None,
             dry_run=False,
             log_level="info",
+            max_parallel=None,
+            proc_log_level=None,
             show_progress=None,
         ),
         ["--one-file-system", "pos_arg", "--more"],
@@ -208,3 +275,10 @@ def test_cli_arguments_with_extra_args():
 # def test_parse_configuration_broken_conf(restic_minimal_broken_conf):
 #     with pytest.raises(jsonschema.exceptions.ValidationError):
 #         parse_configuration(restic_minimal_broken_conf)
+
+
+def test_parse_configuration_sample_conf():
+    sample = os.path.join(os.path.dirname(__file__), "../../sample/example.toml")
+    config = parse_configuration(sample)
+    assert config["execution"]["retry_count"] == 10
+    assert config["execution"]["resource_slots"] == {"io": 2, "network": 2, "memory": 1}
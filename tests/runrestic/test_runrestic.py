@@ -119,6 +119,8 @@ class TestRunresticRunrestic(TestCase):
         args.config_file = "/tmp/config"  # noqa: S108
         args.actions = []
         args.show_progress = None
+        args.max_parallel = None
+        args.proc_log_level = None
         extras: list[str] = []
         mock_cli.return_value = (args, extras)
 
@@ -139,7 +141,12 @@ class TestRunresticRunrestic(TestCase):
         self, mock_possible, mock_confpaths, mock_cli, mock_check
     ):
         args = MagicMock(
-            log_level="debug", config_file=None, actions=[], show_progress=None
+            log_level="debug",
+            config_file=None,
+            actions=[],
+            show_progress=None,
+            max_parallel=None,
+            proc_log_level=None,
         )
         extras: list[str] = []
         mock_cli.return_value = (args, extras)
@@ -156,7 +163,12 @@ class TestRunresticRunrestic(TestCase):
         self, mock_parse, mock_conf_paths, mock_cli, mock_check
     ):
         args = MagicMock(
-            log_level="info", config_file=None, actions=[], show_progress="0.5"
+            log_level="info",
+            config_file=None,
+            actions=[],
+            show_progress="0.5",
+            max_parallel=None,
+            proc_log_level=None,
         )
         extras: list[str] = []
         mock_cli.return_value = (args, extras)
@@ -187,6 +199,8 @@ class TestRunresticRunrestic(TestCase):
                 config_file=None,
                 actions=["shell"],
                 show_progress=None,
+                max_parallel=None,
+                proc_log_level=None,
             )
             extras: list[str] = []
             mock_cli.return_value = (args, extras)
@@ -209,7 +223,12 @@ class TestRunresticRunrestic(TestCase):
         self, mock_runner_cls, mock_parse, mock_confpaths, mock_cli, mock_check
     ):
         args = MagicMock(
-            log_level="info", config_file=None, actions=[], show_progress=None
+            log_level="info",
+            config_file=None,
+            actions=[],
+            show_progress=None,
+            max_parallel=None,
+            proc_log_level=None,
         )
         extras: list[str] = []
         mock_cli.return_value = (args, extras)
@@ -222,3 +241,66 @@ class TestRunresticRunrestic(TestCase):
         with self.assertRaises(SystemExit) as cm:
             runrestic.runrestic()
         self.assertEqual(cm.exception.code, 1)
+
+        # both runners share the same executor
+        executors = {call[0][3] for call in mock_runner_cls.call_args_list}
+        self.assertEqual(len(executors), 1)
+        self.assertIsInstance(executors.pop(), runrestic.CommandExecutor)
+
+    @patch("runrestic.runrestic.runrestic.restic_check", return_value=True)
+    @patch("runrestic.runrestic.runrestic.cli_arguments")
+    @patch(
+        "runrestic.runrestic.runrestic.configuration_file_paths", return_value=["cfg1"]
+    )
+    @patch(
+        "runrestic.runrestic.runrestic.parse_configuration",
+        return_value={"name": "dummy", "execution": {"parallel": False}},
+    )
+    @patch("runrestic.runrestic.runrestic.ResticRunner")
+    def test_max_parallel_overrides_execution(
+        self, mock_runner_cls, mock_parse, mock_confpaths, mock_cli, mock_check
+    ):
+        args = MagicMock(
+            log_level="info",
+            config_file=None,
+            actions=[],
+            show_progress=None,
+            max_parallel="auto",
+            proc_log_level=None,
+        )
+        mock_cli.return_value = (args, [])
+        mock_runner_cls.return_value.run.return_value = 0
+
+        runrestic.runrestic()
+        config = mock_runner_cls.call_args[0][0]
+        self.assertEqual(
+            config["execution"], {"parallel": True, "max_parallel": "auto"}
+        )
+
+    @patch("runrestic.runrestic.runrestic.restic_check", return_value=True)
+    @patch("runrestic.runrestic.runrestic.cli_arguments")
+    @patch(
+        "runrestic.runrestic.runrestic.configuration_file_paths", return_value=["cfg1"]
+    )
+    @patch(
+        "runrestic.runrestic.runrestic.parse_configuration",
+        return_value={"name": "dummy", "execution": {"proc_log_level": "debug"}},
+    )
+    @patch("runrestic.runrestic.runrestic.ResticRunner")
+    def test_proc_log_level_overrides_execution(
+        self, mock_runner_cls, mock_parse, mock_confpaths, mock_cli, mock_check
+    ):
+        args = MagicMock(
+            log_level="info",
+            config_file=None,
+            actions=[],
+            show_progress=None,
+            max_parallel=None,
+            proc_log_level="warning",
+        )
+        mock_cli.return_value = (args, [])
+        mock_runner_cls.return_value.run.return_value = 0
+
+        runrestic.runrestic()
+        config = mock_runner_cls.call_args[0][0]
+        self.assertEqual(config["execution"], {"proc_log_level": "warning"})
@@ -1,11 +1,17 @@
+import os
+
 import pytest
 
 from runrestic.runrestic.tools import (
+    FieldParser,
+    cache_directory,
     deep_update,
+    load_cache,
     make_size,
     parse_line,
     parse_size,
     parse_time,
+    save_cache,
 )
 
 OUTPUT = """Start of the output
@@ -127,3 +133,69 @@ def test_parse_line_type_mismatch():
         )
         == "-1"
     )
+
+
+def test_field_parser():
+    parser = FieldParser(
+        {
+            "dummy": (r"Dummy counter: (\d+) something", "-1"),
+            "two": (r"Two counters: value 1: (\d+), value 2: ([\d\.]+)", ("-1", "-1")),
+            "missing": (r"Dummy counter NONE: (\d+) something", "-1"),
+            "whole": (r"value 3: [\d\.]+ kB", "-1"),
+        }
+    )
+    expected = {
+        "dummy": "123",
+        "two": ("456", "7.89"),
+        "missing": "-1",
+        "whole": "value 3: 33.3 kB",
+    }
+    # like parse_line, independent of the order of the fields in the output
+    assert parser.parse(OUTPUT) == expected
+    assert parser.parse(OUTPUT_2) == expected
+
+
+def test_field_parser_first_match():
+    parser = FieldParser({"counter": (r"counter: (\d+)", "-1")})
+    assert parser.parse("counter: 1\ncounter: 2") == {"counter": "1"}
+
+
+def test_field_parser_start():
+    parser = FieldParser({"counter": (r"counter: (\d+)", "-1")}, start="Summary")
+    assert parser.parse("counter: 1\nSummary\ncounter: 2") == {"counter": "2"}
+    # the whole output is parsed if the start is missing
+    assert parser.parse("counter: 1") == {"counter": "1"}
+
+
+def test_field_parser_type_mismatch():
+    parser = FieldParser(
+        {"three": (r"Three counters: value 1: ([\d\.]+), value 2: (\d+)", "-1")}
+    )
+    assert parser.parse(OUTPUT) == {"three": "-1"}
+
+
+def test_cache_directory(monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", "/var/cache")
+    assert cache_directory() == "/var/cache/runrestic"
+    monkeypatch.delenv("XDG_CACHE_HOME")
+    monkeypatch.setenv("HOME", "/home/user")
+    assert cache_directory() == "/home/user/.cache/runrestic"
+
+
+def test_load_and_save_cache(tmp_path):
+    path = str(tmp_path / "runrestic" / "cache.json")
+    assert load_cache(path) == {}
+    save_cache(path, {"key": [1, 2]})
+    assert load_cache(path) == {"key": [1, 2]}
+    assert os.listdir(tmp_path / "runrestic") == ["cache.json"]
+    for content in ("not json", "[1, 2]"):
+        with open(path, "w") as file:
+            file.write(content)
+        assert load_cache(path) == {}
+
+
+def test_save_cache_failure(tmp_path, caplog):
+    path = str(tmp_path / "file" / "cache.json")
+    (tmp_path / "file").write_text("not a directory")
+    save_cache(path, {})
+    assert "Unable to write the cache file" in caplog.text